@@ -0,0 +1,81 @@
+import requests
+from flask import Flask
+
+from broker.extensions import config, db
+
+from benchmarks.lib.fake_aws import load_balancer_arn
+
+CHALLTESTSRV = "http://localhost:8055"
+
+
+def require_benchmark_env():
+    """
+    The harnesses drop every table and flush redis, so refuse to run against
+    anything but the benchmark database.
+    """
+    if config.FLASK_ENV != "benchmark":
+        raise SystemExit(
+            f"refusing to run with FLASK_ENV={config.FLASK_ENV!r}; "
+            "set FLASK_ENV=benchmark (see benchmarks/README.md)"
+        )
+
+
+def make_app() -> Flask:
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    return app
+
+
+def reset_state(app: Flask, redis_connection):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    redis_connection.flushall()
+
+
+def aws_clients() -> dict:
+    from broker import aws
+
+    return {
+        "route53": aws.route53,
+        "iam_commercial": aws.iam_commercial,
+        "cloudfront": aws.cloudfront,
+        "shield": aws.shield,
+        "wafv2_commercial": aws.wafv2_commercial,
+        "cloudwatch_commercial": aws.cloudwatch_commercial,
+        "sns_commercial": aws.sns_commercial,
+        "alb": aws.alb,
+        "iam_govcloud": aws.iam_govcloud,
+        "wafv2_govcloud": aws.wafv2_govcloud,
+    }
+
+
+def add_acme_cnames(domain_names: list[str], session: requests.Session = None):
+    """point _acme-challenge.<domain> at our zone, like a customer would"""
+    session = session or requests.Session()
+    for domain in domain_names:
+        host = f"_acme-challenge.{domain}"
+        session.post(
+            f"{CHALLTESTSRV}/set-cname",
+            json={"host": host, "target": f"{host}.{config.DNS_ROOT_DOMAIN}."},
+        ).raise_for_status()
+
+
+def seed_dedicated_albs(app: Flask):
+    """
+    Load the dedicated ALBs and listeners from config the way the load_albs cron
+    job would, without asking the CF API for tag names.
+    """
+    from broker.models import DedicatedALB, DedicatedALBListener
+
+    with app.app_context():
+        for listener_arn, org in config.DEDICATED_ALB_LISTENER_ARN_MAP.items():
+            alb_arn = load_balancer_arn(listener_arn)
+            db.session.add(
+                DedicatedALBListener(
+                    listener_arn=listener_arn, alb_arn=alb_arn, dedicated_org=org
+                )
+            )
+            db.session.add(DedicatedALB(alb_arn=alb_arn, dedicated_org=org, tags=[]))
+        db.session.commit()
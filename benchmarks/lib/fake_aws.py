@@ -0,0 +1,431 @@
+import copy
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import requests
+from botocore.awsrequest import AWSResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FaultProfile:
+    """
+    How a fake AWS API behaves.
+
+    - latency: median seconds each call takes
+    - jitter: +/- fraction of latency, applied uniformly
+    - throttle_rate: fraction of calls answered with a Throttling error
+    - failure_rate: fraction of calls answered with a 5xx ServiceUnavailable
+    """
+
+    latency: float = 0.05
+    jitter: float = 0.5
+    throttle_rate: float = 0.0
+    failure_rate: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str, default: "FaultProfile" = None) -> "FaultProfile":
+        """
+        parse `latency=0.2,throttle_rate=0.01` style specs from the command line.
+        Unspecified fields come from `default`
+        """
+        fields = dict(vars(default)) if default else {}
+        for pair in filter(None, spec.split(",")):
+            key, value = pair.split("=")
+            fields[key.strip()] = float(value)
+        return cls(**fields)
+
+    def sleep(self, rng):
+        delay = self.latency * (1 + rng.uniform(-self.jitter, self.jitter))
+        time.sleep(max(delay, 0))
+
+
+class FakeAWSBackend:
+    """
+    I answer every AWS API call the pipelines make, after an injected delay.
+
+    Unlike the Stubber-based fakes in tests/lib, I don't assert anything about
+    the calls I get. I keep just enough state (listener certificates, distribution
+    configs, alarms...) that the pipelines' reads and waiters see their own writes.
+
+    TXT record UPSERTs are forwarded to pebble-challtestsrv, so pebble can validate
+    the DNS-01 challenges the pipelines answer.
+
+    Install me with `install(clients)` where clients is {name: boto3 client}.
+    Fault profiles can be overridden per service ("route53") or per operation
+    ("cloudfront.UpdateDistribution").
+    """
+
+    def __init__(
+        self,
+        profile: FaultProfile = None,
+        overrides: dict[str, FaultProfile] = None,
+        challtestsrv: str = "http://localhost:8055",
+        listener_certificate_quota: int = None,
+        seed: int = None,
+    ):
+        self.profile = profile or FaultProfile()
+        self.overrides = overrides or {}
+        self.challtestsrv = challtestsrv
+        self.listener_certificate_quota = listener_certificate_quota
+        self.calls = Counter()
+        self.throttles = Counter()
+        self.failures = Counter()
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._installed = []
+
+        self.listener_certificates: dict[str, set] = {}
+        self.distributions: dict[str, dict] = {}
+        self.alarms: set[str] = set()
+
+    def install(self, clients: dict):
+        for name, client in clients.items():
+            handler_id = f"fake-aws-backend-{name}-{id(self)}"
+            client.meta.events.register_first(
+                "before-call.*.*", self._before_call, unique_id=handler_id
+            )
+            self._installed.append((client, handler_id))
+
+    def uninstall(self):
+        for client, handler_id in self._installed:
+            client.meta.events.unregister("before-call.*.*", unique_id=handler_id)
+        self._installed = []
+
+    def summary(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "throttles": dict(self.throttles),
+            "failures": dict(self.failures),
+        }
+
+    def _profile_for(self, service, operation) -> FaultProfile:
+        return self.overrides.get(
+            f"{service}.{operation}", self.overrides.get(service, self.profile)
+        )
+
+    def _before_call(self, model, params, **kwargs):
+        service = model.service_model.service_name
+        operation = model.name
+        key = f"{service}.{operation}"
+        profile = self._profile_for(service, operation)
+
+        with self._lock:
+            self.calls[key] += 1
+            roll = self._rng.random()
+        profile.sleep(self._rng)
+
+        if roll < profile.throttle_rate:
+            with self._lock:
+                self.throttles[key] += 1
+            return _error(400, "Throttling", "Rate exceeded")
+        if roll < profile.throttle_rate + profile.failure_rate:
+            with self._lock:
+                self.failures[key] += 1
+            return _error(503, "ServiceUnavailable", "Injected failure")
+
+        handler = getattr(self, f"_{service.replace('-', '_')}_{operation}", None)
+        if handler is None:
+            raise NotImplementedError(f"FakeAWSBackend does not know {key}")
+        with self._lock:
+            return handler(params)
+
+    # Route53
+
+    def _route53_ChangeResourceRecordSets(self, params):
+        for change in params["ChangeBatch"]["Changes"]:
+            record = change["ResourceRecordSet"]
+            if record["Type"] == "TXT" and change["Action"] == "UPSERT":
+                # _acme-challenge.example.com.domains.cloud.test -> pebble
+                requests.post(
+                    f"{self.challtestsrv}/set-txt",
+                    json={
+                        "host": f"{record['Name']}.",
+                        "value": record["ResourceRecords"][0]["Value"].strip('"'),
+                    },
+                ).raise_for_status()
+        return _ok({"ChangeInfo": _change_info("PENDING")})
+
+    def _route53_GetChange(self, params):
+        return _ok({"ChangeInfo": _change_info("INSYNC")})
+
+    def _route53_CreateHealthCheck(self, params):
+        return _ok({"HealthCheck": {"Id": _id()}})
+
+    def _route53_ChangeTagsForResource(self, params):
+        return _ok({})
+
+    def _route53_DeleteHealthCheck(self, params):
+        return _ok({})
+
+    # IAM
+
+    def _iam_UploadServerCertificate(self, params):
+        return _ok({"ServerCertificateMetadata": _certificate_metadata(params)})
+
+    def _iam_GetServerCertificate(self, params):
+        return _ok(
+            {
+                "ServerCertificate": {
+                    "ServerCertificateMetadata": _certificate_metadata(params)
+                }
+            }
+        )
+
+    def _iam_TagServerCertificate(self, params):
+        return _ok({})
+
+    def _iam_DeleteServerCertificate(self, params):
+        return _ok({})
+
+    # ELBv2
+
+    def _elbv2_DescribeListenerCertificates(self, params):
+        certificates = self.listener_certificates.get(params["ListenerArn"], set())
+        return _ok(
+            {"Certificates": [{"CertificateArn": arn} for arn in sorted(certificates)]}
+        )
+
+    def _elbv2_DescribeListeners(self, params):
+        return _ok(
+            {
+                "Listeners": [
+                    {"ListenerArn": arn, "LoadBalancerArn": load_balancer_arn(arn)}
+                    for arn in params["ListenerArns"]
+                ]
+            }
+        )
+
+    def _elbv2_DescribeLoadBalancers(self, params):
+        return _ok(
+            {
+                "LoadBalancers": [
+                    {
+                        "LoadBalancerArn": arn,
+                        "DNSName": f"{arn}.alb.cloud.test",
+                        "CanonicalHostedZoneId": "ALBHOSTEDZONEID",
+                    }
+                    for arn in params["LoadBalancerArns"]
+                ]
+            }
+        )
+
+    def _elbv2_AddListenerCertificates(self, params):
+        certificates = self.listener_certificates.setdefault(
+            params["ListenerArn"], set()
+        )
+        certificates.update(c["CertificateArn"] for c in params["Certificates"])
+        if (
+            self.listener_certificate_quota is not None
+            and len(certificates) > self.listener_certificate_quota
+        ):
+            certificates.difference_update(
+                c["CertificateArn"] for c in params["Certificates"]
+            )
+            return _error(400, "TooManyCertificates", "Listener quota exceeded")
+        return _ok({"Certificates": params["Certificates"]})
+
+    def _elbv2_RemoveListenerCertificates(self, params):
+        certificates = self.listener_certificates.get(params["ListenerArn"], set())
+        certificates.difference_update(
+            c["CertificateArn"] for c in params["Certificates"]
+        )
+        return _ok({})
+
+    # CloudFront
+
+    def _cloudfront_CreateDistributionWithTags(self, params):
+        distribution_id = _id()
+        self.distributions[distribution_id] = copy.deepcopy(
+            params["DistributionConfigWithTags"]["DistributionConfig"]
+        )
+        return _ok({"Distribution": self._distribution(distribution_id)})
+
+    def _cloudfront_GetDistribution(self, params):
+        return _ok({"Distribution": self._distribution(params["Id"]), "ETag": _etag()})
+
+    def _cloudfront_GetDistributionConfig(self, params):
+        return _ok(
+            {
+                "DistributionConfig": copy.deepcopy(self.distributions[params["Id"]]),
+                "ETag": _etag(),
+            }
+        )
+
+    def _cloudfront_UpdateDistribution(self, params):
+        self.distributions[params["Id"]] = copy.deepcopy(params["DistributionConfig"])
+        return _ok({"Distribution": self._distribution(params["Id"]), "ETag": _etag()})
+
+    def _cloudfront_DeleteDistribution(self, params):
+        self.distributions.pop(params["Id"], None)
+        return _ok({})
+
+    def _cloudfront_TagResource(self, params):
+        return _ok({})
+
+    def _cloudfront_ListCachePolicies(self, params):
+        return _ok({"CachePolicyList": {"Items": []}})
+
+    def _cloudfront_ListOriginRequestPolicies(self, params):
+        return _ok({"OriginRequestPolicyList": {"Items": []}})
+
+    def _distribution(self, distribution_id):
+        return {
+            "Id": distribution_id,
+            "ARN": _distribution_arn(distribution_id),
+            "DomainName": f"{distribution_id}.cloudfront.net",
+            "Status": "Deployed",
+            "DistributionConfig": copy.deepcopy(self.distributions[distribution_id]),
+        }
+
+    # WAFv2
+
+    def _wafv2_CreateWebACL(self, params):
+        web_acl_id = _id()
+        return _ok(
+            {
+                "Summary": {
+                    "Name": params["Name"],
+                    "Id": web_acl_id,
+                    "ARN": f"arn:aws:wafv2::000000000000:global/webacl/{params['Name']}/{web_acl_id}",
+                }
+            }
+        )
+
+    def _wafv2_PutLoggingConfiguration(self, params):
+        return _ok({"LoggingConfiguration": params["LoggingConfiguration"]})
+
+    def _wafv2_AssociateWebACL(self, params):
+        return _ok({})
+
+    def _wafv2_GetWebACL(self, params):
+        return _ok({"WebACL": {"Name": params["Name"]}, "LockToken": _etag()})
+
+    def _wafv2_DeleteWebACL(self, params):
+        return _ok({})
+
+    def _wafv2_TagResource(self, params):
+        return _ok({})
+
+    # Shield
+
+    def _shield_ListProtections(self, params):
+        # Shield Advanced protects every distribution in the account via policy
+        return _ok(
+            {
+                "Protections": [
+                    {
+                        "Id": f"protection-{distribution_id}",
+                        "ResourceArn": _distribution_arn(distribution_id),
+                    }
+                    for distribution_id in self.distributions
+                ]
+            }
+        )
+
+    def _shield_DescribeProtection(self, params):
+        distribution_id = params["ResourceArn"].rsplit("/", 1)[-1]
+        return _ok(
+            {
+                "Protection": {
+                    "Id": f"protection-{distribution_id}",
+                    "ResourceArn": params["ResourceArn"],
+                }
+            }
+        )
+
+    def _shield_AssociateHealthCheck(self, params):
+        return _ok({})
+
+    def _shield_DisassociateHealthCheck(self, params):
+        return _ok({})
+
+    # CloudWatch
+
+    def _cloudwatch_PutMetricAlarm(self, params):
+        self.alarms.add(params["AlarmName"])
+        return _ok({})
+
+    def _cloudwatch_DescribeAlarms(self, params):
+        return _ok(
+            {
+                "MetricAlarms": [
+                    {"AlarmName": name}
+                    for name in params.get("AlarmNames", [])
+                    if name in self.alarms
+                ]
+            }
+        )
+
+    def _cloudwatch_DeleteAlarms(self, params):
+        self.alarms.difference_update(params["AlarmNames"])
+        return _ok({})
+
+    # SNS
+
+    def _sns_CreateTopic(self, params):
+        return _ok({"TopicArn": f"arn:aws:sns:us-east-1:000000000000:{params['Name']}"})
+
+    def _sns_Subscribe(self, params):
+        return _ok({"SubscriptionArn": f"{params['TopicArn']}:{_id()}"})
+
+    def _sns_Unsubscribe(self, params):
+        return _ok({})
+
+    def _sns_DeleteTopic(self, params):
+        return _ok({})
+
+
+def _ok(body):
+    body.setdefault("ResponseMetadata", {"HTTPStatusCode": 200})
+    return AWSResponse(None, 200, {}, None), body
+
+
+def _error(status_code, code, message):
+    body = {
+        "Error": {"Code": code, "Message": message},
+        "ResponseMetadata": {"HTTPStatusCode": status_code},
+    }
+    return AWSResponse(None, status_code, {}, None), body
+
+
+def _id():
+    return uuid.uuid4().hex[:14].upper()
+
+
+def _etag():
+    return uuid.uuid4().hex
+
+
+def _change_info(status):
+    return {
+        "Id": f"/change/{_id()}",
+        "Status": status,
+        "SubmittedAt": datetime.now(timezone.utc),
+    }
+
+
+def _certificate_metadata(params):
+    name = params["ServerCertificateName"]
+    return {
+        "Path": params.get("Path", "/"),
+        "ServerCertificateName": name,
+        "ServerCertificateId": _id(),
+        "Arn": f"arn:aws:iam::000000000000:server-certificate/{name}",
+    }
+
+
+def load_balancer_arn(listener_arn):
+    return f"{listener_arn}-load-balancer"
+
+
+def _distribution_arn(distribution_id):
+    return f"arn:aws:cloudfront::000000000000:distribution/{distribution_id}"
@@ -0,0 +1,490 @@
+"""
+Synthetic production-sized dataset for the query benchmarks.
+
+The shape is meant to look like a long-running broker:
+
+- instances arrive over `history_days`, more of them recently, and about a third
+  have since been deprovisioned
+- most instances have one domain, a few have many, and some deprovisioned
+  instances shared a domain with one that's active now
+- every instance renews roughly every 60 days, so old instances have long
+  certificate and operation histories
+- dedicated ALB instances belong to a handful of orgs, a few of them much bigger
+  than the rest, spread across listeners of at most MAX_CERTS_PER_ALB certs
+- a few operations are in flight right now, and some of those are stalled
+
+Rows are written with COPY, so generating the default dataset takes a few minutes
+rather than hours.
+"""
+
+import base64
+import csv
+import io
+import json
+import math
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from broker.extensions import config
+from broker.models import ModelTypes, Operation, ServiceInstanceTypes
+
+INSTANCE_TYPES = [
+    (ServiceInstanceTypes.CDN.value, 0.45),
+    (ServiceInstanceTypes.ALB.value, 0.33),
+    (ServiceInstanceTypes.DEDICATED_ALB.value, 0.12),
+    (ServiceInstanceTypes.CDN_DEDICATED_WAF.value, 0.07),
+    (ServiceInstanceTypes.MIGRATION.value, 0.03),
+]
+ALB_TYPES = {ServiceInstanceTypes.ALB.value, ServiceInstanceTypes.DEDICATED_ALB.value}
+CDN_TYPES = {
+    ServiceInstanceTypes.CDN.value,
+    ServiceInstanceTypes.CDN_DEDICATED_WAF.value,
+}
+
+CERTIFICATE_LIFETIME = timedelta(days=90)
+RENEWAL_INTERVAL_DAYS = 60
+SHARED_LISTENERS = 40
+CHUNK_ROWS = 20_000
+
+SUCCEEDED = Operation.States.SUCCEEDED.value
+FAILED = Operation.States.FAILED.value
+IN_PROGRESS = Operation.States.IN_PROGRESS.value
+
+
+@dataclass
+class FleetSpec:
+    instances: int = 100_000
+    operations: int = 1_000_000
+    certificates: int = 500_000
+    dedicated_orgs: int = 40
+    history_days: int = 5 * 365
+    deactivated_fraction: float = 0.35
+    # fraction of active instances whose last renewal failed, so their cert expires soon
+    overdue_renewal_fraction: float = 0.01
+    # fraction of active instances with an operation in progress right now
+    in_flight_fraction: float = 0.002
+    # size of the fake leaf_pem on each certificate, so rows are realistically wide
+    pem_bytes: int = 1500
+    seed: int = None
+
+
+@dataclass
+class _Instance:
+    id: str
+    instance_type: str
+    created_at: datetime
+    age: timedelta
+    deactivated_at: datetime
+    domain_names: list
+    org_id: str = None
+    alb_arn: str = None
+    alb_listener_arn: str = None
+    certificates: int = 1
+    extra_operations: int = 0
+    issued: list = None
+    current_certificate_id: int = None
+
+    @property
+    def ended_at(self):
+        return self.deactivated_at or self.created_at + self.age
+
+
+def generate(connection, spec: FleetSpec) -> dict:
+    """
+    Fill an empty schema through `connection`, a DBAPI (psycopg2) connection.
+    Returns row counts.
+    """
+    now = datetime.now(timezone.utc)
+    rng = random.Random(spec.seed)
+
+    instances = _plan_instances(rng, spec, now)
+    listeners = _assign_listeners(rng, instances)
+
+    for count, instance in zip(
+        _allocate(
+            spec.certificates - len(instances),
+            [_lifetime_days(i) for i in instances],
+            rng,
+        ),
+        instances,
+    ):
+        instance.certificates += count
+
+    base_operations = sum(
+        instance.certificates + (1 if instance.deactivated_at else 0)
+        for instance in instances
+    )
+    for count, instance in zip(
+        _allocate(
+            spec.operations - base_operations,
+            [_lifetime_days(i) for i in instances],
+            rng,
+        ),
+        instances,
+    ):
+        instance.extra_operations = count
+    for instance in instances:
+        instance.issued = _issue_dates(rng, spec, instance, now)
+
+    cursor = connection.cursor()
+    counts = {}
+    counts["dedicated_alb_listener"], counts["dedicated_alb"] = _write_listeners(
+        cursor, listeners
+    )
+    counts["service_instance"] = _copy(
+        cursor,
+        "service_instance",
+        [
+            "id",
+            "instance_type",
+            "domain_names",
+            "deactivated_at",
+            "org_id",
+            "alb_arn",
+            "alb_listener_arn",
+            "route53_alias_hosted_zone",
+            "created_at",
+            "updated_at",
+        ],
+        (
+            (
+                i.id,
+                i.instance_type,
+                json.dumps(i.domain_names),
+                i.deactivated_at,
+                i.org_id,
+                i.alb_arn,
+                i.alb_listener_arn,
+                "Z2FDTNDATAQYW2" if i.instance_type in CDN_TYPES else None,
+                i.created_at,
+                i.deactivated_at or i.created_at,
+            )
+            for i in instances
+        ),
+    )
+    counts["certificate"] = _copy(
+        cursor,
+        "certificate",
+        [
+            "id",
+            "service_instance_id",
+            "subject_alternative_names",
+            "leaf_pem",
+            "expires_at",
+            "iam_server_certificate_name",
+            "iam_server_certificate_arn",
+            "created_at",
+        ],
+        _certificate_rows(rng, spec, instances),
+    )
+    counts["operation"] = _copy(
+        cursor,
+        "operation",
+        [
+            "id",
+            "service_instance_id",
+            "state",
+            "action",
+            "canceled_at",
+            "step_description",
+            "created_at",
+            "updated_at",
+        ],
+        _operation_rows(rng, spec, instances, now),
+    )
+
+    cursor.execute(
+        "CREATE TEMPORARY TABLE current_certificates "
+        "(service_instance_id varchar(36), certificate_id integer)"
+    )
+    _copy(
+        cursor,
+        "current_certificates",
+        ["service_instance_id", "certificate_id"],
+        ((i.id, i.current_certificate_id) for i in instances),
+    )
+    cursor.execute(
+        "UPDATE service_instance SET current_certificate_id = c.certificate_id "
+        "FROM current_certificates c WHERE service_instance.id = c.service_instance_id"
+    )
+    cursor.execute("DROP TABLE current_certificates")
+
+    for table in (
+        "certificate",
+        "operation",
+        "dedicated_alb",
+        "dedicated_alb_listener",
+    ):
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT coalesce(max(id), 1) FROM {table}))"
+        )
+    connection.commit()
+    cursor.execute("ANALYZE")
+    connection.commit()
+    return counts
+
+
+def _plan_instances(rng, spec, now) -> list[_Instance]:
+    types, weights = zip(*INSTANCE_TYPES)
+    orgs = [f"org-{n:04d}" for n in range(spec.dedicated_orgs)]
+    active_domains = []
+    instances = []
+    for n in range(spec.instances):
+        instance_type = rng.choices(types, weights)[0]
+        # skewed towards recent: the fleet has grown over time
+        age = timedelta(days=spec.history_days * rng.random() ** 1.5)
+        created_at = now - age
+        deactivated_at = None
+        if rng.random() < spec.deactivated_fraction:
+            deactivated_at = created_at + age * rng.random()
+
+        if deactivated_at and active_domains and rng.random() < 0.1:
+            # deprovisioned, then provisioned again as a new instance
+            domain_names = [rng.choice(active_domains)]
+        else:
+            domain_count = min(1 + _geometric(rng, 0.6), 20)
+            domain_names = [
+                f"{label}{n}.agency{n % 997}.example.gov"
+                for label in ("www", "app", "api", "cdn", "static")[:domain_count]
+            ] + [
+                f"d{k}-{n}.agency{n % 997}.example.gov" for k in range(domain_count - 5)
+            ]
+            if not deactivated_at and len(active_domains) < 100_000:
+                active_domains.append(domain_names[0])
+
+        instance = _Instance(
+            id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            instance_type=instance_type,
+            created_at=created_at,
+            age=age,
+            deactivated_at=deactivated_at,
+            domain_names=domain_names,
+        )
+        if instance_type == ServiceInstanceTypes.DEDICATED_ALB.value:
+            # a few orgs own most of the dedicated instances
+            instance.org_id = orgs[int(len(orgs) * rng.random() ** 3)]
+        instances.append(instance)
+    return instances
+
+
+def _assign_listeners(rng, instances) -> dict[str, list[tuple[str, str]]]:
+    """
+    give ALB instances listeners the way the pipelines would, and return the
+    dedicated listeners we made as {org: [(listener_arn, alb_arn)]}
+    """
+    listeners = {}
+    filled = {}
+    for instance in instances:
+        if instance.instance_type == ServiceInstanceTypes.ALB.value:
+            n = rng.randrange(SHARED_LISTENERS)
+            instance.alb_listener_arn = (
+                f"arn:aws:elasticloadbalancing:listener/shared-{n}"
+            )
+            instance.alb_arn = f"arn:aws:elasticloadbalancing:loadbalancer/shared-{n}"
+        elif instance.instance_type == ServiceInstanceTypes.DEDICATED_ALB.value:
+            org_listeners = listeners.setdefault(instance.org_id, [])
+            available = [
+                listener
+                for listener in org_listeners
+                if filled[listener[0]] < config.MAX_CERTS_PER_ALB
+            ]
+            if instance.deactivated_at is None and not available:
+                n = len(org_listeners)
+                listener = (
+                    f"arn:aws:elasticloadbalancing:listener/{instance.org_id}-{n}",
+                    f"arn:aws:elasticloadbalancing:loadbalancer/{instance.org_id}-{n}",
+                )
+                org_listeners.append(listener)
+                filled[listener[0]] = 0
+                available = [listener]
+            if not available:
+                available = org_listeners or [
+                    (
+                        f"arn:aws:elasticloadbalancing:listener/{instance.org_id}-0",
+                        f"arn:aws:elasticloadbalancing:loadbalancer/{instance.org_id}-0",
+                    )
+                ]
+            listener_arn, alb_arn = rng.choice(available)
+            if instance.deactivated_at is None:
+                filled[listener_arn] += 1
+            instance.alb_listener_arn = listener_arn
+            instance.alb_arn = alb_arn
+    # leave headroom, like we do in production
+    for org, org_listeners in listeners.items():
+        n = len(org_listeners)
+        org_listeners.append(
+            (
+                f"arn:aws:elasticloadbalancing:listener/{org}-{n}",
+                f"arn:aws:elasticloadbalancing:loadbalancer/{org}-{n}",
+            )
+        )
+    return listeners
+
+
+def _write_listeners(cursor, listeners) -> tuple[int, int]:
+    listener_rows = []
+    alb_rows = []
+    for org, org_listeners in listeners.items():
+        for listener_arn, alb_arn in org_listeners:
+            listener_rows.append((listener_arn, alb_arn, org))
+            alb_rows.append((alb_arn, org, ModelTypes.DEDICATED_ALB.value, "[]"))
+    _copy(
+        cursor,
+        "dedicated_alb_listener",
+        ["listener_arn", "alb_arn", "dedicated_org"],
+        listener_rows,
+    )
+    _copy(
+        cursor,
+        "dedicated_alb",
+        ["alb_arn", "dedicated_org", "instance_type", "tags"],
+        alb_rows,
+    )
+    return len(listener_rows), len(alb_rows)
+
+
+def _certificate_rows(rng, spec, instances):
+    certificate_id = 0
+    for instance in instances:
+        for issued_at in instance.issued:
+            certificate_id += 1
+            name = f"{instance.id}-{issued_at:%Y-%m-%d}-{certificate_id}"
+            if instance.instance_type in ALB_TYPES:
+                prefix = config.ALB_IAM_SERVER_CERTIFICATE_PREFIX
+            else:
+                prefix = config.CLOUDFRONT_IAM_SERVER_CERTIFICATE_PREFIX
+            yield (
+                certificate_id,
+                instance.id,
+                json.dumps(instance.domain_names),
+                _fake_pem(rng, spec.pem_bytes),
+                issued_at + CERTIFICATE_LIFETIME,
+                name,
+                f"arn:aws:iam::000000000000:server-certificate{prefix}{name}",
+                issued_at,
+            )
+        instance.current_certificate_id = certificate_id
+
+
+def _issue_dates(rng, spec, instance, now) -> list[datetime]:
+    count = instance.certificates
+    if instance.deactivated_at:
+        last = instance.deactivated_at - timedelta(
+            days=min(RENEWAL_INTERVAL_DAYS, _lifetime_days(instance)) * rng.random()
+        )
+    elif rng.random() < spec.overdue_renewal_fraction:
+        last = now - timedelta(days=rng.uniform(RENEWAL_INTERVAL_DAYS + 2, 85))
+    else:
+        last = now - timedelta(days=rng.uniform(0, RENEWAL_INTERVAL_DAYS + 2))
+    last = max(last, instance.created_at)
+    if count == 1:
+        return [last]
+    step = (last - instance.created_at) / (count - 1)
+    return [instance.created_at + step * n for n in range(count)]
+
+
+def _operation_rows(rng, spec, instances, now):
+    operation_id = 0
+    for instance in instances:
+        rows = []
+        rows.append(("Provision", SUCCEEDED, instance.created_at))
+        rows.extend(("Renew", SUCCEEDED, at) for at in instance.issued[1:])
+        for _ in range(instance.extra_operations):
+            at = (
+                instance.created_at
+                + (instance.ended_at - instance.created_at) * rng.random()
+            )
+            if rng.random() < 0.7:
+                rows.append(("Update", SUCCEEDED, at))
+            else:
+                rows.append(("Renew", FAILED, at))
+        if instance.deactivated_at:
+            rows.append(("Deprovision", SUCCEEDED, instance.deactivated_at))
+
+        in_flight = (
+            instance.deactivated_at is None and rng.random() < spec.in_flight_fraction
+        )
+        if in_flight:
+            rows.append(("Renew", IN_PROGRESS, None))
+
+        for action, state, at in sorted(rows, key=lambda r: r[2] or now):
+            operation_id += 1
+            canceled_at = None
+            if state == IN_PROGRESS:
+                if rng.random() < 0.5:
+                    # stalled, maybe given up on
+                    updated_at = now - timedelta(minutes=rng.uniform(60, 3 * 24 * 60))
+                    if rng.random() < 0.1:
+                        canceled_at = updated_at + timedelta(minutes=30)
+                else:
+                    updated_at = now - timedelta(minutes=rng.uniform(0, 10))
+                at = updated_at - timedelta(minutes=rng.uniform(1, 30))
+                description = "Uploading SSL certificate to AWS"
+            else:
+                updated_at = at + timedelta(minutes=rng.uniform(1, 20))
+                description = "Complete!" if state == SUCCEEDED else "Failed"
+            yield (
+                operation_id,
+                instance.id,
+                state,
+                action,
+                canceled_at,
+                description,
+                at,
+                updated_at,
+            )
+
+
+def _copy(cursor, table, columns, rows) -> int:
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    written = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+        written += 1
+        if written % CHUNK_ROWS == 0:
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+    buffer.seek(0)
+    cursor.copy_expert(statement, buffer)
+    return written
+
+
+def _allocate(total: int, weights: list[float], rng) -> list[int]:
+    """split `total` into integers roughly proportional to `weights`"""
+    if total <= 0:
+        return [0] * len(weights)
+    weight_sum = sum(weights)
+    shares = [total * w / weight_sum for w in weights]
+    counts = [math.floor(share) for share in shares]
+    remainder = total - sum(counts)
+    for index in rng.choices(range(len(weights)), weights, k=remainder):
+        counts[index] += 1
+    return counts
+
+
+def _lifetime_days(instance) -> float:
+    return max((instance.ended_at - instance.created_at).total_seconds() / 86400, 1)
+
+
+def _geometric(rng, p) -> int:
+    count = 0
+    while rng.random() > p:
+        count += 1
+    return count
+
+
+def _fake_pem(rng, size) -> str:
+    if not size:
+        return None
+    body = base64.b64encode(rng.randbytes(size * 3 // 4)).decode()
+    lines = [body[n : n + 64] for n in range(0, len(body), 64)]
+    return "\n".join(
+        ["-----BEGIN CERTIFICATE-----", *lines, "-----END CERTIFICATE-----"]
+    )
@@ -0,0 +1,62 @@
+"""
+gunicorn config for benchmarks.osbapi: `gunicorn -c benchmarks/lib/gunicorn_hooks.py ...`
+
+Each worker samples its SQLAlchemy connection pool and writes what it saw to
+$BENCHMARK_POOL_STATS_DIR/<pid>.json when it exits.
+"""
+
+import json
+import os
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.05
+
+_stats = {}
+_stop = threading.Event()
+
+
+def post_worker_init(worker):
+    from sqlalchemy import event
+
+    from broker.extensions import db
+
+    with worker.wsgi.app_context():
+        pool = db.engine.pool
+
+    _stats.update(
+        pid=os.getpid(),
+        pool_size=pool.size(),
+        max_overflow=pool._max_overflow,
+        peak_checked_out=0,
+        checkouts=0,
+        samples=0,
+        checked_out_total=0,
+        saturated_samples=0,
+    )
+    capacity = _stats["pool_size"] + max(_stats["max_overflow"], 0)
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(*args):
+        _stats["checkouts"] += 1
+        _stats["peak_checked_out"] = max(_stats["peak_checked_out"], pool.checkedout())
+
+    def sample():
+        while not _stop.wait(SAMPLE_INTERVAL):
+            checked_out = pool.checkedout()
+            _stats["samples"] += 1
+            _stats["checked_out_total"] += checked_out
+            if checked_out >= capacity:
+                _stats["saturated_samples"] += 1
+
+    threading.Thread(target=sample, daemon=True).start()
+
+
+def worker_exit(server, worker):
+    _stop.set()
+    directory = os.environ.get("BENCHMARK_POOL_STATS_DIR")
+    if not directory or not _stats:
+        return
+    _stats["exited_at"] = time.time()
+    with open(os.path.join(directory, f"{os.getpid()}.json"), "w") as f:
+        json.dump(_stats, f)
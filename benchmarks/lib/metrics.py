@@ -0,0 +1,188 @@
+import json
+import os
+import statistics
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "results")
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "min": ordered[0],
+        "mean": statistics.fmean(ordered),
+        "p50": pct(50),
+        "p90": pct(90),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": ordered[-1],
+    }
+
+
+class QueryCounter:
+    """
+    I count SQL statements executed on every engine in the process, except those
+    issued from threads I've been told to ignore (e.g. the harness' own polling).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.by_verb = Counter()
+        self._ignored_threads = set()
+        self._lock = threading.Lock()
+
+    def ignore_current_thread(self):
+        self._ignored_threads.add(threading.get_ident())
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.by_verb = Counter()
+
+    def __enter__(self):
+        event.listen(Engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() in self._ignored_threads:
+            return
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement else "?"
+        with self._lock:
+            self.count += 1
+            self.by_verb[verb] += 1
+
+
+class TaskTimer:
+    """
+    I hang off huey's signals and record how long each task spends executing,
+    which is the basis for worker utilization and per-step timings.
+    """
+
+    def __init__(self):
+        self.busy_seconds = 0.0
+        self.by_task = defaultdict(list)
+        self.outcomes = Counter()
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.busy_seconds = 0.0
+            self.by_task = defaultdict(list)
+            self.outcomes = Counter()
+
+    def connect(self, huey):
+        from huey import signals
+
+        huey.signal(signals.SIGNAL_EXECUTING)(self._on_executing)
+        huey.signal(
+            signals.SIGNAL_COMPLETE,
+            signals.SIGNAL_ERROR,
+            signals.SIGNAL_RETRYING,
+            signals.SIGNAL_CANCELED,
+            signals.SIGNAL_REVOKED,
+        )(self._on_finished)
+
+    def disconnect(self, huey):
+        huey.disconnect_signal(self._on_executing)
+        huey.disconnect_signal(self._on_finished)
+
+    def _on_executing(self, signal, task, *args, **kwargs):
+        with self._lock:
+            self._started[task.id] = time.monotonic()
+
+    def _on_finished(self, signal, task, *args, **kwargs):
+        with self._lock:
+            started = self._started.pop(task.id, None)
+            self.outcomes[signal] += 1
+            if started is None:
+                return
+            elapsed = time.monotonic() - started
+            self.busy_seconds += elapsed
+            self.by_task[task.name].append(elapsed)
+
+    def utilization(self, workers: int, wall_seconds: float) -> float:
+        if not workers or not wall_seconds:
+            return 0.0
+        return self.busy_seconds / (workers * wall_seconds)
+
+
+def git_revision() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name: str, results: dict, path: str = None) -> str:
+    """write results to benchmarks/results/<name>-<revision>-<timestamp>.json"""
+    revision = git_revision()
+    results = dict(results, revision=revision)
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(RESULTS_DIR, f"{name}-{revision}-{timestamp}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True, default=str)
+    return path
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(
+    baseline: dict, current: dict, metrics: list[tuple[str, bool]], tolerance: float
+) -> list[str]:
+    """
+    compare `current` against `baseline` and return a list of regressions.
+
+    `metrics` is a list of (dotted.path, higher_is_better) pairs. A metric regresses
+    when it is worse than the baseline by more than `tolerance` (a fraction).
+    Metrics missing from either side are skipped.
+    """
+    regressions = []
+    for path, higher_is_better in metrics:
+        old, new = _lookup(baseline, path), _lookup(current, path)
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            continue
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(f"{path}: {old:.4g} -> {new:.4g} ({change:+.1%})")
+    return regressions
+
+
+def _lookup(results: dict, path: str):
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
@@ -0,0 +1,77 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubCFAPI:
+    """
+    I stand in for UAA and the CF API, answering the token, space and org
+    requests made while tagging new instances (see broker.lib.cf).
+    """
+
+    def __init__(self, host="localhost", port=8098, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self._answer()
+
+            def do_GET(self):
+                self._answer()
+
+            def _answer(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                body = stub.respond(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @staticmethod
+    def respond(path):
+        if path.startswith("/token"):
+            return {"access_token": "benchmark-token", "expires_in": 3600}
+        match = re.match(r"^/v3/(spaces|organizations)/([^/?]+)", path)
+        if match:
+            kind, guid = match.groups()
+            return {"guid": guid, "name": f"{kind[:-1]}-{guid[:8]}"}
+        url = urlsplit(path)
+        match = re.match(r"^/v3/(spaces|organizations)$", url.path)
+        if match:
+            kind = match.group(1)
+            guids = parse_qs(url.query).get("guids", [""])[0].split(",")
+            return {
+                "resources": [
+                    {"guid": guid, "name": f"{kind[:-1]}-{guid[:8]}"}
+                    for guid in guids
+                    if guid
+                ]
+            }
+        return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,560 @@
+"""
+HTTP load benchmark for the OSBAPI endpoints.
+
+I start `broker.app:create_app()` under gunicorn against the local postgres and
+redis, with pebble-challtestsrv answering the CNAME checks and
+benchmarks.lib.stub_cf standing in for UAA and the CF API. Then I replay Cloud
+Controller traffic at it: provision requests arrive in bursts, and every accepted
+operation is polled with last_operation until it's done. Instances that finish
+provisioning are updated (to add a domain) and then deprovisioned.
+
+No huey workers run. Operations are marked succeeded `--pipeline-seconds` after
+they're accepted, so the polling load matches what CC sees in production.
+
+Run me with `./dev benchmark osbapi [options]`.
+"""
+
+import argparse
+import glob
+import heapq
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from benchmarks.lib import environment
+from benchmarks.lib.metrics import compare, load_results, percentiles, save_results
+from benchmarks.lib.stub_cf import StubCFAPI
+from broker.api import (
+    ALB_PLAN_ID,
+    CDN_DEDICATED_WAF_PLAN_ID,
+    CDN_PLAN_ID,
+    DEDICATED_ALB_PLAN_ID,
+)
+from broker.extensions import config, db
+from broker.models import Operation
+from broker.tasks.huey import huey
+
+logger = logging.getLogger(__name__)
+
+SERVICE_ID = "8c16de31-104a-47b0-ba79-25e747be91d6"
+
+PLAN_IDS = {
+    "alb": ALB_PLAN_ID,
+    "dedicated_alb": DEDICATED_ALB_PLAN_ID,
+    "cdn": CDN_PLAN_ID,
+    "cdn_dedicated_waf": CDN_DEDICATED_WAF_PLAN_ID,
+}
+
+PLAN_PARAMETERS = {
+    "cdn_dedicated_waf": {"alarm_notification_email": "benchmark@example.com"},
+}
+
+ENDPOINTS = ["provision", "last_operation", "update", "deprovision"]
+
+# metrics checked against --baseline: (path in results, higher is better)
+GATED_METRICS = [
+    ("totals.requests_per_second", True),
+    ("db_pool.saturated_fraction", False),
+] + [
+    (f"endpoints.{endpoint}.latency.{pct}", False)
+    for endpoint in ENDPOINTS
+    for pct in ("p50", "p95", "p99")
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.osbapi", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument(
+        "--duration", type=int, default=120, help="seconds to send provision bursts"
+    )
+    parser.add_argument(
+        "--burst-size", type=int, default=50, help="provision requests per burst"
+    )
+    parser.add_argument(
+        "--burst-interval", type=float, default=15, help="seconds between bursts"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5,
+        help="seconds between last_operation polls for each operation",
+    )
+    parser.add_argument(
+        "--pipeline-seconds",
+        type=float,
+        default=30,
+        help="how long each operation stays in progress",
+    )
+    parser.add_argument(
+        "--clients", type=int, default=32, help="concurrent HTTP connections"
+    )
+    parser.add_argument(
+        "--plans",
+        default=",".join(PLAN_IDS),
+        help=f"comma-separated subset of {','.join(PLAN_IDS)}",
+    )
+    parser.add_argument("--gunicorn-workers", type=int, default=3)
+    parser.add_argument(
+        "--gunicorn-threads",
+        type=int,
+        default=1,
+        help="threads per gunicorn worker; more than 1 uses the gthread worker",
+    )
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--cf-api-latency",
+        type=float,
+        default=0.05,
+        help="seconds the stub CF API takes to answer",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=int,
+        default=300,
+        help="seconds to wait for in-flight lifecycles after the last burst",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="where to write results json")
+    parser.add_argument(
+        "--baseline", default=None, help="results json to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fractional regression allowed against --baseline before failing",
+    )
+    args = parser.parse_args(argv)
+    args.plans = [p for p in args.plans.split(",") if p]
+    unknown = set(args.plans) - set(PLAN_IDS)
+    if unknown:
+        parser.error(f"unknown plans: {', '.join(sorted(unknown))}")
+    return args
+
+
+@dataclass(order=True)
+class Tracked:
+    """An operation CC is polling"""
+
+    next_poll: float
+    instance_id: str = field(compare=False)
+    operation_id: str = field(compare=False)
+    endpoint: str = field(compare=False)
+    plan: str = field(compare=False)
+    domains: list = field(compare=False)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.statuses = {endpoint: {} for endpoint in ENDPOINTS}
+        self.lifecycles_completed = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status, elapsed):
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            statuses = self.statuses[endpoint]
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+
+class CloudController:
+    """I make the requests CC would make, and poll what I've started"""
+
+    def __init__(self, args, recorder: Recorder):
+        self.args = args
+        self.recorder = recorder
+        self.base = f"http://127.0.0.1:{args.port}"
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=args.clients, pool_maxsize=args.clients
+        )
+        self.session.mount("http://", adapter)
+        self.session.auth = (config.BROKER_USERNAME, config.BROKER_PASSWORD)
+        self.session.headers["X-Broker-Api-Version"] = "2.13"
+        self.executor = ThreadPoolExecutor(max_workers=args.clients)
+        self.rng = random.Random(args.seed)
+
+        self.polling: list[Tracked] = []
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+
+    def _request(self, endpoint, method, path, **kwargs):
+        started = time.monotonic()
+        try:
+            response = self.session.request(
+                method, f"{self.base}{path}", timeout=60, **kwargs
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        self.recorder.record(endpoint, status, time.monotonic() - started)
+        return response
+
+    def _begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wakeup.notify_all()
+
+    def provision(self):
+        plan = self.rng.choice(self.args.plans)
+        instance_id = str(uuid.uuid4())
+        domains = [f"{instance_id[:8]}.{plan}.example.com"]
+        self._begin()
+        self.executor.submit(self._provision, instance_id, plan, domains)
+
+    def _provision(self, instance_id, plan, domains):
+        environment.add_acme_cnames(domains)
+        body = {
+            "service_id": SERVICE_ID,
+            "plan_id": PLAN_IDS[plan],
+            "organization_guid": next(
+                iter(config.DEDICATED_ALB_LISTENER_ARN_MAP.values())
+            ),
+            "space_guid": str(uuid.uuid4()),
+            "parameters": dict(PLAN_PARAMETERS.get(plan, {}), domains=domains),
+        }
+        response = self._request(
+            "provision",
+            "PUT",
+            f"/v2/service_instances/{instance_id}",
+            params={"accepts_incomplete": "true"},
+            json=body,
+        )
+        self._accepted(response, instance_id, "provision", plan, domains)
+
+    def _update(self, tracked: Tracked):
+        domains = tracked.domains + [f"www.{tracked.domains[0]}"]
+        environment.add_acme_cnames(domains[-1:])
+        body = {
+            "service_id": SERVICE_ID,
+            "plan_id": PLAN_IDS[tracked.plan],
+            "context": {
+                "organization_guid": next(
+                    iter(config.DEDICATED_ALB_LISTENER_ARN_MAP.values())
+                ),
+                "space_guid": str(uuid.uuid4()),
+            },
+            "parameters": {"domains": domains},
+        }
+        response = self._request(
+            "update",
+            "PATCH",
+            f"/v2/service_instances/{tracked.instance_id}",
+            params={"accepts_incomplete": "true"},
+            json=body,
+        )
+        self._accepted(response, tracked.instance_id, "update", tracked.plan, domains)
+
+    def _deprovision(self, tracked: Tracked):
+        response = self._request(
+            "deprovision",
+            "DELETE",
+            f"/v2/service_instances/{tracked.instance_id}",
+            params={
+                "service_id": SERVICE_ID,
+                "plan_id": PLAN_IDS[tracked.plan],
+                "accepts_incomplete": "true",
+            },
+        )
+        self._accepted(
+            response, tracked.instance_id, "deprovision", tracked.plan, tracked.domains
+        )
+
+    def _accepted(self, response, instance_id, endpoint, plan, domains):
+        try:
+            if response is None or response.status_code != 202:
+                return
+            operation_id = response.json()["operation"]
+            with self._lock:
+                self.in_flight += 1
+                heapq.heappush(
+                    self.polling,
+                    Tracked(
+                        time.monotonic() + self.args.poll_interval,
+                        instance_id,
+                        operation_id,
+                        endpoint,
+                        plan,
+                        domains,
+                    ),
+                )
+                self._wakeup.notify_all()
+        finally:
+            self._end()
+
+    def _poll(self, tracked: Tracked):
+        response = self._request(
+            "last_operation",
+            "GET",
+            f"/v2/service_instances/{tracked.instance_id}/last_operation",
+            params={
+                "operation": tracked.operation_id,
+                "service_id": SERVICE_ID,
+                "plan_id": PLAN_IDS[tracked.plan],
+            },
+        )
+        state = None
+        if response is not None and response.status_code == 200:
+            state = response.json().get("state")
+
+        if state == Operation.States.IN_PROGRESS.value or state is None:
+            tracked.next_poll = time.monotonic() + self.args.poll_interval
+            with self._lock:
+                heapq.heappush(self.polling, tracked)
+                self._wakeup.notify_all()
+            return
+
+        if state == Operation.States.SUCCEEDED.value:
+            if tracked.endpoint == "provision":
+                self._update(tracked)
+                return
+            if tracked.endpoint == "update":
+                self._deprovision(tracked)
+                return
+            with self._lock:
+                self.recorder.lifecycles_completed += 1
+        self._end()
+
+    def run_poller(self, stop: threading.Event):
+        """hand due polls to the executor until told to stop"""
+        while not stop.is_set():
+            with self._lock:
+                now = time.monotonic()
+                if not self.polling or self.polling[0].next_poll > now:
+                    timeout = self.polling[0].next_poll - now if self.polling else 0.5
+                    self._wakeup.wait(min(timeout, 0.5))
+                    continue
+                tracked = heapq.heappop(self.polling)
+            self.executor.submit(self._poll, tracked)
+
+    def idle(self):
+        with self._lock:
+            return self.in_flight == 0
+
+
+def complete_operations(app, pipeline_seconds, stop: threading.Event):
+    """
+    play the part of the workers: mark operations succeeded once they've been
+    in progress for `pipeline_seconds`
+    """
+    with app.app_context():
+        while not stop.wait(0.5):
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=pipeline_seconds)
+            db.session.execute(
+                db.update(Operation)
+                .where(
+                    Operation.state == Operation.States.IN_PROGRESS.value,
+                    Operation.created_at <= cutoff,
+                )
+                .values(state=Operation.States.SUCCEEDED.value)
+            )
+            db.session.commit()
+
+
+def start_gunicorn(args, stats_dir):
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-b",
+        f"127.0.0.1:{args.port}",
+        "-c",
+        os.path.join(os.path.dirname(__file__), "lib", "gunicorn_hooks.py"),
+        "--workers",
+        str(args.gunicorn_workers),
+        "--threads",
+        str(args.gunicorn_threads),
+        "--log-level",
+        "warning",
+        "broker.app:create_app()",
+    ]
+    env = dict(os.environ, BENCHMARK_POOL_STATS_DIR=stats_dir)
+    server = subprocess.Popen(command, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{args.port}/ping").ok:
+                return server
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("gunicorn did not start")
+
+
+def stop_gunicorn(server):
+    server.terminate()
+    server.wait(timeout=60)
+
+
+def summarize_pool(stats_dir) -> dict:
+    workers = []
+    for path in glob.glob(os.path.join(stats_dir, "*.json")):
+        with open(path) as f:
+            workers.append(json.load(f))
+    samples = sum(w["samples"] for w in workers)
+    return {
+        "workers": len(workers),
+        "pool_size": workers[0]["pool_size"] if workers else None,
+        "max_overflow": workers[0]["max_overflow"] if workers else None,
+        "peak_checked_out": max((w["peak_checked_out"] for w in workers), default=0),
+        "mean_checked_out": (
+            sum(w["checked_out_total"] for w in workers) / samples if samples else 0
+        ),
+        "saturated_fraction": (
+            sum(w["saturated_samples"] for w in workers) / samples if samples else 0
+        ),
+        "checkouts": sum(w["checkouts"] for w in workers),
+    }
+
+
+def print_report(results: dict):
+    print(
+        f"\n{'endpoint':<16} {'requests':>8} {'req/s':>7} {'p50':>7} "
+        f"{'p95':>7} {'p99':>7} {'max':>7}  statuses"
+    )
+    for endpoint, summary in results["endpoints"].items():
+        latency = summary["latency"]
+        if not latency["count"]:
+            continue
+        print(
+            f"{endpoint:<16} {latency['count']:>8} "
+            f"{summary['requests_per_second']:>7.1f} "
+            f"{latency['p50'] * 1000:>6.0f}ms {latency['p95'] * 1000:>6.0f}ms "
+            f"{latency['p99'] * 1000:>6.0f}ms {latency['max'] * 1000:>6.0f}ms  "
+            f"{summary['statuses']}"
+        )
+    pool = results["db_pool"]
+    print(
+        f"\ndb pool: {pool['workers']} workers, size {pool['pool_size']} "
+        f"+ {pool['max_overflow']} overflow, peak {pool['peak_checked_out']}, "
+        f"mean {pool['mean_checked_out']:.2f}, "
+        f"saturated {pool['saturated_fraction']:.1%} of samples"
+    )
+    totals = results["totals"]
+    print(
+        f"{totals['requests']} requests in {totals['wall_seconds']:.1f}s "
+        f"({totals['requests_per_second']:.1f}/s), "
+        f"{totals['lifecycles_completed']} instance lifecycles completed"
+    )
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    environment.require_benchmark_env()
+    logging.basicConfig(level=logging.WARNING)
+
+    app = environment.make_app()
+    environment.reset_state(app, huey.storage.conn)
+
+    stub_cf = StubCFAPI(latency=args.cf_api_latency)
+    stub_cf.start()
+    stats_dir = tempfile.mkdtemp(prefix="osbapi-pool-")
+    server = start_gunicorn(args, stats_dir)
+
+    recorder = Recorder()
+    cc = CloudController(args, recorder)
+    stop = threading.Event()
+    background = [
+        threading.Thread(target=cc.run_poller, args=(stop,), daemon=True),
+        threading.Thread(
+            target=complete_operations,
+            args=(app, args.pipeline_seconds, stop),
+            daemon=True,
+        ),
+    ]
+    for thread in background:
+        thread.start()
+
+    started = time.monotonic()
+    try:
+        next_burst = started
+        while time.monotonic() - started < args.duration:
+            for _ in range(args.burst_size):
+                cc.provision()
+            next_burst += args.burst_interval
+            time.sleep(max(next_burst - time.monotonic(), 0))
+
+        deadline = time.monotonic() + args.drain_timeout
+        while not cc.idle() and time.monotonic() < deadline:
+            time.sleep(0.5)
+        wall = time.monotonic() - started
+    finally:
+        stop.set()
+        cc.executor.shutdown(wait=True, cancel_futures=True)
+        stop_gunicorn(server)
+        stub_cf.stop()
+
+    results = {
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "duration",
+                "burst_size",
+                "burst_interval",
+                "poll_interval",
+                "pipeline_seconds",
+                "clients",
+                "plans",
+                "gunicorn_workers",
+                "gunicorn_threads",
+                "cf_api_latency",
+            )
+        },
+        "endpoints": {
+            endpoint: {
+                "latency": percentiles(recorder.latencies[endpoint]),
+                "requests_per_second": len(recorder.latencies[endpoint]) / wall,
+                "statuses": recorder.statuses[endpoint],
+            }
+            for endpoint in ENDPOINTS
+        },
+        "db_pool": summarize_pool(stats_dir),
+        "cf_api_requests": stub_cf.requests,
+    }
+    requests_sent = sum(len(samples) for samples in recorder.latencies.values())
+    results["totals"] = {
+        "requests": requests_sent,
+        "wall_seconds": wall,
+        "requests_per_second": requests_sent / wall,
+        "lifecycles_completed": recorder.lifecycles_completed,
+        "unfinished": 0 if cc.idle() else cc.in_flight,
+    }
+
+    print_report(results)
+    path = save_results("osbapi", results, args.output)
+    print(f"results written to {path}")
+
+    status = 0
+    if args.baseline:
+        regressions = compare(
+            load_results(args.baseline), results, GATED_METRICS, args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
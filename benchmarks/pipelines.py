@@ -0,0 +1,488 @@
+"""
+End-to-end pipeline load benchmark.
+
+I create a batch of service instances across plans and drive them through
+provision -> update -> renew -> deprovision, with real huey workers, real
+postgres and redis, and real pebble for ACME. AWS is replaced by
+benchmarks.lib.fake_aws.FakeAWSBackend, which answers after a configurable
+latency and can inject throttling and failures.
+
+Run me with `./dev benchmark pipelines [options]`, or `python -m benchmarks.pipelines`
+in a container where `docker/start-servers.sh` has run and FLASK_ENV=benchmark.
+"""
+
+import argparse
+import logging
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+
+from benchmarks.lib import environment
+from benchmarks.lib.fake_aws import FakeAWSBackend, FaultProfile
+from benchmarks.lib.metrics import (
+    QueryCounter,
+    TaskTimer,
+    compare,
+    load_results,
+    percentiles,
+    save_results,
+)
+from broker.extensions import config, db
+from broker.lib.cdn import provision_cdn_instance, update_cdn_instance
+from broker.lib.tags import create_resource_tags, generate_tags
+from broker.models import (
+    ALBServiceInstance,
+    CDNDedicatedWAFServiceInstance,
+    DedicatedALBServiceInstance,
+    Operation,
+    ServiceInstance,
+)
+from broker.pipelines.alb import (
+    queue_all_alb_deprovision_tasks_for_operation,
+    queue_all_alb_provision_tasks_for_operation,
+    queue_all_alb_renewal_tasks_for_operation,
+    queue_all_alb_update_tasks_for_operation,
+)
+from broker.pipelines.cdn import (
+    queue_all_cdn_deprovision_tasks_for_operation,
+    queue_all_cdn_provision_tasks_for_operation,
+    queue_all_cdn_renewal_tasks_for_operation,
+    queue_all_cdn_update_tasks_for_operation,
+)
+from broker.pipelines.cdn_dedicated_waf import (
+    queue_all_cdn_dedicated_waf_deprovision_tasks_for_operation,
+    queue_all_cdn_dedicated_waf_provision_tasks_for_operation,
+    queue_all_cdn_dedicated_waf_update_tasks_for_operation,
+)
+from broker.pipelines.dedicated_alb import (
+    queue_all_dedicated_alb_provision_tasks_for_operation,
+    queue_all_dedicated_alb_renewal_tasks_for_operation,
+    queue_all_dedicated_alb_update_tasks_for_operation,
+)
+from broker.tasks.huey import huey
+
+logger = logging.getLogger(__name__)
+
+PHASES = ["provision", "update", "renew", "deprovision"]
+
+# metrics checked against --baseline: (path in results, higher is better)
+GATED_METRICS = [
+    ("totals.operations_per_second", True),
+    ("totals.queries_per_operation", False),
+    ("totals.aws_calls_per_operation", False),
+] + [
+    (f"phases.{phase}.time_to_complete.{pct}", False)
+    for phase in PHASES
+    for pct in ("p50", "p95")
+]
+
+
+@dataclass
+class Plan:
+    name: str
+    create: Callable[[str, list[str]], ServiceInstance]
+    queues: dict[str, Callable]
+    update: Callable[[ServiceInstance], ServiceInstance] = lambda instance: instance
+
+
+def _cdn(instance_id, domain_names):
+    return provision_cdn_instance(instance_id, domain_names, {})
+
+
+def _cdn_dedicated_waf(instance_id, domain_names):
+    return provision_cdn_instance(
+        instance_id,
+        domain_names,
+        {"alarm_notification_email": "benchmark@example.com"},
+        instance_type_model=CDNDedicatedWAFServiceInstance,
+    )
+
+
+def _alb(instance_id, domain_names):
+    return ALBServiceInstance(id=instance_id, domain_names=domain_names)
+
+
+def _dedicated_alb(instance_id, domain_names):
+    org = next(iter(config.DEDICATED_ALB_LISTENER_ARN_MAP.values()))
+    return DedicatedALBServiceInstance(
+        id=instance_id, domain_names=domain_names, org_id=org
+    )
+
+
+def _update_cdn(instance):
+    return update_cdn_instance({}, instance)
+
+
+# the same pipelines the API and the cron jobs queue for each plan
+PLANS = {
+    "alb": Plan(
+        name="alb",
+        create=_alb,
+        queues={
+            "provision": queue_all_alb_provision_tasks_for_operation,
+            "update": queue_all_alb_update_tasks_for_operation,
+            "renew": queue_all_alb_renewal_tasks_for_operation,
+            "deprovision": queue_all_alb_deprovision_tasks_for_operation,
+        },
+    ),
+    "dedicated_alb": Plan(
+        name="dedicated_alb",
+        create=_dedicated_alb,
+        queues={
+            "provision": queue_all_dedicated_alb_provision_tasks_for_operation,
+            "update": queue_all_dedicated_alb_update_tasks_for_operation,
+            "renew": queue_all_dedicated_alb_renewal_tasks_for_operation,
+            "deprovision": queue_all_alb_deprovision_tasks_for_operation,
+        },
+    ),
+    "cdn": Plan(
+        name="cdn",
+        create=_cdn,
+        update=_update_cdn,
+        queues={
+            "provision": queue_all_cdn_provision_tasks_for_operation,
+            "update": queue_all_cdn_update_tasks_for_operation,
+            "renew": queue_all_cdn_renewal_tasks_for_operation,
+            "deprovision": queue_all_cdn_deprovision_tasks_for_operation,
+        },
+    ),
+    "cdn_dedicated_waf": Plan(
+        name="cdn_dedicated_waf",
+        create=_cdn_dedicated_waf,
+        update=_update_cdn,
+        queues={
+            "provision": queue_all_cdn_dedicated_waf_provision_tasks_for_operation,
+            "update": queue_all_cdn_dedicated_waf_update_tasks_for_operation,
+            "renew": queue_all_cdn_renewal_tasks_for_operation,
+            "deprovision": queue_all_cdn_dedicated_waf_deprovision_tasks_for_operation,
+        },
+    ),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.pipelines", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument(
+        "-n", "--instances", type=int, default=20, help="instances per plan"
+    )
+    parser.add_argument("-w", "--workers", type=int, default=8, help="huey workers")
+    parser.add_argument(
+        "--plans",
+        default=",".join(PLANS),
+        help=f"comma-separated subset of {','.join(PLANS)}",
+    )
+    parser.add_argument(
+        "--phases", default=",".join(PHASES), help="comma-separated subset of phases"
+    )
+    parser.add_argument(
+        "--aws",
+        default="",
+        metavar="SPEC",
+        help="default AWS fault profile, e.g. latency=0.2,jitter=0.5,throttle_rate=0.01",
+    )
+    parser.add_argument(
+        "--override",
+        action="append",
+        default=[],
+        metavar="SERVICE[.Operation]=SPEC",
+        help="per-service or per-operation fault profile, "
+        "e.g. 'cloudfront.GetDistribution=latency=1.5'. May be repeated",
+    )
+    parser.add_argument(
+        "--listener-certificate-quota",
+        type=int,
+        default=None,
+        help="make AddListenerCertificates fail past this many certs per listener",
+    )
+    parser.add_argument(
+        "--retry-delay",
+        type=int,
+        default=1,
+        help="seconds between task retries (production is 600)",
+    )
+    parser.add_argument(
+        "--timeout", type=int, default=1800, help="seconds to wait for each phase"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="where to write results json")
+    parser.add_argument(
+        "--baseline", default=None, help="results json to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fractional regression allowed against --baseline before failing",
+    )
+    args = parser.parse_args(argv)
+
+    args.plans = [p for p in args.plans.split(",") if p]
+    unknown = set(args.plans) - set(PLANS)
+    if unknown:
+        parser.error(f"unknown plans: {', '.join(sorted(unknown))}")
+    args.phases = [p for p in PHASES if p in args.phases.split(",")]
+
+    args.profile = FaultProfile.parse(args.aws)
+    args.overrides = {}
+    for override in args.override:
+        target, _, spec = override.partition("=")
+        args.overrides[target] = FaultProfile.parse(spec, default=args.profile)
+    return args
+
+
+def set_retry_delay(seconds: int):
+    """
+    Retriable tasks wait 10 minutes between attempts, which would make any
+    injected failure dominate the run.
+    """
+    for task_class in huey._registry._registry.values():
+        if task_class.default_retries:
+            task_class.default_retry_delay = seconds
+
+
+class Run:
+    def __init__(self, args, app):
+        self.args = args
+        self.app = app
+        self.instances: dict[str, list[str]] = {}  # instance id -> domains
+        self.plan_for: dict[str, Plan] = {}
+
+    def create_instances(self):
+        for plan_name in self.args.plans:
+            plan = PLANS[plan_name]
+            for _ in range(self.args.instances):
+                instance_id = str(uuid.uuid4())
+                self.instances[instance_id] = [
+                    f"{instance_id[:8]}.{plan_name}.example.com"
+                ]
+                self.plan_for[instance_id] = plan
+        environment.add_acme_cnames(
+            [d for domains in self.instances.values() for d in domains]
+        )
+
+    def start_phase(self, phase) -> dict[int, tuple[str, float]]:
+        """create operations for every instance and queue them, like the API does"""
+        operations = []
+        with self.app.app_context():
+            for instance_id, domain_names in self.instances.items():
+                plan = self.plan_for[instance_id]
+                if phase == "provision":
+                    instance = plan.create(instance_id, domain_names)
+                    instance.tags = create_resource_tags(
+                        generate_tags(config.FLASK_ENV, instance_guid=instance_id)
+                    )
+                else:
+                    instance = db.session.get(ServiceInstance, instance_id)
+                if phase == "update":
+                    new_domain = f"www.{domain_names[0]}"
+                    environment.add_acme_cnames([new_domain])
+                    domain_names.append(new_domain)
+                    instance.domain_names = list(domain_names)
+                    instance = plan.update(instance)
+                operation = Operation(
+                    state=Operation.States.IN_PROGRESS.value,
+                    service_instance=instance,
+                    action=_action_for(phase).value,
+                    step_description="Queuing tasks",
+                )
+                db.session.add(instance)
+                db.session.add(operation)
+                operations.append((operation, plan))
+            db.session.commit()
+
+            queued = {}
+            for operation, plan in operations:
+                queue = plan.queues[phase]
+                if phase == "renew":
+                    queue(operation.id)
+                else:
+                    queue(operation.id, f"benchmark-{phase}")
+                queued[operation.id] = (plan.name, time.monotonic())
+        return queued
+
+    def wait_for(self, queued: dict[int, tuple[str, float]]) -> dict:
+        pending = dict(queued)
+        finished = {}
+        deadline = time.monotonic() + self.args.timeout
+        with self.app.app_context():
+            while pending and time.monotonic() < deadline:
+                rows = db.session.execute(
+                    db.select(Operation.id, Operation.state).where(
+                        Operation.id.in_(pending)
+                    )
+                ).all()
+                now = time.monotonic()
+                for operation_id, state in rows:
+                    if state != Operation.States.IN_PROGRESS.value:
+                        plan_name, started = pending.pop(operation_id)
+                        finished[operation_id] = (plan_name, state, now - started)
+                db.session.rollback()
+                time.sleep(0.25)
+        for operation_id, (plan_name, _) in pending.items():
+            finished[operation_id] = (plan_name, "timed out", None)
+        return finished
+
+
+def _action_for(phase):
+    return {
+        "provision": Operation.Actions.PROVISION,
+        "update": Operation.Actions.UPDATE,
+        "renew": Operation.Actions.RENEW,
+        "deprovision": Operation.Actions.DEPROVISION,
+    }[phase]
+
+
+def summarize_phase(finished: dict, wall: float, timer, queries, workers) -> dict:
+    by_plan = {}
+    states = {}
+    for plan_name, state, elapsed in finished.values():
+        states[state] = states.get(state, 0) + 1
+        if elapsed is not None and state == Operation.States.SUCCEEDED.value:
+            by_plan.setdefault(plan_name, []).append(elapsed)
+    return {
+        "operations": len(finished),
+        "states": states,
+        "wall_seconds": wall,
+        "operations_per_second": len(finished) / wall if wall else 0,
+        "time_to_complete": percentiles(
+            [elapsed for samples in by_plan.values() for elapsed in samples]
+        ),
+        "time_to_complete_by_plan": {
+            plan_name: percentiles(samples) for plan_name, samples in by_plan.items()
+        },
+        "worker_utilization": timer.utilization(workers, wall),
+        "task_outcomes": dict(timer.outcomes),
+        "task_seconds": {
+            name: percentiles(samples) for name, samples in timer.by_task.items()
+        },
+        "queries": queries.count,
+        "queries_by_verb": dict(queries.by_verb),
+    }
+
+
+def print_report(results: dict):
+    print(
+        f"\n{'phase':<12} {'ops':>5} {'ops/s':>7} {'p50':>7} {'p95':>7} "
+        f"{'p99':>7} {'util':>5} {'queries':>8}  states"
+    )
+    for phase, summary in results["phases"].items():
+        ttc = summary["time_to_complete"]
+        print(
+            f"{phase:<12} {summary['operations']:>5} "
+            f"{summary['operations_per_second']:>7.2f} "
+            f"{ttc.get('p50', 0):>7.1f} {ttc.get('p95', 0):>7.1f} "
+            f"{ttc.get('p99', 0):>7.1f} {summary['worker_utilization']:>5.0%} "
+            f"{summary['queries']:>8}  {summary['states']}"
+        )
+        for plan_name, plan_ttc in summary["time_to_complete_by_plan"].items():
+            print(
+                f"  {plan_name:<18} p50={plan_ttc['p50']:.1f}s "
+                f"p95={plan_ttc['p95']:.1f}s p99={plan_ttc['p99']:.1f}s"
+            )
+    totals = results["totals"]
+    print(
+        f"\n{totals['operations']} operations in {totals['wall_seconds']:.1f}s, "
+        f"{totals['queries_per_operation']:.1f} queries/op, "
+        f"{totals['aws_calls_per_operation']:.1f} AWS calls/op, "
+        f"{totals['failed']} not succeeded"
+    )
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    environment.require_benchmark_env()
+    logging.basicConfig(level=logging.WARNING)
+
+    app = environment.make_app()
+    environment.reset_state(app, huey.storage.conn)
+    environment.seed_dedicated_albs(app)
+    set_retry_delay(args.retry_delay)
+
+    backend = FakeAWSBackend(
+        args.profile,
+        args.overrides,
+        challtestsrv=environment.CHALLTESTSRV,
+        listener_certificate_quota=args.listener_certificate_quota,
+        seed=args.seed,
+    )
+    backend.install(environment.aws_clients())
+
+    timer = TaskTimer()
+    timer.connect(huey)
+    run = Run(args, app)
+    run.create_instances()
+
+    consumer = huey.create_consumer(
+        workers=args.workers, worker_type="thread", periodic=False
+    )
+    results = {
+        "config": {
+            "instances_per_plan": args.instances,
+            "workers": args.workers,
+            "plans": args.plans,
+            "aws": vars(args.profile),
+            "overrides": {k: vars(v) for k, v in args.overrides.items()},
+            "retry_delay": args.retry_delay,
+        },
+        "phases": {},
+    }
+
+    with QueryCounter() as queries:
+        queries.ignore_current_thread()
+        consumer.start()
+        try:
+            for phase in args.phases:
+                timer.reset()
+                queries.reset()
+                started = time.monotonic()
+                queued = run.start_phase(phase)
+                finished = run.wait_for(queued)
+                wall = time.monotonic() - started
+                results["phases"][phase] = summarize_phase(
+                    finished, wall, timer, queries, args.workers
+                )
+        finally:
+            consumer.stop(graceful=True)
+            timer.disconnect(huey)
+            backend.uninstall()
+
+    phases = results["phases"].values()
+    operations = sum(p["operations"] for p in phases)
+    wall = sum(p["wall_seconds"] for p in phases)
+    results["aws"] = backend.summary()
+    results["totals"] = {
+        "operations": operations,
+        "wall_seconds": wall,
+        "operations_per_second": operations / wall if wall else 0,
+        "queries_per_operation": sum(p["queries"] for p in phases) / max(operations, 1),
+        "aws_calls_per_operation": sum(backend.calls.values()) / max(operations, 1),
+        "failed": sum(
+            count
+            for p in phases
+            for state, count in p["states"].items()
+            if state != Operation.States.SUCCEEDED.value
+        ),
+    }
+
+    print_report(results)
+    path = save_results("pipelines", results, args.output)
+    print(f"results written to {path}")
+
+    status = 0
+    if args.baseline:
+        regressions = compare(
+            load_results(args.baseline), results, GATED_METRICS, args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""
+Benchmarks for the queries that scale with fleet size and history.
+
+With `--generate`, I rebuild the benchmark database from the migrations and fill it
+with a synthetic fleet (benchmarks.lib.fleet), 100k instances by default. Then I
+time each query and capture EXPLAIN ANALYZE for every SQL statement it issues.
+
+The dataset persists between runs, so you only need `--generate` once. Running
+`pipelines` or `osbapi` wipes it.
+
+Run me with `./dev benchmark queries [--generate] [options]`.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import uuid
+from dataclasses import fields
+
+from flask_migrate import Migrate, upgrade
+from openbrokerapi import errors
+from sqlalchemy import event, text
+
+from benchmarks.lib import environment
+from benchmarks.lib.fleet import FleetSpec, generate
+from benchmarks.lib.metrics import compare, load_results, percentiles, save_results
+from broker.commands.duplicate_certs import find_duplicate_alb_certs
+from broker.extensions import db
+from broker.models import (
+    ALBServiceInstance,
+    DedicatedALBListener,
+    DedicatedALBServiceInstance,
+    ServiceInstance,
+)
+from broker.tasks.alb import get_potential_listeners_for_dedicated_instance
+from broker.tasks.cron import get_expiring_certs, scan_for_stalled_pipelines
+from broker.tasks.huey import huey
+from broker.validators import UniqueDomains
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.queries", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument(
+        "--generate",
+        action="store_true",
+        help="rebuild the schema and generate a new dataset first",
+    )
+    for spec_field in fields(FleetSpec):
+        parser.add_argument(
+            f"--{spec_field.name.replace('_', '-')}",
+            type=spec_field.type,
+            default=spec_field.default,
+            help=f"dataset: {spec_field.name.replace('_', ' ')} "
+            f"(default {spec_field.default})",
+        )
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="timed runs of each query"
+    )
+    parser.add_argument(
+        "--only", default=None, help="comma-separated benchmark names to run"
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="print the EXPLAIN ANALYZE plans, not just the timings",
+    )
+    parser.add_argument("--output", default=None, help="where to write results json")
+    parser.add_argument(
+        "--baseline", default=None, help="results json to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fractional regression allowed against --baseline before failing",
+    )
+    return parser.parse_args(argv)
+
+
+def rebuild_schema(app):
+    Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+        upgrade(directory=MIGRATIONS)
+
+
+class StatementCapture:
+    """I record the SQL statements (and their parameters) issued while I'm active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._capture)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._capture)
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+
+def samples():
+    """pick realistic arguments for the parameterized queries"""
+    active = (
+        db.session.execute(
+            db.select(ServiceInstance)
+            .where(ServiceInstance.deactivated_at.is_(None))
+            .order_by(ServiceInstance.id)
+            .limit(1)
+        )
+        .scalars()
+        .one()
+    )
+    busiest_org = db.session.execute(
+        db.select(DedicatedALBListener.dedicated_org)
+        .group_by(DedicatedALBListener.dedicated_org)
+        .order_by(db.func.count().desc())
+        .limit(1)
+    ).scalar_one()
+    return {
+        "taken_domain": active.domain_names[0],
+        "instance_id": active.id,
+        "free_domain": f"{uuid.uuid4()}.example.gov",
+        "org": busiest_org,
+    }
+
+
+def _unique_domains(domain, ignore_instance_id=None):
+    ignore = None
+    if ignore_instance_id:
+        ignore = db.session.get(ServiceInstance, ignore_instance_id)
+    try:
+        UniqueDomains([domain]).validate(ignore_instance=ignore)
+    except errors.ErrBadRequest:
+        pass
+
+
+def benchmarks(sample) -> dict:
+    return {
+        "get_expiring_certs": get_expiring_certs,
+        "scan_for_stalled_pipelines": scan_for_stalled_pipelines,
+        "UniqueDomains.taken": lambda: _unique_domains(sample["taken_domain"]),
+        "UniqueDomains.free": lambda: _unique_domains(sample["free_domain"]),
+        "UniqueDomains.update": lambda: _unique_domains(
+            sample["taken_domain"], sample["instance_id"]
+        ),
+        "find_duplicate_alb_certs.alb": lambda: find_duplicate_alb_certs(
+            ALBServiceInstance
+        ),
+        "find_duplicate_alb_certs.dedicated_alb": lambda: find_duplicate_alb_certs(
+            DedicatedALBServiceInstance
+        ),
+        "get_potential_listeners_for_dedicated_instance": lambda: (
+            get_potential_listeners_for_dedicated_instance(
+                DedicatedALBServiceInstance(org_id=sample["org"])
+            )
+        ),
+    }
+
+
+def explain(statements) -> list[dict]:
+    plans = []
+    seen = set()
+    with db.engine.connect() as connection:
+        for statement, parameters in statements:
+            if statement in seen or not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            seen.add(statement)
+            rows = connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters
+            ).all()
+            plans.append(
+                {"statement": statement, "plan": "\n".join(row[0] for row in rows)}
+            )
+    return plans
+
+
+def run_benchmark(function, repeat) -> dict:
+    # once to warm the caches, and to see what SQL it sends
+    with StatementCapture(db.engine) as capture:
+        result = function()
+    db.session.remove()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+        db.session.remove()
+
+    return {
+        "seconds": percentiles(timings),
+        "rows": len(result) if isinstance(result, list) else None,
+        "statements": len(capture.statements),
+        "plans": explain(capture.statements),
+    }
+
+
+def table_sizes() -> dict:
+    rows = db.session.execute(
+        text(
+            "SELECT relname, n_live_tup, pg_total_relation_size(relid) "
+            "FROM pg_stat_user_tables ORDER BY relname"
+        )
+    ).all()
+    return {name: {"rows": live, "bytes": size} for name, live, size in rows}
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    environment.require_benchmark_env()
+    logging.basicConfig(level=logging.WARNING)
+
+    app = environment.make_app()
+    spec = FleetSpec(**{f.name: getattr(args, f.name) for f in fields(FleetSpec)})
+
+    if args.generate:
+        huey.storage.conn.flushall()
+        rebuild_schema(app)
+        started = time.monotonic()
+        with app.app_context():
+            connection = db.engine.raw_connection()
+            try:
+                counts = generate(connection, spec)
+            finally:
+                connection.close()
+        print(f"generated {counts} in {time.monotonic() - started:.0f}s")
+
+    results = {"benchmarks": {}}
+    with app.app_context():
+        results["tables"] = table_sizes()
+        sample = samples()
+        selected = benchmarks(sample)
+        if args.only:
+            selected = {
+                name: function
+                for name, function in selected.items()
+                if name in args.only.split(",")
+            }
+        for name, function in selected.items():
+            results["benchmarks"][name] = run_benchmark(function, args.repeat)
+
+    print(f"\n{'query':<50} {'p50':>9} {'p95':>9} {'max':>9} {'rows':>7} {'stmts':>5}")
+    for name, result in results["benchmarks"].items():
+        seconds = result["seconds"]
+        print(
+            f"{name:<50} {seconds['p50'] * 1000:>7.1f}ms "
+            f"{seconds['p95'] * 1000:>7.1f}ms {seconds['max'] * 1000:>7.1f}ms "
+            f"{result['rows'] if result['rows'] is not None else '-':>7} "
+            f"{result['statements']:>5}"
+        )
+        if args.explain:
+            for plan in result["plans"]:
+                print(f"\n{plan['statement']}\n\n{plan['plan']}\n")
+
+    path = save_results("queries", results, args.output)
+    print(f"results written to {path}")
+
+    status = 0
+    if args.baseline:
+        regressions = compare(
+            load_results(args.baseline),
+            results,
+            [
+                (f"benchmarks.{name}.seconds.p50", False)
+                for name in results["benchmarks"]
+            ],
+            args.tolerance,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
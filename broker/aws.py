@@ -1,6 +1,9 @@
 import boto3
+from redis import Redis
 
-from broker.extensions import config
+from broker.extensions import config, connection_pool
+from broker.lib.circuit_breaker import CircuitBreaker
+from broker.lib.rate_limit import RateLimiter
 
 commercial_session = boto3.Session(
     region_name=config.AWS_COMMERCIAL_REGION,
@@ -32,3 +35,43 @@ alb = govcloud_session.client("elbv2")
 # iam for albs needs to be govcloud
 iam_govcloud = govcloud_session.client("iam")
 wafv2_govcloud = govcloud_session.client("wafv2")
+
+
+def _watch(partition, *clients):
+    """
+    Put each client's calls behind a circuit breaker for its service, and the rate
+    limits for the partition's account. Each partition has its own credentials, and
+    so its own account.
+    """
+    conn = Redis(connection_pool=connection_pool)
+    rate_limiter = RateLimiter(
+        conn,
+        partition,
+        config.AWS_RATE_LIMITS,
+        max_wait=config.AWS_RATE_LIMIT_MAX_WAIT,
+    )
+    for client in clients:
+        CircuitBreaker(
+            conn,
+            partition,
+            client.meta.service_model.service_id.hyphenize(),
+            error_rate=config.AWS_CIRCUIT_BREAKER_ERROR_RATE,
+            min_calls=config.AWS_CIRCUIT_BREAKER_MIN_CALLS,
+            window=config.AWS_CIRCUIT_BREAKER_WINDOW,
+            cool_down=config.AWS_CIRCUIT_BREAKER_COOL_DOWN,
+        ).watch(client)
+        # after the breaker, so calls to a broken service don't wait for a token
+        rate_limiter.watch(client)
+
+
+_watch(
+    "commercial",
+    route53,
+    iam_commercial,
+    cloudfront,
+    shield,
+    wafv2_commercial,
+    cloudwatch_commercial,
+    sns_commercial,
+)
+_watch("govcloud", alb, iam_govcloud, wafv2_govcloud)
@@ -5,7 +5,12 @@ from sqlalchemy import func, select, desc
 
 from broker.aws import alb, iam_govcloud
 from broker.extensions import config, db
-from broker.models import ALBServiceInstance, DedicatedALBServiceInstance, Certificate
+from broker.models import (
+    ALBListener,
+    ALBServiceInstance,
+    DedicatedALBServiceInstance,
+    Certificate,
+)
 from broker.tasks.iam import _delete_server_certificate
 
 logger = logging.getLogger(__name__)
@@ -151,6 +156,7 @@ def delete_cert_record_and_resource(
             remove_certificate_from_listener_and_verify_removal(
                 listener_arn, certificate.iam_server_certificate_arn, alb=alb
             )
+            ALBListener.certificate_removed(listener_arn)
 
         if certificate.iam_server_certificate_name:
             _delete_server_certificate(iam_govcloud, certificate)
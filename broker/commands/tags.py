@@ -2,7 +2,11 @@ import logging
 
 from broker.aws import wafv2_govcloud
 from broker.extensions import config, db
-from broker.lib.tags import create_resource_tags, generate_tags
+from broker.lib.tags import (
+    create_resource_tags,
+    generate_tags,
+    prefetch_organization_names,
+)
 from broker.models import DedicatedALB
 
 logger = logging.getLogger(__name__)
@@ -10,6 +14,13 @@ logger = logging.getLogger(__name__)
 
 def add_dedicated_alb_tags():
     dedicated_albs = DedicatedALB.query.all()
+    prefetch_organization_names(
+        [
+            dedicated_alb.dedicated_org
+            for dedicated_alb in dedicated_albs
+            if dedicated_alb.dedicated_org and not dedicated_alb.tags
+        ]
+    )
 
     for dedicated_alb in dedicated_albs:
         if dedicated_alb.tags:
@@ -18,6 +18,7 @@ def env_mappings():
         "check-duplicate-certs": CheckDuplicateCertsConfig,
         "local-debugging": LocalDebuggingConfig,
         "remove-duplicate-certs": RemoveDuplicateCertsConfig,
+        "benchmark": BenchmarkConfig,
     }
 
 
@@ -33,9 +34,14 @@ class Config:
     ALB_IAM_SERVER_CERTIFICATE_PREFIX: str
     ALB_LISTENER_ARNS: list[str]
     ALB_OVERLAP_SLEEP_TIME: int
+    ALB_REBALANCE_MAX_MOVES: int
     ALB_WAF_CLOUDWATCH_LOG_GROUP_ARN: str
     ALLOWED_AWS_MANAGED_CACHE_POLICIES: list[str]
     ALLOWED_AWS_MANAGED_ORIGIN_VIEWER_REQUEST_POLICIES: list[str]
+    AWS_CIRCUIT_BREAKER_COOL_DOWN: int
+    AWS_CIRCUIT_BREAKER_ERROR_RATE: float
+    AWS_CIRCUIT_BREAKER_MIN_CALLS: int
+    AWS_CIRCUIT_BREAKER_WINDOW: int
     AWS_COMMERCIAL_ACCESS_KEY_ID: str
     AWS_COMMERCIAL_GLOBAL_REGION: str
     AWS_COMMERCIAL_REGION: str
@@ -45,7 +51,10 @@ class Config:
     AWS_GOVCLOUD_SECRET_ACCESS_KEY: str
     AWS_RESOURCE_PREFIX: str
     AWS_POLL_MAX_ATTEMPTS: int
+    AWS_RATE_LIMIT_MAX_WAIT: int
+    AWS_RATE_LIMITS: dict[str, float]
     AWS_POLL_WAIT_TIME_IN_SECONDS: int
+    AWS_MAX_CONCURRENT_REQUESTS: int
     BROKER_PASSWORD: str
     BROKER_USERNAME: str
     CDN_LOG_BUCKET: str
@@ -64,14 +73,23 @@ class Config:
     IGNORE_DUPLICATE_DOMAINS: bool
     FLASK_ENV: str
     MAX_CERTS_PER_ALB: int
+    MAX_CERTS_PER_LISTENER: int
+    PIPELINE_HEARTBEAT_INTERVAL: int
+    PIPELINE_HEARTBEAT_TTL: int
+    PIPELINE_PARALLEL_BRANCHES: bool
     REDIS_HOST: str
     REDIS_PASSWORD: str
     REDIS_PORT: int
     REDIS_SSL: bool
+    REFERENCE_DATA_TTL_IN_SECONDS: int
     REQUEST_TIMEOUT: int
     ROUTE53_ZONE_ID: str
     SECRET_KEY: str
+    SHIELD_PROTECTION_CACHE_TTL_IN_SECONDS: int
+    SERVICE_INSTANCE_LOCK_LEASE_TIME: int
+    SERVICE_INSTANCE_LOCK_RETRY_DELAY: int
     SQLALCHEMY_TRACK_MODIFICATIONS: bool
+    STALLED_PIPELINE_GRACE_TIME: int
     SECRET_KEY: str
     SMTP_HOST: str
     SMTP_FROM: str
@@ -101,6 +119,12 @@ class Config:
         # how long we wait between updating DNS to point to a new ALB and removing the
         # certificate from an old ALB
         self.ALB_OVERLAP_SLEEP_TIME = self.env.int("ALB_OVERLAP_SLEEP_TIME", 900)
+        # how long we keep retrying calls that fail because a new or detached IAM
+        # certificate hasn't propagated yet, and how long we wait before the first retry
+        self.IAM_CERTIFICATE_PROPAGATION_TIME = self.env.int(
+            "IAM_CERTIFICATE_PROPAGATION_TIME", 30
+        )
+        self.IAM_CERTIFICATE_PROBE_INITIAL_DELAY = 1
         self.SQLALCHEMY_TRACK_MODIFICATIONS = False
         self.TESTING = True
         self.DEBUG = True
@@ -109,13 +133,122 @@ class Config:
         )
         self.AWS_POLL_WAIT_TIME_IN_SECONDS = 60
         self.AWS_POLL_MAX_ATTEMPTS = 10
+        # how many AWS calls a task makes at once when it works on many resources,
+        # e.g. health checks for each domain
+        self.AWS_MAX_CONCURRENT_REQUESTS = self.env.int(
+            "AWS_MAX_CONCURRENT_REQUESTS", 8
+        )
+        # each AWS service in each partition has a circuit breaker, shared by every
+        # worker. It opens when at least AWS_CIRCUIT_BREAKER_MIN_CALLS calls were made
+        # in the last one to two AWS_CIRCUIT_BREAKER_WINDOWs and
+        # AWS_CIRCUIT_BREAKER_ERROR_RATE of them failed, and tries again after
+        # AWS_CIRCUIT_BREAKER_COOL_DOWN seconds. All in seconds
+        self.AWS_CIRCUIT_BREAKER_ERROR_RATE = self.env.float(
+            "AWS_CIRCUIT_BREAKER_ERROR_RATE", 0.5
+        )
+        self.AWS_CIRCUIT_BREAKER_MIN_CALLS = self.env.int(
+            "AWS_CIRCUIT_BREAKER_MIN_CALLS", 10
+        )
+        self.AWS_CIRCUIT_BREAKER_WINDOW = self.env.int("AWS_CIRCUIT_BREAKER_WINDOW", 60)
+        self.AWS_CIRCUIT_BREAKER_COOL_DOWN = self.env.int(
+            "AWS_CIRCUIT_BREAKER_COOL_DOWN", 60
+        )
+        # calls per second all the workers together may make to low-rate AWS APIs,
+        # by "service.Operation", to stay under the account's quotas. Set
+        # AWS_RATE_LIMITS like "route-53.ChangeResourceRecordSets=2,..." to change
+        # some of these or add others. A call that would wait for its turn longer
+        # than AWS_RATE_LIMIT_MAX_WAIT seconds is deferred instead. Keep that short,
+        # since a waiting call holds its worker, org slot and instance lock
+        self.AWS_RATE_LIMITS = {
+            "route-53.ChangeResourceRecordSets": 3.0,
+            "cloudfront.CreateDistributionWithTags": 1.0,
+            "cloudfront.UpdateDistribution": 1.0,
+            "cloudfront.DeleteDistribution": 1.0,
+            "wafv2.CreateWebACL": 1.0,
+            "wafv2.UpdateWebACL": 1.0,
+            "wafv2.DeleteWebACL": 1.0,
+            "wafv2.AssociateWebACL": 1.0,
+            "wafv2.PutLoggingConfiguration": 1.0,
+            **self.env.dict("AWS_RATE_LIMITS", subcast_values=float, default={}),
+        }
+        self.AWS_RATE_LIMIT_MAX_WAIT = self.env.int("AWS_RATE_LIMIT_MAX_WAIT", 2)
+        # how the workers run tasks. "thread" runs one task at a time, and "greenlet"
+        # runs WORKER_CONCURRENCY tasks at once in one process, switching between them
+        # whenever one is waiting on AWS, ACME, DNS or the database
+        self.WORKER_TYPE = self.env("WORKER_TYPE", "thread")
+        greenlet_workers = self.WORKER_TYPE == "greenlet"
+        self.WORKER_CONCURRENCY = self.env.int(
+            "WORKER_CONCURRENCY", 100 if greenlet_workers else 1
+        )
+        # greenlet workers have more tasks in flight than database connections. A task
+        # waiting for a connection doesn't hold up the others, so let it wait longer
+        self.SQLALCHEMY_ENGINE_OPTIONS = {
+            "pool_size": self.env.int(
+                "DATABASE_POOL_SIZE", 20 if greenlet_workers else 5
+            ),
+            "pool_timeout": 300 if greenlet_workers else 30,
+        }
+        # workers take turns between organizations' tasks. An org gets its weight
+        # (default 1) in tasks per turn, and can have at most its limit of tasks
+        # running at once (0 for no limit). A running task stops counting against the
+        # limit after ORG_TASK_LEASE_TIME seconds, in case its worker died
+        self.ORG_CONCURRENCY_LIMIT = self.env.int("ORG_CONCURRENCY_LIMIT", 0)
+        self.ORG_CONCURRENCY_LIMITS = self.env.dict(
+            "ORG_CONCURRENCY_LIMITS", subcast_values=int, default={}
+        )
+        self.ORG_SCHEDULING_WEIGHTS = self.env.dict(
+            "ORG_SCHEDULING_WEIGHTS", subcast_values=int, default={}
+        )
+        self.ORG_TASK_LEASE_TIME = self.env.int("ORG_TASK_LEASE_TIME", 3600)
         self.IGNORE_DUPLICATE_DOMAINS = self.env.bool("IGNORE_DUPLICATE_DOMAINS", False)
+        # run the independent branches of a pipeline at the same time. When false, the
+        # branches run one after another, in the order they're declared
+        self.PIPELINE_PARALLEL_BRANCHES = self.env.bool(
+            "PIPELINE_PARALLEL_BRANCHES", True
+        )
+        # while a worker runs a task for an operation, it refreshes a heartbeat in
+        # redis that expires after PIPELINE_HEARTBEAT_TTL seconds. An in-progress
+        # operation with no heartbeat and nothing queued or scheduled has stalled,
+        # once it's gone STALLED_PIPELINE_GRACE_TIME seconds without an update, which
+        # covers the moment between one step finishing and the next being queued
+        self.PIPELINE_HEARTBEAT_INTERVAL = self.env.int(
+            "PIPELINE_HEARTBEAT_INTERVAL", 20
+        )
+        self.PIPELINE_HEARTBEAT_TTL = self.env.int("PIPELINE_HEARTBEAT_TTL", 60)
+        self.STALLED_PIPELINE_GRACE_TIME = self.env.int(
+            "STALLED_PIPELINE_GRACE_TIME", 120
+        )
+        # a pipeline holds a lease on its service instance while it runs, so two
+        # operations can't make the same AWS changes at once. Running steps renew it,
+        # and it lapses after SERVICE_INSTANCE_LOCK_LEASE_TIME seconds otherwise. Steps
+        # of other operations check again every SERVICE_INSTANCE_LOCK_RETRY_DELAY
+        self.SERVICE_INSTANCE_LOCK_LEASE_TIME = self.env.int(
+            "SERVICE_INSTANCE_LOCK_LEASE_TIME", 10 * 60
+        )
+        self.SERVICE_INSTANCE_LOCK_RETRY_DELAY = self.env.int(
+            "SERVICE_INSTANCE_LOCK_RETRY_DELAY", 60
+        )
+        # how long we remember which Shield protection covers a CloudFront
+        # distribution. A periodic task re-lists every protection well before this
+        self.SHIELD_PROTECTION_CACHE_TTL_IN_SECONDS = self.env.int(
+            "SHIELD_PROTECTION_CACHE_TTL_IN_SECONDS", 6 * 60 * 60
+        )
+        # how long slow-changing AWS data (e.g. CloudFront managed policies) stays in
+        # redis. A periodic task refreshes it well before this
+        self.REFERENCE_DATA_TTL_IN_SECONDS = self.env.int(
+            "REFERENCE_DATA_TTL_IN_SECONDS", 24 * 60 * 60
+        )
 
         # https://docs.aws.amazon.com/Route53/latest/APIReference/API_AliasTarget.html
         self.CLOUDFRONT_HOSTED_ZONE_ID = "Z2FDTNDATAQYW2"
 
         # the maximum from AWS is 25, and we alert when we have 20 on a given alb
         self.MAX_CERTS_PER_ALB = 19
+        # the AWS quota on certificates per listener, not counting the default one
+        self.MAX_CERTS_PER_LISTENER = 25
+        # how many certificates the rebalancer may start moving between listeners
+        # each time it runs
+        self.ALB_REBALANCE_MAX_MOVES = self.env.int("ALB_REBALANCE_MAX_MOVES", 5)
 
         self.AWS_RESOURCE_PREFIX = f"cg-external-domains-{self.FLASK_ENV}"
 
@@ -247,7 +380,6 @@ class AppConfig(Config):
         self.SMTP_PORT = self.env.int("SMTP_PORT")
         self.SMTP_TO = self.env("SMTP_TO")
         self.SMTP_TLS = True
-        self.IAM_CERTIFICATE_PROPAGATION_TIME = 30
 
         self.WAF_RATE_LIMIT_RULE_GROUP_ARN = self.env("WAF_RATE_LIMIT_RULE_GROUP_ARN")
         # in seconds
@@ -416,11 +548,32 @@ class TestConfig(DockerConfig):
         self.ACME_POLL_TIMEOUT_IN_SECONDS = 10
         self.AWS_POLL_WAIT_TIME_IN_SECONDS = 0
         self.AWS_POLL_MAX_ATTEMPTS = 10
+        # the AWS stubbers expect calls in order
+        self.AWS_MAX_CONCURRENT_REQUESTS = 1
         # if you need to see what sqlalchemy is doing
         # self.SQLALCHEMY_ECHO = True
         self.IAM_CERTIFICATE_PROPAGATION_TIME = 0
+        self.IAM_CERTIFICATE_PROBE_INITIAL_DELAY = 0
         # in seconds
         self.DELETE_WEB_ACL_WAIT_RETRY_TIME = 0
+        # the pipeline tests step through one task at a time
+        self.PIPELINE_PARALLEL_BRANCHES = False
+        # so the errors one test stubs don't open a circuit breaker for the next
+        self.AWS_CIRCUIT_BREAKER_MIN_CALLS = 1_000_000
+        # and the tests don't wait for their turn to call AWS
+        self.AWS_RATE_LIMITS = {}
+
+
+class BenchmarkConfig(TestConfig):
+    """I'm used by the harnesses in benchmarks/. Same as tests, but with its own database"""
+
+    def __init__(self):
+        super().__init__()
+        # benchmarks.lib.stub_cf
+        self.CF_API_URL = "http://localhost:8098/"
+        self.UAA_TOKEN_URL = "http://localhost:8098/token"
+        self.PIPELINE_PARALLEL_BRANCHES = True
+        self.AWS_MAX_CONCURRENT_REQUESTS = 8
 
 
 class MissingRedisError(RuntimeError):
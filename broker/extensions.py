@@ -1,8 +1,22 @@
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from redis import ConnectionPool, SSLConnection
 
 from broker.config import config_from_env
 
 config = config_from_env()
 db = SQLAlchemy(disable_autonaming=True)
 migrate = Migrate()
+
+if config.REDIS_SSL:
+    redis_kwargs = dict(connection_class=SSLConnection, ssl_cert_reqs=None)
+else:
+    redis_kwargs = dict()
+
+# shared by huey and anything else that keeps state in redis
+connection_pool = ConnectionPool(
+    host=config.REDIS_HOST,
+    port=config.REDIS_PORT,
+    password=config.REDIS_PASSWORD,
+    **redis_kwargs,
+)
@@ -0,0 +1,46 @@
+"""
+Runs the huey consumer with greenlet workers, e.g.
+
+    python -m broker.greenlet_consumer broker.huey_consumer.huey -k greenlet -w 100
+
+gevent has to patch the standard library before anything imports socket, ssl or
+threading. huey's own huey_consumer script can't do that for us: it imports our huey
+instance, and with it the app and its redis and database clients, before the
+consumer starts, and it doesn't patch anything itself (it only warns when the patch
+is missing). So this entry point patches first, and sets up psycopg2's wait
+callback, before huey imports our code. After patching, boto3, requests, redis and
+dnspython all yield to other tasks while they wait on the network.
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import psycopg2  # noqa: E402
+from psycopg2 import extensions  # noqa: E402
+from gevent.socket import wait_read, wait_write  # noqa: E402
+from huey.bin.huey_consumer import consumer_main  # noqa: E402
+
+
+def wait_for_postgres(conn, timeout=None):
+    """
+    psycopg2 talks to postgres in C, out of gevent's reach. This callback makes it
+    hand control back to gevent while it waits for the server.
+    """
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+
+
+extensions.set_wait_callback(wait_for_postgres)
+
+
+if __name__ == "__main__":
+    consumer_main()
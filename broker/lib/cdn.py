@@ -1,9 +1,10 @@
 from openbrokerapi import errors
+from redis import Redis
 
 from broker import validators
 
 from broker.aws import cloudfront
-from broker.extensions import config
+from broker.extensions import config, connection_pool
 
 from broker.lib.cache_policy_manager import CachePolicyManager, is_cache_policy_allowed
 from broker.lib.client_error import ClientError
@@ -11,6 +12,7 @@ from broker.lib.origin_request_policy_manager import (
     is_origin_request_policy_allowed,
     OriginRequestPolicyManager,
 )
+from broker.lib.reference_data import register
 from broker.lib.utils import (
     parse_cookie_options,
     parse_header_options,
@@ -24,8 +26,11 @@ from broker.models import (
     MigrateDedicatedALBToCDNDedicatedWafServiceInstance,
 )
 
-cache_policy_manager = CachePolicyManager(cloudfront)
-origin_request_policy_manager = OriginRequestPolicyManager(cloudfront)
+conn = Redis(connection_pool=connection_pool)
+cache_policy_manager = CachePolicyManager(cloudfront, conn)
+origin_request_policy_manager = OriginRequestPolicyManager(cloudfront, conn)
+register(cache_policy_manager.reference_data)
+register(origin_request_policy_manager.reference_data)
 
 
 def is_cdn_instance(service_instance) -> bool:
@@ -1,22 +1,66 @@
 import datetime
 import requests
 import logging
+import threading
+import time
 
-from functools import cache
+from collections import OrderedDict
+from concurrent.futures import Future
 from urllib.parse import urljoin
 
 from broker.extensions import config
 
 logger = logging.getLogger(__name__)
 
+# how many guids we put in one `guids=` filter, to keep the URL a sensible length
+GUIDS_PER_REQUEST = 100
+
+
+class TTLCache:
+    """
+    a least-recently-used cache whose entries also expire `ttl` seconds after they're
+    set. Not thread-safe on its own.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
 
 class CFAPIClient:
+    """
+    Looks up space and organization names. Names are cached for `cache_ttl` seconds,
+    and concurrent lookups of the same name share one request.
+    """
+
     _access_token: str
     _access_token_expiration: float
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024, cache_ttl: float = 600):
         self._access_token = None
         self._access_token_expiration = None
+        self._session = requests.Session()
+        self._names = TTLCache(cache_size, cache_ttl)
+        self._in_flight: dict[tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
 
     def fetch_access_token(self):
         logger.info("fetching access token")
@@ -52,22 +96,76 @@ class CFAPIClient:
                 return True
         return False
 
-    @cache
     def get_space_name_by_guid(self, space_guid):
-        with requests.Session() as s:
-            s.headers["Authorization"] = f"Bearer {self.access_token}"
-            url = urljoin(config.CF_API_URL, f"v3/spaces/{space_guid}")
-            response = s.get(url)
-            response.raise_for_status()
-            data = response.json()
-            return data["name"]
-
-    @cache
+        return self._get_name("spaces", space_guid)
+
     def get_organization_name_by_guid(self, organization_guid):
-        with requests.Session() as s:
-            s.headers["Authorization"] = f"Bearer {self.access_token}"
-            url = urljoin(config.CF_API_URL, f"v3/organizations/{organization_guid}")
-            response = s.get(url)
-            response.raise_for_status()
-            data = response.json()
-            return data["name"]
+        return self._get_name("organizations", organization_guid)
+
+    def get_organization_names_by_guids(self, organization_guids) -> dict[str, str]:
+        """
+        :return: the names of the organizations that exist, by guid. Any that aren't
+        cached are looked up together, GUIDS_PER_REQUEST at a time
+        """
+        return self._get_names("organizations", organization_guids)
+
+    def _get(self, path, params=None):
+        response = self._session.get(
+            urljoin(config.CF_API_URL, path),
+            params=params,
+            headers={"Authorization": f"Bearer {self.access_token}"},
+            timeout=config.REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _get_name(self, resource, guid):
+        key = (resource, guid)
+        with self._lock:
+            name = self._names.get(key)
+            if name is not None:
+                return name
+            future = self._in_flight.get(key)
+            waiting = future is not None
+            if not waiting:
+                future = self._in_flight[key] = Future()
+
+        if waiting:
+            return future.result()
+
+        try:
+            name = self._get(f"v3/{resource}/{guid}")["name"]
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._names.set(key, name)
+            del self._in_flight[key]
+        future.set_result(name)
+        return name
+
+    def _get_names(self, resource, guids) -> dict[str, str]:
+        names = {}
+        missing = []
+        with self._lock:
+            for guid in dict.fromkeys(guids):
+                name = self._names.get((resource, guid))
+                if name is None:
+                    missing.append(guid)
+                else:
+                    names[guid] = name
+
+        for start in range(0, len(missing), GUIDS_PER_REQUEST):
+            guids_batch = missing[start : start + GUIDS_PER_REQUEST]
+            data = self._get(
+                f"v3/{resource}",
+                {"guids": ",".join(guids_batch), "per_page": len(guids_batch)},
+            )
+            with self._lock:
+                for item in data["resources"]:
+                    self._names.set((resource, item["guid"]), item["name"])
+                    names[item["guid"]] = item["name"]
+        return names
@@ -0,0 +1,174 @@
+import logging
+import time
+
+from botocore import exceptions as botocore_exceptions
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: breaker key. ARGV: probe time
+# Returns 0 if the call can go ahead, -1 if it can go ahead as the probe of a
+# half-open breaker, or how many milliseconds until it's worth trying again
+ALLOW = """
+local breaker = KEYS[1]
+local open_for = redis.call('PTTL', breaker .. '.open')
+if open_for > 0 then
+    return open_for
+end
+if redis.call('EXISTS', breaker .. '.tripped') == 0 then
+    return 0
+end
+if redis.call('SET', breaker .. '.probe', 1, 'NX', 'EX', ARGV[1]) then
+    return -1
+end
+return math.max(redis.call('PTTL', breaker .. '.probe'), 1)
+"""
+
+# KEYS[1]: breaker key. ARGV: failed, probe, now, window, error rate, minimum
+# calls, cool down time. Returns 1 if the breaker is open afterwards
+RECORD = """
+local breaker = KEYS[1]
+local failed, probe = ARGV[1] == '1', ARGV[2] == '1'
+local now, window = tonumber(ARGV[3]), tonumber(ARGV[4])
+local bucket = math.floor(now / window)
+local calls, failures = breaker .. '.calls.', breaker .. '.failures.'
+if probe then
+    redis.call('DEL', breaker .. '.probe')
+    if failed then
+        redis.call('SET', breaker .. '.open', 1, 'EX', ARGV[7])
+        return 1
+    end
+    redis.call('DEL', breaker .. '.tripped', breaker .. '.open')
+    redis.call('DEL', calls .. bucket, failures .. bucket)
+    redis.call('DEL', calls .. (bucket - 1), failures .. (bucket - 1))
+    return 0
+end
+if redis.call('EXISTS', breaker .. '.tripped') == 1 then
+    -- only the probe decides when a tripped breaker closes
+    return 0
+end
+redis.call('INCR', calls .. bucket)
+redis.call('EXPIRE', calls .. bucket, window * 2)
+if not failed then
+    return 0
+end
+redis.call('INCR', failures .. bucket)
+redis.call('EXPIRE', failures .. bucket, window * 2)
+local total = tonumber(redis.call('GET', calls .. bucket) or 0)
+    + tonumber(redis.call('GET', calls .. (bucket - 1)) or 0)
+local failed_total = tonumber(redis.call('GET', failures .. bucket) or 0)
+    + tonumber(redis.call('GET', failures .. (bucket - 1)) or 0)
+if total >= tonumber(ARGV[6]) and failed_total >= total * tonumber(ARGV[5]) then
+    redis.call('SET', breaker .. '.tripped', 1)
+    redis.call('SET', breaker .. '.open', 1, 'EX', ARGV[7])
+    return 1
+end
+return 0
+"""
+
+
+class CircuitOpen(Exception):
+    """an AWS service is failing too often to be worth calling right now"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"circuit {name} is open, retry after {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for one AWS service in one partition, with its state in
+    redis so every worker shares it. Calls and server-side failures (5xx
+    responses, connection errors and timeouts) are counted over the last two
+    windows of `window` seconds. Once at least `min_calls` calls have been made and
+    `error_rate` of them failed, the breaker opens and calls raise CircuitOpen
+    without reaching AWS. After `cool_down` seconds it's half-open: one call goes
+    through as a probe, and closes it if it works or opens it again if it doesn't.
+
+    If redis can't be reached, calls go ahead.
+    """
+
+    def __init__(
+        self,
+        conn,
+        partition: str,
+        service: str,
+        error_rate: float = 0.5,
+        min_calls: int = 10,
+        window: int = 60,
+        cool_down: int = 60,
+    ):
+        self.conn = conn
+        self.name = f"{partition}:{service}"
+        self.key = f"circuit:{self.name}"
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cool_down = cool_down
+        self._allow = conn.register_script(ALLOW)
+        self._record = conn.register_script(RECORD)
+
+    def allow(self) -> bool:
+        """
+        raise CircuitOpen if the call shouldn't be made, otherwise return whether
+        it's the probe of a half-open breaker
+        """
+        try:
+            wait = self._allow(keys=[self.key], args=[self.cool_down])
+        except RedisError:
+            logger.warning("Could not check circuit %s", self.name, exc_info=True)
+            return False
+        if wait > 0:
+            raise CircuitOpen(self.name, wait / 1000)
+        return wait < 0
+
+    def record(self, failed: bool, probe: bool = False):
+        try:
+            opened = self._record(
+                keys=[self.key],
+                args=[
+                    int(failed),
+                    int(probe),
+                    time.time(),
+                    self.window,
+                    self.error_rate,
+                    self.min_calls,
+                    self.cool_down,
+                ],
+            )
+        except RedisError:
+            logger.warning("Could not update circuit %s", self.name, exc_info=True)
+            return
+        if opened:
+            logger.warning(
+                "Circuit %s is open for %s seconds", self.name, self.cool_down
+            )
+        elif probe:
+            logger.info("Circuit %s is closed", self.name)
+
+    def watch(self, client):
+        """check and update the breaker around every call the boto3 client makes"""
+        service_id = client.meta.service_model.service_id.hyphenize()
+        # ahead of everything else, including a Stubber's handler, since the call
+        # stops at the first handler that returns a response
+        client.meta.events.register_first("before-call.*.*", self._before_call)
+        client.meta.events.register(f"after-call.{service_id}", self._after_call)
+        client.meta.events.register(
+            f"after-call-error.{service_id}", self._after_call_error
+        )
+
+    def _before_call(self, context, **kwargs):
+        context["circuit_probe"] = self.allow()
+
+    def _after_call(self, http_response, context, **kwargs):
+        self.record(
+            http_response.status_code >= 500, context.get("circuit_probe", False)
+        )
+
+    def _after_call_error(self, exception, context, **kwargs):
+        if isinstance(
+            exception,
+            (botocore_exceptions.ConnectionError, botocore_exceptions.HTTPClientError),
+        ):
+            self.record(True, context.get("circuit_probe", False))
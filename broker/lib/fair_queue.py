@@ -0,0 +1,216 @@
+import json
+import time
+
+from huey import PriorityRedisHuey, signals
+from huey.storage import RedisStorage
+
+NO_ORGANIZATION = "none"
+
+# the most wakeups kept for idle workers. Extras only cost a look at the queue
+MAX_WAKEUPS = 100
+
+# KEYS[1]: queue key. ARGV: priority, organization, task id, task data, most
+# wakeups
+ENQUEUE = """
+local queue = KEYS[1]
+local priority, organization = ARGV[1], ARGV[2]
+local tasks = queue .. '.org.' .. priority .. '.' .. organization
+if redis.call('RPUSH', tasks, ARGV[3] .. '\\n' .. ARGV[4]) == 1 then
+    redis.call('RPUSH', queue .. '.orgs.' .. priority, organization)
+end
+redis.call('ZADD', queue .. '.priorities', priority, priority)
+redis.call('LPUSH', queue .. '.wakeups', 1)
+redis.call('LTRIM', queue .. '.wakeups', 0, ARGV[5] - 1)
+"""
+
+# KEYS[1]: queue key. ARGV: now, lease time, default limit, default weight, limits
+# by organization as json, weights by organization as json
+DEQUEUE = """
+local queue = KEYS[1]
+local now, lease = tonumber(ARGV[1]), tonumber(ARGV[2])
+local default_limit, default_weight = tonumber(ARGV[3]), tonumber(ARGV[4])
+local limits, weights = cjson.decode(ARGV[5]), cjson.decode(ARGV[6])
+local turns = queue .. '.turns'
+for _, priority in ipairs(redis.call('ZREVRANGE', queue .. '.priorities', 0, -1)) do
+    local ring = queue .. '.orgs.' .. priority
+    for _ = 1, redis.call('LLEN', ring) do
+        local organization = redis.call('LINDEX', ring, 0)
+        local in_flight = queue .. '.inflight.' .. organization
+        redis.call('ZREMRANGEBYSCORE', in_flight, '-inf', now)
+        local limit = tonumber(limits[organization] or default_limit)
+        if limit > 0 and redis.call('ZCARD', in_flight) >= limit then
+            redis.call('RPUSH', ring, redis.call('LPOP', ring))
+            redis.call('HDEL', turns, priority)
+        else
+            local tasks = queue .. '.org.' .. priority .. '.' .. organization
+            local entry = redis.call('LPOP', tasks)
+            local turn = redis.call('HINCRBY', turns, priority, 1)
+            if redis.call('LLEN', tasks) == 0 then
+                redis.call('LPOP', ring)
+                redis.call('HDEL', turns, priority)
+                if redis.call('LLEN', ring) == 0 then
+                    redis.call('ZREM', queue .. '.priorities', priority)
+                end
+            elseif turn >= tonumber(weights[organization] or default_weight) then
+                redis.call('RPUSH', ring, redis.call('LPOP', ring))
+                redis.call('HDEL', turns, priority)
+            end
+            if entry then
+                local separator = string.find(entry, '\\n', 1, true)
+                local task_id = string.sub(entry, 1, separator - 1)
+                redis.call('ZADD', in_flight, now + lease, task_id)
+                return string.sub(entry, separator + 1)
+            end
+        end
+    end
+end
+return false
+"""
+
+
+class FairRedisStorage(RedisStorage):
+    """
+    A priority queue that takes turns between organizations, so one org queueing
+    hundreds of operations doesn't hold up everyone else's.
+
+    Each priority has a ring of the organizations with tasks waiting at that
+    priority, and each of those organizations has its own FIFO list. Dequeuing
+    takes the highest priority that has a runnable task, then takes `weight` tasks
+    from the organization at the head of that ring before moving it to the back.
+    An organization with `limit` tasks already running is skipped. Running tasks
+    hold a lease until release() or until the lease time runs out, so tasks lost
+    with their worker don't count against the limit forever.
+
+    Queueing or releasing a task pushes a wakeup, and a worker that finds nothing
+    to run waits up to `read_timeout` seconds for one before looking again.
+
+    The organization comes from the `organization_guid` kwarg on the task.
+    """
+
+    priority = True
+
+    def __init__(
+        self,
+        name="huey",
+        serializer=None,
+        default_limit=0,
+        limits=None,
+        default_weight=1,
+        weights=None,
+        lease_time=3600,
+        **kwargs,
+    ):
+        super().__init__(name, **kwargs)
+        self.serializer = serializer
+        self.default_limit = default_limit
+        self.limits = json.dumps(limits or {})
+        self.default_weight = default_weight
+        self.weights = json.dumps(weights or {})
+        self.lease_time = lease_time
+        self._enqueue = self.conn.register_script(ENQUEUE)
+        self._dequeue = self.conn.register_script(DEQUEUE)
+        self.wakeups_key = f"{self.queue_key}.wakeups"
+
+    def enqueue(self, data, priority=None):
+        message = self.serializer.deserialize(data)
+        organization = (message.kwargs or {}).get("organization_guid")
+        self._enqueue(
+            keys=[self.queue_key],
+            args=[
+                int(priority or 0),
+                organization or NO_ORGANIZATION,
+                message.id,
+                data,
+                MAX_WAKEUPS,
+            ],
+        )
+
+    def dequeue(self):
+        data = self._dequeue_next()
+        if data is None and self.blocking:
+            # wait for a task to be queued, or for a slot to free up
+            if self.conn.brpop(self.wakeups_key, timeout=self.read_timeout):
+                data = self._dequeue_next()
+        return data
+
+    def _dequeue_next(self):
+        return self._dequeue(
+            keys=[self.queue_key],
+            args=[
+                time.time(),
+                self.lease_time,
+                self.default_limit,
+                self.default_weight,
+                self.limits,
+                self.weights,
+            ],
+        )
+
+    def release(self, task_id, organization):
+        """the task isn't running anymore, so it doesn't count against its org's limit"""
+        with self.conn.pipeline() as pipe:
+            pipe.zrem(
+                f"{self.queue_key}.inflight.{organization or NO_ORGANIZATION}",
+                task_id,
+            )
+            # the org's next task might be able to run now
+            pipe.lpush(self.wakeups_key, 1)
+            pipe.ltrim(self.wakeups_key, 0, MAX_WAKEUPS - 1)
+            pipe.execute()
+
+    def _task_lists(self):
+        """the list of tasks for each priority and org, in the order we'd run them"""
+        for priority in self.conn.zrevrange(f"{self.queue_key}.priorities", 0, -1):
+            priority = priority.decode()
+            ring = f"{self.queue_key}.orgs.{priority}"
+            for organization in self.conn.lrange(ring, 0, -1):
+                yield int(priority), (
+                    f"{self.queue_key}.org.{priority}.{organization.decode()}"
+                )
+
+    def queue_depths(self) -> dict[int, int]:
+        depths = {}
+        for priority, tasks in self._task_lists():
+            depths[priority] = depths.get(priority, 0) + self.conn.llen(tasks)
+        return depths
+
+    def queue_size(self):
+        return sum(self.queue_depths().values())
+
+    def enqueued_items(self, limit=None):
+        items = []
+        for _, tasks in self._task_lists():
+            items += [
+                entry.split(b"\n", 1)[1] for entry in self.conn.lrange(tasks, 0, -1)
+            ]
+        return items[:limit] if limit else items
+
+    def flush_queue(self):
+        keys = list(self.conn.scan_iter(match=f"{self.queue_key}.*"))
+        if keys:
+            self.conn.delete(*keys)
+
+
+class FairRedisHuey(PriorityRedisHuey):
+    storage_class = FairRedisStorage
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.post_execute(name="release_organization_lease")(self._release_lease)
+        # tasks that are dequeued but never run don't get to post_execute
+        self.signal(
+            signals.SIGNAL_CANCELED,
+            signals.SIGNAL_EXPIRED,
+            signals.SIGNAL_REVOKED,
+            signals.SIGNAL_SCHEDULED,
+        )(self._release_skipped_lease)
+
+    def _release_lease(self, task, task_value, exc):
+        self.storage.release(task.id, task.kwargs.get("organization_guid"))
+
+    def _release_skipped_lease(self, signal, task, *args):
+        self._release_lease(task, None, None)
+
+    def get_storage(self, **kwargs):
+        # the storage reads each task's organization out of the serialized task
+        return self.storage_class(self.name, serializer=self.serializer, **kwargs)
@@ -1,4 +1,5 @@
 from broker.extensions import config
+from broker.lib.reference_data import ReferenceData
 
 
 def is_origin_request_policy_allowed(aws_policy_name, allowed_aws_policy_names):
@@ -6,18 +7,21 @@ def is_origin_request_policy_allowed(aws_policy_name, allowed_aws_policy_names):
 
 
 class OriginRequestPolicyManager:
-    def __init__(self, cloudfront):
-        self._managed_policies = None
+    def __init__(self, cloudfront, redis):
         self.cloudfront = cloudfront
+        self.reference_data = ReferenceData(
+            "cloudfront-managed-origin-request-policies",
+            lambda: self._list_origin_request_policies("managed"),
+            redis,
+            config.REFERENCE_DATA_TTL_IN_SECONDS,
+        )
 
     def get_managed_policy_id(self, policy) -> str:
         return self.managed_policies[policy]
 
     @property
     def managed_policies(self) -> dict[str, str]:
-        if self._managed_policies is None:
-            self._managed_policies = self._list_origin_request_policies("managed")
-        return self._managed_policies
+        return self.reference_data.get()
 
     def _list_origin_request_policies(self, policy_type):
         origin_request_policies = []
@@ -0,0 +1,90 @@
+import logging
+import time
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: bucket key. ARGV: now, tokens per second, most tokens the bucket holds,
+# longest wait. Takes a token, letting the bucket go into debt so callers are
+# served in the order they asked, and returns how many milliseconds to wait
+# before using it. If that's longer than the longest wait, the token isn't taken
+# and the wait is returned negated
+TAKE = """
+local bucket = KEYS[1]
+local now, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local burst, max_wait = tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', bucket, 'tokens', 'updated')
+local tokens, updated = tonumber(state[1]), tonumber(state[2])
+if tokens == nil then
+    tokens, updated = burst, now
+end
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate) - 1
+local wait = 0
+if tokens < 0 then
+    wait = -tokens / rate
+end
+if wait > max_wait then
+    return -math.ceil(wait * 1000)
+end
+redis.call('HSET', bucket, 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', bucket, math.ceil(burst / rate + max_wait) + 1)
+return math.ceil(wait * 1000)
+"""
+
+
+class RateLimitExceeded(Exception):
+    """an AWS API is so far over its rate that a call would wait too long"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is rate limited, retry after {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Token buckets in redis for the AWS calls made with an account's credentials, so
+    every worker together stays under the account's API quotas. `rates` maps
+    "service.Operation" (e.g. "route-53.ChangeResourceRecordSets") to calls per
+    second, and operations without a rate aren't limited. Each bucket holds a
+    second's worth of calls, or one, whichever is more.
+
+    A call over the rate waits its turn, or raises RateLimitExceeded if that would
+    take more than `max_wait` seconds, so the task can wait somewhere other than
+    in a worker. If redis can't be reached, calls go ahead.
+    """
+
+    def __init__(self, conn, account: str, rates: dict, max_wait: float = 2):
+        self.conn = conn
+        self.account = account
+        self.rates = rates
+        self.max_wait = max_wait
+        self._take = conn.register_script(TAKE)
+
+    def wait(self, service: str, operation: str):
+        name = f"{service}.{operation}"
+        rate = self.rates.get(name)
+        if not rate:
+            return
+        try:
+            wait = self._take(
+                keys=[f"ratelimit:{self.account}:{name}"],
+                args=[time.time(), rate, max(rate, 1), self.max_wait],
+            )
+        except RedisError:
+            logger.warning("Could not check the rate of %s", name, exc_info=True)
+            return
+        if wait < 0:
+            raise RateLimitExceeded(f"{self.account}:{name}", -wait / 1000)
+        if wait:
+            time.sleep(wait / 1000)
+
+    def watch(self, client):
+        """hold every call the boto3 client makes to the rates"""
+        # ahead of everything else but the circuit breaker, including a Stubber's
+        # handler, since the call stops at the first handler that returns a response
+        client.meta.events.register_first("before-call.*.*", self._before_call)
+
+    def _before_call(self, model, **kwargs):
+        self.wait(model.service_model.service_id.hyphenize(), model.name)
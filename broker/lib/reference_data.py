@@ -0,0 +1,75 @@
+import json
+import logging
+from typing import Any, Callable
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+_registry: dict[str, "ReferenceData"] = {}
+
+
+class ReferenceData:
+    """
+    Slow-changing data looked up from AWS, shared between processes through redis.
+
+    Readers call get(). Normally a periodic task has already stored the data in
+    redis, so get() makes no AWS calls. If redis doesn't have it, get() loads it and
+    stores it for everyone else. If redis can't be reached, get() falls back to the
+    copy this process last saw, loading one if it has never seen one.
+
+    The data must be JSON-serializable.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Any], redis, ttl: int):
+        self.name = name
+        self.load = load
+        self.redis = redis
+        self.ttl = ttl
+        self._local = None
+
+    @property
+    def key(self) -> str:
+        return f"reference:{self.name}"
+
+    def get(self):
+        try:
+            cached = self.redis.get(self.key)
+        except RedisError:
+            logger.warning(
+                "Could not read %s from redis, using the local copy",
+                self.name,
+                exc_info=True,
+            )
+            if self._local is None:
+                self._local = self.load()
+            return self._local
+
+        if cached is None:
+            return self.refresh()
+        self._local = json.loads(cached)
+        return self._local
+
+    def refresh(self):
+        """load the data and store it in redis"""
+        value = self.load()
+        self._local = value
+        try:
+            self.redis.set(self.key, json.dumps(value), ex=self.ttl)
+        except RedisError:
+            logger.warning("Could not store %s in redis", self.name, exc_info=True)
+        return value
+
+
+def register(reference_data: ReferenceData) -> ReferenceData:
+    """include reference_data in the ones refresh_all() refreshes"""
+    _registry[reference_data.name] = reference_data
+    return reference_data
+
+
+def refresh_all():
+    for name, reference_data in _registry.items():
+        try:
+            reference_data.refresh()
+        except Exception:
+            logger.exception("Could not refresh %s", name)
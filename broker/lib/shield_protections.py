@@ -1,21 +1,80 @@
+import logging
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
 class ShieldProtections:
-    def __init__(self, shield_svc):
-        self.protected_cloudfront_ids: dict[str, str] = {}
+    """
+    Look up the Shield protection for a CloudFront distribution.
+
+    Protection IDs are cached in redis, keyed by distribution ARN, so every worker
+    shares them. A miss costs one targeted DescribeProtection call. refresh() lists
+    every CloudFront protection in the account, and is meant to run periodically
+    rather than from a pipeline.
+    """
+
+    key_prefix = "shield:protection:"
+
+    def __init__(self, shield_svc, redis, ttl: int):
         self.shield_svc = shield_svc
+        self.redis = redis
+        self.ttl = ttl
+
+    def get_protection_id(self, cloudfront_arn: str) -> str | None:
+        try:
+            protection_id = self.redis.get(self._key(cloudfront_arn))
+        except RedisError:
+            logger.warning(
+                "Could not read the Shield protection for %s from redis, asking AWS",
+                cloudfront_arn,
+                exc_info=True,
+            )
+            protection_id = None
+        if protection_id is not None:
+            return protection_id.decode()
 
-    def get_cloudfront_protections(self, should_refresh: bool = False):
-        if not self.protected_cloudfront_ids or should_refresh:
-            self._list_cloudfront_protections()
-        return self.protected_cloudfront_ids
+        try:
+            response = self.shield_svc.describe_protection(ResourceArn=cloudfront_arn)
+        except self.shield_svc.exceptions.ResourceNotFoundException:
+            return None
+        protection_id = response["Protection"]["Id"]
+        try:
+            self.redis.set(self._key(cloudfront_arn), protection_id, ex=self.ttl)
+        except RedisError:
+            logger.warning(
+                "Could not cache the Shield protection for %s in redis",
+                cloudfront_arn,
+                exc_info=True,
+            )
+        return protection_id
 
-    def _list_cloudfront_protections(self):
+    def forget(self, cloudfront_arn: str):
+        self.redis.delete(self._key(cloudfront_arn))
+
+    def refresh(self) -> int:
+        """
+        cache every CloudFront protection in the account
+        :return: how many protections were cached
+        """
         paginator = self.shield_svc.get_paginator("list_protections")
         response_iterator = paginator.paginate(
             InclusionFilters={"ResourceTypes": ["CLOUDFRONT_DISTRIBUTION"]},
         )
+        count = 0
         for response in response_iterator:
-            for protection in response["Protections"]:
-                if "ResourceArn" in protection and "Id" in protection:
-                    self.protected_cloudfront_ids[protection["ResourceArn"]] = (
-                        protection["Id"]
-                    )
+            with self.redis.pipeline() as pipe:
+                for protection in response["Protections"]:
+                    if "ResourceArn" in protection and "Id" in protection:
+                        pipe.set(
+                            self._key(protection["ResourceArn"]),
+                            protection["Id"],
+                            ex=self.ttl,
+                        )
+                        count += 1
+                pipe.execute()
+        return count
+
+    def _key(self, cloudfront_arn: str) -> str:
+        return f"{self.key_prefix}{cloudfront_arn}"
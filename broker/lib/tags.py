@@ -54,6 +54,7 @@ def generate_instance_tags(
             plan_name=plans[0].name,
             organization_guid=details.organization_guid,
             space_guid=details.space_guid,
+            resolve_names=False,
         )
     )
 
@@ -65,6 +66,14 @@ def create_resource_tags(tags: dict[str, str]) -> list[Tag]:
     return resource_tags
 
 
+def prefetch_organization_names(organization_guids):
+    """
+    look up many organizations' names together, so that generate_tags finds them
+    already cached instead of looking them up one at a time
+    """
+    cf_api_client.get_organization_names_by_guids(organization_guids)
+
+
 def generate_tags(
     environment: str,
     instance_guid: str = "",
@@ -72,6 +81,7 @@ def generate_tags(
     plan_name: str = "",
     organization_guid: str = "",
     space_guid: str = "",
+    resolve_names: bool = True,
 ) -> dict[str, str]:
     default_tags = {
         "client": "Cloud Foundry",
@@ -90,14 +100,34 @@ def generate_tags(
 
     if space_guid:
         default_tags["Space GUID"] = space_guid
-        space_name = cf_api_client.get_space_name_by_guid(space_guid)
-        default_tags["Space name"] = space_name
+        if resolve_names:
+            space_name = cf_api_client.get_space_name_by_guid(space_guid)
+            default_tags["Space name"] = space_name
 
     if organization_guid:
         default_tags["Organization GUID"] = organization_guid
-        organization_name = cf_api_client.get_organization_name_by_guid(
-            organization_guid
-        )
-        default_tags["Organization name"] = organization_name
+        if resolve_names:
+            organization_name = cf_api_client.get_organization_name_by_guid(
+                organization_guid
+            )
+            default_tags["Organization name"] = organization_name
 
     return default_tags
+
+
+def add_name_tags(tags: list[Tag]) -> list[Tag]:
+    """
+    add the space and organization names for the GUIDs in tags, unless they're
+    already there
+    """
+    tags = list(tags or [])
+    values = {tag["Key"]: tag["Value"] for tag in tags}
+    if "Space GUID" in values and "Space name" not in values:
+        space_name = cf_api_client.get_space_name_by_guid(values["Space GUID"])
+        tags = add_tag(tags, {"Key": "Space name", "Value": space_name})
+    if "Organization GUID" in values and "Organization name" not in values:
+        organization_name = cf_api_client.get_organization_name_by_guid(
+            values["Organization GUID"]
+        )
+        tags = add_tag(tags, {"Key": "Organization name", "Value": organization_name})
+    return tags
@@ -1,6 +1,8 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from broker import validators
+from broker.extensions import config
 from broker.models import (
     CDNServiceInstance,
 )
@@ -66,3 +68,19 @@ def validate_domain_name_changes(requested_domain_names, instance) -> list[str]:
             return []
 
     return requested_domain_names
+
+
+def map_concurrently(function, items) -> list:
+    """
+    call function on each item, up to config.AWS_MAX_CONCURRENT_REQUESTS at a time,
+    and return the results in the same order as items. If any call raises, the
+    first exception (in item order) is raised once every call has finished.
+    """
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=min(config.AWS_MAX_CONCURRENT_REQUESTS, len(items))
+    ) as executor:
+        futures = [executor.submit(function, item) for item in items]
+    return [future.result() for future in futures]
@@ -13,7 +13,13 @@ from sqlalchemy_utils.types.encrypted.encrypted_type import (
 )
 from openbrokerapi.service_broker import OperationState
 
-from broker.lib.tags import tag_key_exists, add_tag, generate_tags, create_resource_tags
+from broker.lib.tags import (
+    tag_key_exists,
+    add_tag,
+    generate_tags,
+    create_resource_tags,
+    prefetch_organization_names,
+)
 from broker.extensions import config, db
 
 
@@ -243,6 +249,9 @@ class AbstractALBServiceInstance(ServiceInstance):
 
     previous_alb_arn = mapped_column(db.String, use_existing_column=True)
     previous_alb_listener_arn = mapped_column(db.String, use_existing_column=True)
+    # the listener we've counted a certificate against in ALBListener, but not yet
+    # added it to
+    reserved_alb_listener_arn = mapped_column(db.String, use_existing_column=True)
 
 
 class ALBServiceInstance(AbstractALBServiceInstance):
@@ -281,6 +290,7 @@ class MigrateDedicatedALBToCDNDedicatedWafServiceInstance(
     alb_listener_arn = mapped_column(db.String, use_existing_column=True)
     previous_alb_arn = mapped_column(db.String, use_existing_column=True)
     previous_alb_listener_arn = mapped_column(db.String, use_existing_column=True)
+    reserved_alb_listener_arn = mapped_column(db.String, use_existing_column=True)
     org_id = mapped_column(db.String, use_existing_column=True)
 
     alb_certificate_id = mapped_column(
@@ -332,6 +342,7 @@ class Operation(Base):
         RENEW = "Renew"
         UPDATE = "Update"
         MIGRATE_TO_BROKER = "Migrate to broker"
+        REBALANCE = "Rebalance"
 
     id = mapped_column(db.Integer, primary_key=True)
     service_instance_id = mapped_column(
@@ -346,6 +357,15 @@ class Operation(Base):
     action = mapped_column(db.String, nullable=False)
     canceled_at = mapped_column(db.TIMESTAMP(timezone=True))
     step_description = mapped_column(db.String)
+    # when a step that's waiting (see broker.tasks.huey.wait_without_blocking)
+    # will run again
+    resume_at = mapped_column(db.TIMESTAMP(timezone=True))
+    # the pipeline working on this operation, and how many of its steps have
+    # finished (see broker.tasks.huey.record_pipeline)
+    pipeline = mapped_column(postgresql.JSONB)
+    completed_steps = mapped_column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
 
     def __repr__(self):
         return f"<Operation {self.id} {self.state}>"
@@ -390,6 +410,9 @@ class DedicatedALB(Base):
             raise RuntimeError("load_albs: List of dedicated listeners is empty")
 
         logger.info(f"Starting load_albs with {dedicated_listeners}")
+        prefetch_organization_names(
+            [organization_id for (organization_id, _, _) in dedicated_listeners]
+        )
         for dedicated_listener_info in dedicated_listeners:
             (organization_id, dedicated_alb_arn, _) = dedicated_listener_info
             tags = create_resource_tags(
@@ -446,6 +469,54 @@ class DedicatedALBListener(Base):
             db.session.commit()
 
 
+class ALBListener(Base):
+    """
+    What we know about each listener we put certificates on: how many certificates
+    it has, and the load balancer it belongs to. Choosing a listener is a query
+    against this table instead of a round of AWS calls.
+
+    certificate_count counts the listener's certificates other than its default
+    one. It goes up when a listener is reserved for a certificate, and down when
+    a certificate is removed or a reservation released, in the same transaction
+    that records the change on the service instance. It's periodically
+    reconciled against AWS (see broker.tasks.alb.index_listeners).
+    """
+
+    __tablename__ = "alb_listener"
+    id = mapped_column(db.Integer, primary_key=True)
+    listener_arn = mapped_column(db.String, nullable=False, unique=True)
+    alb_arn = mapped_column(db.String, nullable=False)
+    dns_name = mapped_column(db.String, nullable=False)
+    canonical_hosted_zone_id = mapped_column(db.String, nullable=False)
+    certificate_count = mapped_column(
+        db.Integer, nullable=False, default=0, server_default="0", index=True
+    )
+    reconciled_at = mapped_column(db.TIMESTAMP(timezone=True))
+
+    @classmethod
+    def certificate_removed(cls, listener_arn):
+        db.session.execute(
+            sa.update(cls)
+            .where(cls.listener_arn == listener_arn, cls.certificate_count > 0)
+            .values(certificate_count=cls.certificate_count - 1)
+        )
+
+    def __repr__(self):
+        return f"<ALBListener {self.listener_arn} {self.certificate_count}>"
+
+
+def release_alb_listener_reservation(service_instance):
+    """
+    give back the listener capacity reserved for a certificate that's not going to
+    be added after all. The caller commits.
+    """
+    listener_arn = getattr(service_instance, "reserved_alb_listener_arn", None)
+    if listener_arn is None:
+        return
+    ALBListener.certificate_removed(listener_arn)
+    service_instance.reserved_alb_listener_arn = None
+
+
 def change_instance_type(
     service_instance: ServiceInstance, new_type: type, session
 ) -> ServiceInstance:
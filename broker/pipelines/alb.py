@@ -4,8 +4,10 @@ from broker.tasks import (
     iam,
     letsencrypt,
     route53,
+    tags,
 )
-from broker.tasks.huey import huey
+from broker.tasks.branches import enqueue_pipeline
+from broker.tasks.huey import Priority
 
 
 def queue_all_alb_provision_tasks_for_operation(operation_id: int, correlation_id: str):
@@ -15,7 +17,8 @@ def queue_all_alb_provision_tasks_for_operation(operation_id: int, correlation_i
         raise RuntimeError("operation_id must be set")
     correlation = {"correlation_id": correlation_id}
     task_pipeline = (
-        letsencrypt.create_user.s(operation_id, **correlation)
+        tags.add_names_to_tags.s(operation_id, **correlation)
+        .then(letsencrypt.create_user, operation_id, **correlation)
         .then(letsencrypt.generate_private_key, operation_id, **correlation)
         .then(letsencrypt.initiate_challenges, operation_id, **correlation)
         .then(route53.create_TXT_records, operation_id, **correlation)
@@ -29,7 +32,7 @@ def queue_all_alb_provision_tasks_for_operation(operation_id: int, correlation_i
         .then(route53.wait_for_changes, operation_id, **correlation)
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("alb_provision", task_pipeline, Priority.USER)
 
 
 def queue_all_alb_deprovision_tasks_for_operation(
@@ -48,7 +51,7 @@ def queue_all_alb_deprovision_tasks_for_operation(
         .then(iam.delete_server_certificate, operation_id, **correlation)
         .then(update_operations.deprovision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("alb_deprovision", task_pipeline, Priority.USER)
 
 
 def queue_all_alb_update_tasks_for_operation(operation_id, correlation_id):
@@ -70,7 +73,7 @@ def queue_all_alb_update_tasks_for_operation(operation_id, correlation_id):
         .then(iam.delete_previous_server_certificate, operation_id, **correlation)
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("alb_update", task_pipeline, Priority.USER)
 
 
 def queue_all_alb_renewal_tasks_for_operation(operation_id, **kwargs):
@@ -91,4 +94,23 @@ def queue_all_alb_renewal_tasks_for_operation(operation_id, **kwargs):
         .then(iam.delete_previous_server_certificate, operation_id, **correlation)
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("alb_renewal", task_pipeline, Priority.RENEWAL)
+
+
+def queue_all_alb_rebalance_tasks_for_operation(
+    operation_id, correlation_id="Rebalance"
+):
+    # the certificate stays the same, it just moves to another listener
+    correlation = {"correlation_id": correlation_id}
+    task_pipeline = (
+        alb.add_certificate_to_alb.s(operation_id, **correlation)
+        .then(route53.create_ALIAS_records, operation_id, **correlation)
+        .then(route53.wait_for_changes, operation_id, **correlation)
+        .then(
+            alb.remove_certificate_from_previous_alb_during_update_to_dedicated,
+            operation_id,
+            **correlation,
+        )
+        .then(update_operations.provision, operation_id, **correlation)
+    )
+    enqueue_pipeline("alb_rebalance", task_pipeline, Priority.MAINTENANCE)
@@ -10,8 +10,10 @@ from broker.tasks import (
     shield,
     cloudwatch,
     sns,
+    tags,
 )
-from broker.tasks.huey import huey
+from broker.tasks.branches import Pipeline
+from broker.tasks.huey import Priority
 
 logger = logging.getLogger(__name__)
 
@@ -23,31 +25,39 @@ def queue_all_cdn_dedicated_waf_provision_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.create_user.s(operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(waf.create_cdn_web_acl, operation_id, **correlation)
-        .then(waf.put_cdn_waf_logging_configuration, operation_id, **correlation)
-        .then(cloudfront.create_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(sns.create_notification_topic, operation_id, **correlation)
-        .then(sns.subscribe_notification_topic, operation_id, **correlation)
-        .then(route53.create_new_health_checks, operation_id, **correlation)
-        .then(shield.associate_health_check, operation_id, **correlation)
-        .then(cloudwatch.create_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_ddos_detected_alarm, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
+    pipeline = (
+        Pipeline(
+            "cdn_dedicated_waf_provision", operation_id, correlation_id, Priority.USER
+        )
+        .then(tags.add_names_to_tags)
+        .parallel(
+            [
+                letsencrypt.create_user,
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_server_certificate,
+            ],
+            [waf.create_cdn_web_acl, waf.put_cdn_waf_logging_configuration],
+        )
+        .then(cloudfront.create_distribution)
+        .then(cloudfront.wait_for_distribution)
+        .parallel(
+            [route53.create_ALIAS_records, route53.wait_for_changes],
+            [
+                sns.create_notification_topic,
+                sns.subscribe_notification_topic,
+                route53.create_new_health_checks,
+                shield.associate_health_check,
+                cloudwatch.create_health_check_alarms,
+            ],
+        )
+        .then(update_operations.provision)
     )
-    huey.enqueue(task_pipeline)
+    pipeline.enqueue()
 
 
 def queue_all_cdn_dedicated_waf_deprovision_tasks_for_operation(
@@ -57,56 +67,73 @@ def queue_all_cdn_dedicated_waf_deprovision_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        update_operations.cancel_pending_provisioning.s(operation_id, **correlation)
-        .then(route53.remove_ALIAS_records, operation_id, **correlation)
-        .then(route53.remove_TXT_records, operation_id, **correlation)
-        .then(cloudwatch.delete_ddos_detected_alarm, operation_id, **correlation)
-        .then(cloudwatch.delete_health_check_alarms, operation_id, **correlation)
-        .then(shield.disassociate_health_check, operation_id, **correlation)
-        .then(route53.delete_health_checks, operation_id, **correlation)
-        .then(sns.unsubscribe_notification_topic, operation_id, **correlation)
-        .then(sns.delete_notification_topic, operation_id, **correlation)
-        .then(cloudfront.disable_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution_disabled, operation_id, **correlation)
-        .then(cloudfront.delete_distribution, operation_id=operation_id, **correlation)
-        .then(waf.delete_web_acl, operation_id=operation_id, **correlation)
-        .then(iam.delete_server_certificate, operation_id, **correlation)
-        .then(update_operations.deprovision, operation_id, **correlation)
+    pipeline = (
+        Pipeline(
+            "cdn_dedicated_waf_deprovision", operation_id, correlation_id, Priority.USER
+        )
+        .then(update_operations.cancel_pending_provisioning)
+        .then(route53.remove_ALIAS_records)
+        .then(route53.remove_TXT_records)
+        .parallel(
+            [cloudwatch.delete_ddos_detected_alarm],
+            [
+                cloudwatch.delete_health_check_alarms,
+                shield.disassociate_health_check,
+                route53.delete_health_checks,
+            ],
+            [sns.unsubscribe_notification_topic, sns.delete_notification_topic],
+            [
+                cloudfront.disable_distribution,
+                cloudfront.wait_for_distribution_disabled,
+            ],
+        )
+        .then(cloudfront.delete_distribution)
+        .then(waf.delete_web_acl)
+        .then(iam.delete_server_certificate)
+        .then(update_operations.deprovision)
     )
-    huey.enqueue(task_pipeline)
+    pipeline.enqueue()
 
 
 def queue_all_cdn_dedicated_waf_update_tasks_for_operation(
     operation_id, correlation_id
 ):
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.remove_old_DNS_records, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(waf.create_cdn_web_acl, operation_id, **correlation)
-        .then(waf.put_cdn_waf_logging_configuration, operation_id, **correlation)
-        .then(cloudfront.update_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(sns.create_notification_topic, operation_id, **correlation)
-        .then(sns.unsubscribe_notification_topic, operation_id, **correlation)
-        .then(sns.subscribe_notification_topic, operation_id, **correlation)
-        .then(route53.create_new_health_checks, operation_id, **correlation)
-        .then(shield.update_associated_health_check, operation_id, **correlation)
-        .then(route53.delete_unused_health_checks, operation_id, **correlation)
-        .then(cloudwatch.delete_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_ddos_detected_alarm, operation_id, **correlation)
-        .then(update_operations.update_complete, operation_id, **correlation)
+    pipeline = (
+        Pipeline(
+            "cdn_dedicated_waf_update", operation_id, correlation_id, Priority.USER
+        )
+        .parallel(
+            [
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                route53.remove_old_DNS_records,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_server_certificate,
+            ],
+            [waf.create_cdn_web_acl, waf.put_cdn_waf_logging_configuration],
+        )
+        .then(cloudfront.update_distribution)
+        .then(cloudfront.wait_for_distribution)
+        .parallel(
+            [
+                route53.create_ALIAS_records,
+                route53.wait_for_changes,
+                iam.delete_previous_server_certificate,
+            ],
+            [
+                sns.create_notification_topic,
+                sns.unsubscribe_notification_topic,
+                sns.subscribe_notification_topic,
+                route53.create_new_health_checks,
+                shield.update_associated_health_check,
+                route53.delete_unused_health_checks,
+                cloudwatch.delete_health_check_alarms,
+                cloudwatch.create_health_check_alarms,
+            ],
+        )
+        .then(update_operations.update_complete)
     )
-    huey.enqueue(task_pipeline)
+    pipeline.enqueue()
@@ -4,9 +4,11 @@ from broker.tasks import (
     iam,
     letsencrypt,
     route53,
+    tags,
     waf,
 )
-from broker.tasks.huey import huey
+from broker.tasks.branches import enqueue_pipeline
+from broker.tasks.huey import Priority
 
 
 def queue_all_dedicated_alb_provision_tasks_for_operation(
@@ -18,7 +20,8 @@ def queue_all_dedicated_alb_provision_tasks_for_operation(
         raise RuntimeError("operation_id must be set")
     correlation = {"correlation_id": correlation_id}
     task_pipeline = (
-        letsencrypt.create_user.s(operation_id, **correlation)
+        tags.add_names_to_tags.s(operation_id, **correlation)
+        .then(letsencrypt.create_user, operation_id, **correlation)
         .then(letsencrypt.generate_private_key, operation_id, **correlation)
         .then(letsencrypt.initiate_challenges, operation_id, **correlation)
         .then(route53.create_TXT_records, operation_id, **correlation)
@@ -35,7 +38,7 @@ def queue_all_dedicated_alb_provision_tasks_for_operation(
         .then(route53.wait_for_changes, operation_id, **correlation)
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("dedicated_alb_provision", task_pipeline, Priority.USER)
 
 
 def queue_all_dedicated_alb_renewal_tasks_for_operation(operation_id, **kwargs):
@@ -56,7 +59,7 @@ def queue_all_dedicated_alb_renewal_tasks_for_operation(operation_id, **kwargs):
         .then(iam.delete_previous_server_certificate, operation_id, **correlation)
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("dedicated_alb_renewal", task_pipeline, Priority.RENEWAL)
 
 
 def queue_all_dedicated_alb_update_tasks_for_operation(operation_id, correlation_id):
@@ -81,4 +84,26 @@ def queue_all_dedicated_alb_update_tasks_for_operation(operation_id, correlation
         .then(iam.delete_previous_server_certificate, operation_id, **correlation)
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("dedicated_alb_update", task_pipeline, Priority.USER)
+
+
+def queue_all_dedicated_alb_rebalance_tasks_for_operation(
+    operation_id, correlation_id="Rebalance"
+):
+    # the certificate stays the same, it just moves to another listener
+    correlation = {"correlation_id": correlation_id}
+    task_pipeline = (
+        alb.add_certificate_to_alb.s(operation_id, **correlation)
+        .then(waf.create_alb_web_acl, operation_id, **correlation)
+        .then(waf.put_alb_waf_logging_configuration, operation_id, **correlation)
+        .then(waf.associate_alb_web_acl, operation_id, **correlation)
+        .then(route53.create_ALIAS_records, operation_id, **correlation)
+        .then(route53.wait_for_changes, operation_id, **correlation)
+        .then(
+            alb.remove_certificate_from_previous_alb_during_update_to_dedicated,
+            operation_id,
+            **correlation,
+        )
+        .then(update_operations.provision, operation_id, **correlation)
+    )
+    enqueue_pipeline("dedicated_alb_rebalance", task_pipeline, Priority.MAINTENANCE)
@@ -8,7 +8,8 @@ from broker.tasks import (
     letsencrypt,
     route53,
 )
-from broker.tasks.huey import huey
+from broker.tasks.branches import Pipeline, enqueue_pipeline
+from broker.tasks.huey import Priority
 
 logger = logging.getLogger(__name__)
 
@@ -22,31 +23,35 @@ def queue_all_migration_deprovision_tasks_for_operation(
         raise RuntimeError("operation_id must be set")
     correlation = {"correlation_id": correlation_id}
     task_pipeline = update_operations.deprovision.s(operation_id, **correlation)
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("migration_deprovision", task_pipeline, Priority.USER)
 
 
 def queue_all_cdn_broker_migration_tasks_for_operation(operation_id, correlation_id):
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        cloudfront.remove_s3_bucket_from_cdn_broker_instance.s(
-            operation_id, **correlation
+    pipeline = (
+        Pipeline("cdn_broker_migration", operation_id, correlation_id, Priority.USER)
+        .parallel(
+            [
+                cloudfront.remove_s3_bucket_from_cdn_broker_instance,
+                cloudfront.add_logging_to_bucket,
+            ],
+            [
+                letsencrypt.create_user,
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_ALIAS_records,
+                route53.wait_for_changes,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_server_certificate,
+            ],
         )
-        .then(cloudfront.add_logging_to_bucket, operation_id, **correlation)
-        .then(letsencrypt.create_user, operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(cloudfront.update_certificate, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(update_operations.provision, operation_id, **correlation)
+        .then(cloudfront.update_certificate)
+        .then(iam.delete_previous_server_certificate)
+        .then(update_operations.provision)
     )
-    huey.enqueue(task_pipeline)
+    pipeline.enqueue()
 
 
 def queue_all_domain_broker_migration_tasks_for_operation(operation_id, correlation_id):
@@ -71,4 +76,4 @@ def queue_all_domain_broker_migration_tasks_for_operation(operation_id, correlat
         .then(iam.delete_previous_server_certificate, operation_id, **correlation)
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("domain_broker_migration", task_pipeline, Priority.USER)
@@ -11,7 +11,8 @@ from broker.tasks import (
     sns,
     update_instances,
 )
-from broker.tasks.huey import huey
+from broker.tasks.branches import Pipeline, enqueue_pipeline
+from broker.tasks.huey import Priority
 
 
 def queue_all_alb_to_dedicated_alb_update_tasks_for_operation(
@@ -37,7 +38,7 @@ def queue_all_alb_to_dedicated_alb_update_tasks_for_operation(
         )
         .then(update_operations.provision, operation_id, **correlation)
     )
-    huey.enqueue(task_pipeline)
+    enqueue_pipeline("alb_to_dedicated_alb_update", task_pipeline, Priority.USER)
 
 
 def queue_all_dedicated_alb_to_cdn_dedicated_waf_update_tasks_for_operation(
@@ -47,43 +48,45 @@ def queue_all_dedicated_alb_to_cdn_dedicated_waf_update_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        alb.store_alb_certificate.s(operation_id, **correlation)
-        .then(letsencrypt.generate_private_key, operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(route53.remove_old_DNS_records, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_cloudfront_server_certificate, operation_id, **correlation)
-        .then(waf.create_cdn_web_acl, operation_id, **correlation)
-        .then(waf.put_cdn_waf_logging_configuration, operation_id, **correlation)
-        .then(cloudfront.create_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(sns.create_notification_topic, operation_id, **correlation)
-        .then(sns.subscribe_notification_topic, operation_id, **correlation)
-        .then(route53.create_new_health_checks, operation_id, **correlation)
-        .then(shield.associate_health_check, operation_id, **correlation)
-        .then(cloudwatch.create_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_ddos_detected_alarm, operation_id, **correlation)
-        .then(
-            alb.remove_alb_certificate_during_update_to_cdn_dedicated_waf,
+    pipeline = (
+        Pipeline(
+            "dedicated_alb_to_cdn_dedicated_waf_update",
             operation_id,
-            **correlation,
+            correlation_id,
+            Priority.USER,
         )
-        .then(iam.delete_previous_alb_server_certificate, operation_id, **correlation)
-        .then(
-            update_instances.change_to_cdn_dedicated_waf_instance_type,
-            operation_id,
-            **correlation,
+        .then(alb.store_alb_certificate)
+        .parallel(
+            [
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                route53.remove_old_DNS_records,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_cloudfront_server_certificate,
+            ],
+            [waf.create_cdn_web_acl, waf.put_cdn_waf_logging_configuration],
         )
-        .then(update_operations.update_complete, operation_id, **correlation)
+        .then(cloudfront.create_distribution)
+        .then(cloudfront.wait_for_distribution)
+        .parallel(
+            [route53.create_ALIAS_records, route53.wait_for_changes],
+            [
+                sns.create_notification_topic,
+                sns.subscribe_notification_topic,
+                route53.create_new_health_checks,
+                shield.associate_health_check,
+                cloudwatch.create_health_check_alarms,
+            ],
+        )
+        .then(alb.remove_alb_certificate_during_update_to_cdn_dedicated_waf)
+        .then(iam.delete_previous_alb_server_certificate)
+        .then(update_instances.change_to_cdn_dedicated_waf_instance_type)
+        .then(update_operations.update_complete)
     )
-    huey.enqueue(task_pipeline)
+    pipeline.enqueue()
 
 
 def queue_all_cdn_to_cdn_dedicated_waf_update_tasks_for_operation(
@@ -93,27 +96,41 @@ def queue_all_cdn_to_cdn_dedicated_waf_update_tasks_for_operation(
         raise RuntimeError("correlation_id must be set")
     if operation_id is None:
         raise RuntimeError("operation_id must be set")
-    correlation = {"correlation_id": correlation_id}
-    task_pipeline = (
-        letsencrypt.generate_private_key.s(operation_id, **correlation)
-        .then(letsencrypt.initiate_challenges, operation_id, **correlation)
-        .then(route53.create_TXT_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(letsencrypt.answer_challenges, operation_id, **correlation)
-        .then(letsencrypt.retrieve_certificate, operation_id, **correlation)
-        .then(iam.upload_server_certificate, operation_id, **correlation)
-        .then(waf.create_cdn_web_acl, operation_id, **correlation)
-        .then(cloudfront.update_distribution, operation_id, **correlation)
-        .then(cloudfront.wait_for_distribution, operation_id, **correlation)
-        .then(route53.create_ALIAS_records, operation_id, **correlation)
-        .then(route53.wait_for_changes, operation_id, **correlation)
-        .then(iam.delete_previous_server_certificate, operation_id, **correlation)
-        .then(sns.create_notification_topic, operation_id, **correlation)
-        .then(sns.subscribe_notification_topic, operation_id, **correlation)
-        .then(route53.create_new_health_checks, operation_id, **correlation)
-        .then(shield.associate_health_check, operation_id, **correlation)
-        .then(cloudwatch.create_health_check_alarms, operation_id, **correlation)
-        .then(cloudwatch.create_ddos_detected_alarm, operation_id, **correlation)
-        .then(update_operations.update_complete, operation_id, **correlation)
+    pipeline = (
+        Pipeline(
+            "cdn_to_cdn_dedicated_waf_update",
+            operation_id,
+            correlation_id,
+            Priority.USER,
+        )
+        .parallel(
+            [
+                letsencrypt.generate_private_key,
+                letsencrypt.initiate_challenges,
+                route53.create_TXT_records,
+                route53.wait_for_changes,
+                letsencrypt.answer_challenges,
+                letsencrypt.retrieve_certificate,
+                iam.upload_server_certificate,
+            ],
+            [waf.create_cdn_web_acl],
+        )
+        .then(cloudfront.update_distribution)
+        .then(cloudfront.wait_for_distribution)
+        .parallel(
+            [
+                route53.create_ALIAS_records,
+                route53.wait_for_changes,
+                iam.delete_previous_server_certificate,
+            ],
+            [
+                sns.create_notification_topic,
+                sns.subscribe_notification_topic,
+                route53.create_new_health_checks,
+                shield.associate_health_check,
+                cloudwatch.create_health_check_alarms,
+            ],
+        )
+        .then(update_operations.update_complete)
     )
-    huey.enqueue(task_pipeline)
+    pipeline.enqueue()
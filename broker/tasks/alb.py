@@ -1,46 +1,192 @@
+from collections import defaultdict
+from datetime import datetime, timezone
 import logging
 import time
 
 from sqlalchemy import and_, select, func, null
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import aliased
 
 from broker.aws import alb
 from broker.extensions import config, db
 from broker.models import (
+    ALBListener,
+    ALBServiceInstance,
     DedicatedALBListener,
     DedicatedALBServiceInstance,
     Certificate,
     Operation,
+    ServiceInstance,
+    release_alb_listener_reservation,
 )
-from broker.tasks.huey import pipeline_operation
+from broker.tasks.huey import pipeline_operation, wait_without_blocking
+from broker.tasks.iam import call_when_propagated
 
 logger = logging.getLogger(__name__)
 
 
-def get_lowest_used_alb(listener_arns) -> tuple[str, str]:
-    # given a list of listener arns, find the listener with the least certificates associated
-    # return a tuple of the load balancer arn and listener arn
-    https_listeners = []
+# DescribeListeners and DescribeLoadBalancers take at most 20 ARNs per call
+ARNS_PER_DESCRIBE = 20
+
+
+def _batches(items, size=ARNS_PER_DESCRIBE):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _count_listener_certificates(listener_arn) -> int:
+    # the default certificate doesn't count against the listener's quota
+    paginator = alb.get_paginator("describe_listener_certificates")
+    return sum(
+        not certificate.get("IsDefault", False)
+        for response in paginator.paginate(ListenerArn=listener_arn)
+        for certificate in response["Certificates"]
+    )
+
+
+def index_listeners(listener_arns):
+    """
+    Record the certificate count and load balancer of each listener in the
+    ALBListener index, as AWS currently sees them, plus the certificates
+    reserved on each listener that haven't been added to it yet.
+
+    Certificates added or removed while this runs can leave a count off by
+    one until the next run.
+    """
+    listener_arns = list(listener_arns)
+    if not listener_arns:
+        return
+    certificate_counts = {
+        listener_arn: _count_listener_certificates(listener_arn)
+        for listener_arn in listener_arns
+    }
+
+    alb_arns = {}
+    for batch in _batches(listener_arns):
+        response = alb.describe_listeners(ListenerArns=batch)
+        for listener in response["Listeners"]:
+            alb_arns[listener["ListenerArn"]] = listener["LoadBalancerArn"]
+
+    load_balancers = {}
+    for batch in _batches(sorted(set(alb_arns.values()))):
+        response = alb.describe_load_balancers(LoadBalancerArns=batch)
+        for load_balancer in response["LoadBalancers"]:
+            load_balancers[load_balancer["LoadBalancerArn"]] = load_balancer
+
+    reconciled_at = datetime.now(timezone.utc)
+    listeners = []
     for listener_arn in listener_arns:
-        certificates = alb.describe_listener_certificates(ListenerArn=listener_arn)
-        https_listeners.append(
-            dict(listener_arn=listener_arn, certificates=certificates["Certificates"])
+        load_balancer = load_balancers.get(alb_arns.get(listener_arn))
+        if load_balancer is None:
+            logger.warning("Could not find load balancer for listener %s", listener_arn)
+            continue
+        listeners.append(
+            dict(
+                listener_arn=listener_arn,
+                alb_arn=load_balancer["LoadBalancerArn"],
+                dns_name=load_balancer["DNSName"],
+                canonical_hosted_zone_id=load_balancer["CanonicalHostedZoneId"],
+                certificate_count=certificate_counts[listener_arn],
+                reconciled_at=reconciled_at,
+            )
+        )
+    if not listeners:
+        return
+
+    # wait for reservations being made right now, so we count them below
+    db.session.execute(
+        select(ALBListener.id)
+        .where(ALBListener.listener_arn.in_(listener_arns))
+        .with_for_update()
+    )
+    reserved = ServiceInstance.__table__.c.reserved_alb_listener_arn
+    reservations = dict(
+        db.session.execute(
+            select(reserved, func.count())
+            .where(reserved.in_(listener_arns))
+            .group_by(reserved)
+        ).all()
+    )
+    for listener in listeners:
+        listener["certificate_count"] += reservations.get(listener["listener_arn"], 0)
+
+    stmt = insert(ALBListener).values(listeners)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["listener_arn"],
+        set_={
+            column: stmt.excluded[column]
+            for column in (
+                "alb_arn",
+                "dns_name",
+                "canonical_hosted_zone_id",
+                "certificate_count",
+                "reconciled_at",
+            )
+        },
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+
+def _index_missing_listeners(listener_arns):
+    indexed = set(
+        db.session.scalars(
+            select(ALBListener.listener_arn).where(
+                ALBListener.listener_arn.in_(listener_arns)
+            )
+        )
+    )
+    index_listeners(
+        [listener_arn for listener_arn in listener_arns if listener_arn not in indexed]
+    )
+
+
+def get_indexed_listener(listener_arn) -> ALBListener:
+    _index_missing_listeners([listener_arn])
+    return db.session.scalars(
+        select(ALBListener).where(ALBListener.listener_arn == listener_arn)
+    ).one()
+
+
+def reserve_lowest_used_alb(service_instance, listener_arns):
+    """
+    Point service_instance at the listener in listener_arns with the fewest
+    certificates, and count the certificate we're about to add against it, so
+    selections running at the same time spread out instead of all picking the
+    same listener. The caller commits.
+    """
+    release_alb_listener_reservation(service_instance)
+    _index_missing_listeners(listener_arns)
+    query = (
+        select(ALBListener)
+        .where(
+            ALBListener.listener_arn.in_(listener_arns),
+            ALBListener.certificate_count < config.MAX_CERTS_PER_LISTENER,
         )
-    if len(https_listeners) == 0:
+        .order_by(ALBListener.certificate_count, ALBListener.listener_arn)
+        .limit(1)
+    )
+    # pass over listeners other selections are reserving right now
+    selected_listener = db.session.scalars(
+        query.with_for_update(skip_locked=True)
+    ).first()
+    if selected_listener is None:
+        # every listener with room is being reserved, so wait our turn
+        selected_listener = db.session.scalars(query.with_for_update()).first()
+    if selected_listener is None:
         raise RuntimeError(
-            "Could not find any HTTPS listeners. Check the app configuration."
+            "Could not find any HTTPS listeners with room for another certificate. Check the app configuration."
         )
-    https_listeners.sort(key=lambda x: len(x["certificates"]))
-    selected_listener = https_listeners[0]
-    selected_arn = selected_listener["listener_arn"]
-    listener_data = alb.describe_listeners(ListenerArns=[selected_arn])
-    listener_data = listener_data["Listeners"][0]
-    return listener_data["LoadBalancerArn"], listener_data["ListenerArn"]
+    selected_listener.certificate_count = ALBListener.certificate_count + 1
+
+    service_instance.alb_arn = selected_listener.alb_arn
+    service_instance.alb_listener_arn = selected_listener.listener_arn
+    service_instance.reserved_alb_listener_arn = selected_listener.listener_arn
 
 
 def get_potential_listeners_for_dedicated_instance(service_instance):
     # n.b. we're counting on our db count here
-    # and elsewhere we rely on AWS's count.
+    # and elsewhere we rely on the ALBListener index.
 
     # Get the listeners dedicated to the org for this service (service_instance.org_id)
     active_instances = (
@@ -50,10 +196,7 @@ def get_potential_listeners_for_dedicated_instance(service_instance):
     )
     instance_subquery = aliased(DedicatedALBServiceInstance, active_instances)
     query = (
-        select(
-            DedicatedALBListener.id,
-            func.count(instance_subquery.id).label("count"),
-        )
+        select(DedicatedALBListener)
         .join_from(
             DedicatedALBListener,
             instance_subquery,
@@ -64,14 +207,9 @@ def get_potential_listeners_for_dedicated_instance(service_instance):
         .group_by(DedicatedALBListener.id)
         .having(func.count(instance_subquery.id) < config.MAX_CERTS_PER_ALB)
     )
-    dedicated_listener_ids = db.session.execute(query).all()
-
-    if len(dedicated_listener_ids) > 0:
-        potential_listeners = [
-            db.session.get(DedicatedALBListener, listener_id[0])
-            for listener_id in dedicated_listener_ids
-        ]
-    else:
+    potential_listeners = db.session.scalars(query).all()
+
+    if len(potential_listeners) == 0:
         raise RuntimeError(
             f"Could not find potential listeners for org {service_instance.org_id}"
         )
@@ -86,23 +224,105 @@ def get_lowest_dedicated_alb(service_instance, db):
     listener_arns = [listener.listener_arn for listener in potential_listeners]
     listener_arns.sort()  # this just makes testing easier
 
-    alb_arn, alb_listener_arn = get_lowest_used_alb(listener_arns)
+    reserve_lowest_used_alb(service_instance, listener_arns)
     selected_listener = [
         listener
         for listener in potential_listeners
-        if listener.listener_arn == alb_listener_arn
+        if listener.listener_arn == service_instance.alb_listener_arn
     ][0]
-    selected_listener.alb_arn = alb_arn
+    selected_listener.alb_arn = service_instance.alb_arn
     selected_listener.dedicated_org = service_instance.org_id
 
-    service_instance.alb_arn = alb_arn
-    service_instance.alb_listener_arn = alb_listener_arn
-
     db.session.add(service_instance)
     db.session.add(selected_listener)
     db.session.commit()
 
 
+def get_listener_pools() -> list[tuple[type, list[str]]]:
+    """
+    The groups of listeners certificates can move between: the shared listeners,
+    and each org's dedicated listeners, with the kind of instance using each group
+    """
+    pools = [(ALBServiceInstance, sorted(config.ALB_LISTENER_ARNS))]
+    dedicated_listeners = defaultdict(list)
+    for org, listener_arn in db.session.execute(
+        select(
+            DedicatedALBListener.dedicated_org, DedicatedALBListener.listener_arn
+        ).order_by(
+            DedicatedALBListener.dedicated_org, DedicatedALBListener.listener_arn
+        )
+    ):
+        dedicated_listeners[org].append(listener_arn)
+    pools += [
+        (DedicatedALBServiceInstance, listener_arns)
+        for listener_arns in dedicated_listeners.values()
+    ]
+    return pools
+
+
+def plan_listener_moves(
+    certificate_counts: dict[str, int], budget: int
+) -> list[tuple[str, str]]:
+    """
+    Plan up to `budget` single-certificate moves, each from the fullest listener to
+    the emptiest, that bring certificate_counts as close to even as they'll go.
+    Returns (from listener arn, to listener arn) pairs.
+    """
+    counts = dict(certificate_counts)
+    moves = []
+    while len(moves) < budget and len(counts) > 1:
+        fullest = max(
+            counts, key=lambda listener_arn: (counts[listener_arn], listener_arn)
+        )
+        emptiest = min(
+            counts, key=lambda listener_arn: (counts[listener_arn], listener_arn)
+        )
+        if counts[fullest] - counts[emptiest] <= 1:
+            break
+        counts[fullest] -= 1
+        counts[emptiest] += 1
+        moves.append((fullest, emptiest))
+    return moves
+
+
+def find_movable_instance(instance_model, listener_arn):
+    """
+    An active instance on listener_arn that isn't part way through changing
+    certificates or load balancers, or None
+    """
+    return db.session.scalars(
+        select(instance_model)
+        .where(
+            instance_model.alb_listener_arn == listener_arn,
+            instance_model.deactivated_at.is_(None),
+            instance_model.current_certificate_id.is_not(None),
+            instance_model.new_certificate_id.is_(None),
+            instance_model.previous_alb_listener_arn.is_(None),
+            instance_model.reserved_alb_listener_arn.is_(None),
+            ~instance_model.operations.any(
+                and_(
+                    Operation.state == Operation.States.IN_PROGRESS.value,
+                    Operation.canceled_at.is_(None),
+                )
+            ),
+        )
+        .order_by(instance_model.id)
+        .limit(1)
+    ).first()
+
+
+def prepare_listener_move(service_instance, listener_arn):
+    """
+    Reserve listener_arn for service_instance's current certificate, so the
+    rebalance pipeline adds it there, switches DNS, and then removes it from the
+    listener it's on now. The caller commits.
+    """
+    service_instance.previous_alb_arn = service_instance.alb_arn
+    service_instance.previous_alb_listener_arn = service_instance.alb_listener_arn
+    service_instance.new_certificate = service_instance.current_certificate
+    reserve_lowest_used_alb(service_instance, [listener_arn])
+
+
 @pipeline_operation("Selecting load balancer")
 def select_dedicated_alb(operation_id, *, operation, db, **kwargs):
     service_instance = operation.service_instance
@@ -129,9 +349,7 @@ def select_alb(operation_id, *, operation, db, **kwargs):
     service_instance.previous_alb_listener_arn = service_instance.alb_listener_arn
     service_instance.previous_alb_arn = service_instance.alb_arn
 
-    service_instance.alb_arn, service_instance.alb_listener_arn = get_lowest_used_alb(
-        config.ALB_LISTENER_ARNS
-    )
+    reserve_lowest_used_alb(service_instance, config.ALB_LISTENER_ARNS)
     db.session.add(service_instance)
     db.session.commit()
 
@@ -141,17 +359,18 @@ def add_certificate_to_alb(operation_id, *, operation, db, **kwargs):
     service_instance = operation.service_instance
     certificate = service_instance.new_certificate
 
-    alb.add_listener_certificates(
+    # the certificate was probably uploaded moments ago
+    call_when_propagated(
+        alb.add_listener_certificates,
+        ["CertificateNotFound"],
         ListenerArn=service_instance.alb_listener_arn,
         Certificates=[{"CertificateArn": certificate.iam_server_certificate_arn}],
     )
-    alb_config = alb.describe_load_balancers(
-        LoadBalancerArns=[service_instance.alb_arn]
-    )
-    service_instance.domain_internal = alb_config["LoadBalancers"][0]["DNSName"]
-    service_instance.route53_alias_hosted_zone = alb_config["LoadBalancers"][0][
-        "CanonicalHostedZoneId"
-    ]
+    listener = get_indexed_listener(service_instance.alb_listener_arn)
+    service_instance.domain_internal = listener.dns_name
+    service_instance.route53_alias_hosted_zone = listener.canonical_hosted_zone_id
+    # the certificate was counted when we reserved the listener
+    service_instance.reserved_alb_listener_arn = None
     service_instance.current_certificate = certificate
     service_instance.new_certificate = None
     db.session.add(service_instance)
@@ -171,10 +390,13 @@ def remove_certificate_from_alb(operation_id, *, operation, db, **kwargs):
                 }
             ],
         )
+        if service_instance.reserved_alb_listener_arn is None:
+            ALBListener.certificate_removed(service_instance.alb_listener_arn)
+    # a certificate that never made it onto the listener only holds a reservation
+    release_alb_listener_reservation(service_instance)
 
     db.session.add(service_instance)
     db.session.commit()
-    time.sleep(config.IAM_CERTIFICATE_PROPAGATION_TIME)
 
 
 @pipeline_operation("Removing SSL certificate from load balancer")
@@ -188,13 +410,14 @@ def remove_certificate_from_previous_alb(operation_id, *, operation, db, **kwarg
     ).first()
 
     if service_instance.previous_alb_listener_arn is not None:
-        time.sleep(config.ALB_OVERLAP_SLEEP_TIME)
+        wait_without_blocking(operation, db, config.ALB_OVERLAP_SLEEP_TIME)
         alb.remove_listener_certificates(
             ListenerArn=service_instance.previous_alb_listener_arn,
             Certificates=[
                 {"CertificateArn": remove_certificate.iam_server_certificate_arn}
             ],
         )
+        ALBListener.certificate_removed(service_instance.previous_alb_listener_arn)
 
     _wait_for_certificate_removal(
         service_instance.previous_alb_listener_arn,
@@ -215,13 +438,14 @@ def remove_alb_certificate_during_update_to_cdn_dedicated_waf(
     remove_certificate = service_instance.alb_certificate
 
     if service_instance.alb_listener_arn is not None:
-        time.sleep(config.ALB_OVERLAP_SLEEP_TIME)
+        wait_without_blocking(operation, db, config.ALB_OVERLAP_SLEEP_TIME)
         alb.remove_listener_certificates(
             ListenerArn=service_instance.alb_listener_arn,
             Certificates=[
                 {"CertificateArn": remove_certificate.iam_server_certificate_arn}
             ],
         )
+        ALBListener.certificate_removed(service_instance.alb_listener_arn)
 
     service_instance.alb_certificate = None
     service_instance.previous_alb_arn = None
@@ -238,13 +462,14 @@ def remove_certificate_from_previous_alb_during_update_to_dedicated(
     remove_certificate = service_instance.current_certificate
 
     if service_instance.previous_alb_listener_arn is not None:
-        time.sleep(config.ALB_OVERLAP_SLEEP_TIME)
+        wait_without_blocking(operation, db, config.ALB_OVERLAP_SLEEP_TIME)
         alb.remove_listener_certificates(
             ListenerArn=service_instance.previous_alb_listener_arn,
             Certificates=[
                 {"CertificateArn": remove_certificate.iam_server_certificate_arn}
             ],
         )
+        ALBListener.certificate_removed(service_instance.previous_alb_listener_arn)
 
     service_instance.previous_alb_arn = None
     service_instance.previous_alb_listener_arn = None
@@ -0,0 +1,346 @@
+import hashlib
+import json
+import logging
+
+from huey.api import chord
+from huey.exceptions import CancelExecution
+from sqlalchemy.orm.attributes import flag_modified
+
+from broker.extensions import config, db
+from broker.models import Operation
+from broker.tasks import huey
+
+logger = logging.getLogger(__name__)
+
+# pipeline definitions by reference, see register_pipeline
+PIPELINES_KEY = "pipelines"
+_pipelines = {}
+
+
+class Pipeline:
+    """
+    Build a task pipeline out of steps that run one after another, and stages of
+    branches that run in parallel. The step after a parallel stage starts once every
+    branch has finished.
+
+    Usage:
+
+    pipeline = (
+        Pipeline("cdn_provision", operation_id, correlation_id, huey.Priority.USER)
+        .then(letsencrypt.create_user)
+        .parallel(
+            [letsencrypt.generate_private_key, letsencrypt.initiate_challenges],
+            [waf.create_cdn_web_acl],
+        )
+        .then(update_operations.provision)
+    )
+    pipeline.enqueue()
+
+    When config.PIPELINE_PARALLEL_BRANCHES is false, each stage's branches run one
+    after another instead, in the order they're declared.
+
+    Every task in the pipeline, including the ones in branches, runs at `priority`.
+
+    The pipeline's stages are registered under its name (see register_pipeline),
+    and only the first step is queued. Each message carries the pipeline reference
+    and its step, and when a step finishes, continue_pipeline queues the next one.
+    The operation records the stages and counts each one as it finishes, so
+    resume_pipeline can pick up after the last one.
+    """
+
+    def __init__(self, name, operation_id, correlation_id, priority: huey.Priority):
+        self.name = name
+        self.operation_id = operation_id
+        self.correlation_id = correlation_id
+        self.priority = priority
+        self.stages = []
+
+    def then(self, task):
+        self.stages.append(task)
+        return self
+
+    def parallel(self, *branches):
+        self.stages.append([list(branch) for branch in branches])
+        return self
+
+    def enqueue(self):
+        stages = self.definition()
+        reference = register_pipeline(self.name, stages)
+        huey.record_pipeline(
+            self.operation_id,
+            {
+                "pipeline": reference,
+                "priority": int(self.priority),
+                "correlation_id": self.correlation_id,
+                "stages": stages,
+            },
+        )
+        enqueue_step(
+            self.operation_id,
+            reference,
+            0,
+            correlation_id=self.correlation_id,
+            organization_guid=huey.organization_for_operation(self.operation_id),
+            priority=self.priority,
+        )
+
+    def definition(self) -> list:
+        """the task_name of each step, or for a parallel stage, of each branch's steps"""
+        stages = []
+        for stage in self.stages:
+            if isinstance(stage, list):
+                stages.append(
+                    [
+                        [huey.task_name(task.task_class) for task in branch]
+                        for branch in stage
+                    ]
+                )
+            else:
+                stages.append(huey.task_name(stage.task_class))
+        return stages
+
+
+def enqueue_pipeline(name, pipeline, priority: huey.Priority):
+    """
+    queue a pipeline built with .s().then() as a registered Pipeline, so that
+    every task in it runs at `priority`, takes turns with other organizations'
+    work, and can resume where it stopped
+    """
+    operation_id = pipeline.args[0]
+    steps = Pipeline(
+        name, operation_id, pipeline.kwargs.get("correlation_id"), priority
+    )
+    task = pipeline
+    while task is not None:
+        steps.then(huey.registered_tasks[huey.task_name(type(task))])
+        task = task.on_complete
+    steps.enqueue()
+
+
+def register_pipeline(name, stages: list) -> str:
+    """
+    Register a pipeline's stages (see Pipeline.definition) under its name and a
+    version derived from them, and return the "name:version" reference its
+    messages carry. Definitions are kept in redis, so any worker can find the next
+    step of a pipeline another process queued, even after a deploy changes it.
+    """
+    encoded = json.dumps(stages)
+    version = hashlib.sha256(encoded.encode()).hexdigest()[:12]
+    reference = f"{name}:{version}"
+    huey.huey.storage.conn.hsetnx(PIPELINES_KEY, reference, encoded)
+    _pipelines[reference] = stages
+    return reference
+
+
+def pipeline_stages(reference) -> list:
+    stages = _pipelines.get(reference)
+    if stages is None:
+        encoded = huey.huey.storage.conn.hget(PIPELINES_KEY, reference)
+        if encoded is None:
+            raise RuntimeError(f"Pipeline {reference} isn't registered")
+        stages = _pipelines[reference] = json.loads(encoded)
+    return stages
+
+
+def _parts(stage) -> list:
+    """a parallel stage's steps, in the order they run when branches are disabled"""
+    return [name for branch in stage for name in branch]
+
+
+def enqueue_step(
+    operation_id,
+    reference,
+    step: int,
+    part: int = 0,
+    *,
+    correlation_id,
+    organization_guid,
+    priority,
+):
+    """
+    queue stage `step` of a registered pipeline, or when branches don't run in
+    parallel, step `part` of that stage. Does nothing past the last stage.
+    """
+    stages = pipeline_stages(reference)
+    if step >= len(stages):
+        return
+    stage = stages[step]
+    context = dict(
+        pipeline=reference,
+        step=step,
+        correlation_id=correlation_id,
+        organization_guid=organization_guid,
+        priority=priority,
+    )
+    if not isinstance(stage, list):
+        task = huey.registered_tasks[stage].s(operation_id, **context)
+    elif config.PIPELINE_PARALLEL_BRANCHES:
+        task = _parallel_stage(operation_id, stage, context)
+    else:
+        task = huey.registered_tasks[_parts(stage)[part]].s(
+            operation_id, part=part, **context
+        )
+    huey.huey.enqueue(task)
+
+
+def _parallel_stage(operation_id, branches, context):
+    serialize = huey.huey.serialize_task
+    correlation = dict(
+        correlation_id=context["correlation_id"],
+        organization_guid=context["organization_guid"],
+        priority=context["priority"],
+    )
+    chains = []
+    for index, branch in enumerate(branches):
+        chain = None
+        for task in reversed(
+            [huey.registered_tasks[name] for name in branch] + [end_branch]
+        ):
+            link = task.s(operation_id, branch=index, **correlation)
+            if chain is not None:
+                link.then(chain)
+            chain = link
+        chains.append(serialize(chain))
+    # the join finishes the stage, so it carries the pipeline and step
+    join = join_branches.s(operation_id, **context)
+    return start_branches.s(
+        operation_id, branches=chains, join=serialize(join), **correlation
+    )
+
+
+@huey.huey.post_execute(name="continue_pipeline")
+def continue_pipeline(task, task_value, exc):
+    """once a pipeline's step succeeds, record it and queue the next one"""
+    kwargs = task.kwargs
+    if exc is not None or "pipeline" not in kwargs:
+        return
+    operation_id = task.args[0]
+    reference, step, part = kwargs["pipeline"], kwargs["step"], kwargs.get("part")
+    context = dict(
+        correlation_id=kwargs.get("correlation_id"),
+        organization_guid=kwargs.get("organization_guid"),
+        priority=task.priority,
+    )
+    if part is not None and part + 1 < len(_parts(pipeline_stages(reference)[step])):
+        enqueue_step(operation_id, reference, step, part + 1, **context)
+        return
+    with huey.huey.flask_app.app_context():
+        huey.complete_step(operation_id, step)
+        operation = db.session.get(Operation, operation_id)
+        if operation is not None and step + 1 >= len(pipeline_stages(reference)):
+            huey.unlock_service_instance(operation)
+        elif operation is not None:
+            # start the lease over while the next step waits in the queue
+            huey.extend_service_instance_lock(operation, 0)
+    enqueue_step(operation_id, reference, step + 1, **context)
+
+
+@huey.huey.post_execute(name="finish_failed_branch")
+def finish_failed_branch(task, task_value, exc):
+    """when a task in a parallel branch fails for good, count its branch as done"""
+    if exc is not None and not task.retries:
+        fail_branch(task, exc)
+
+
+def fail_branch(task, exc):
+    """
+    Count the branch `task` belongs to as finished with `exc`, so the join still
+    runs once the other branches finish, instead of waiting forever for a branch
+    that's stopped before its end. Does nothing for tasks outside a branch.
+    """
+    if task.chord_config is not None:
+        # the branch's last task, which huey counts itself
+        return
+    tail = task.on_complete
+    while tail is not None and tail.on_complete is not None:
+        tail = tail.on_complete
+    if tail is None or tail.chord_config is None:
+        return
+    huey.huey._check_chord(tail, exc)
+
+
+def cancel_branch(task, operation):
+    """wind down the branch or join `task` belongs to, since it won't run"""
+    if isinstance(task, join_branches.task_class):
+        huey.untrack_branches(operation.id)
+        huey.unlock_service_instance(operation)
+    else:
+        fail_branch(task, CancelExecution(retry=False))
+
+
+@huey.retriable_task
+def start_branches(operation_id: int, *, branches, join, **kwargs):
+    huey.track_branches(operation_id, len(branches))
+    huey.huey.enqueue(
+        chord(
+            [huey.huey.deserialize_task(branch) for branch in branches],
+            huey.huey.deserialize_task(join),
+        )
+    )
+
+
+@huey.retriable_task
+def end_branch(operation_id: int, *, branch, **kwargs):
+    operation = db.session.get(Operation, operation_id, with_for_update=True)
+    description = huey.describe_branch(operation_id, branch, None)
+    if description:
+        operation.step_description = description
+        flag_modified(operation, "step_description")
+        db.session.add(operation)
+    db.session.commit()
+
+
+@huey.retriable_task
+def join_branches(operation_id: int, results, *, then=None, **kwargs):
+    huey.untrack_branches(operation_id)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        # a branch that failed for good has already marked the operation failed,
+        # but left the lock to us so the other branches could finish
+        logger.info(
+            f"not continuing operation {operation_id}: {len(failures)} branch(es) failed"
+        )
+        operation = db.session.get(Operation, operation_id)
+        if operation is not None:
+            huey.unlock_service_instance(operation)
+        # and canceling keeps continue_pipeline from queuing the next step
+        raise CancelExecution(retry=False)
+    if then is not None:
+        # joins queued before pipelines were registered carry the rest of the chain
+        huey.huey.enqueue(huey.huey.deserialize_task(then))
+
+
+def resume_pipeline(operation) -> bool:
+    """
+    Queue the rest of the pipeline recorded on operation, starting at the first
+    step that hasn't finished. Return False if there's no pipeline recorded that we
+    can rebuild, because the operation was queued before we recorded them or one
+    of its tasks has since been renamed.
+    """
+    definition = operation.pipeline
+    if not definition:
+        return False
+    stages = definition["stages"]
+    names = [
+        name
+        for stage in stages
+        for name in (_parts(stage) if isinstance(stage, list) else [stage])
+    ]
+    missing = [name for name in names if name not in huey.registered_tasks]
+    if missing:
+        logger.warning(f"can't resume operation {operation.id}: no task {missing[0]}")
+        return False
+    name = definition.get("pipeline", "recovered").split(":")[0]
+    logger.info(
+        f"Resuming operation {operation.id} at step {operation.completed_steps + 1}"
+        f" of {len(stages)}"
+    )
+    enqueue_step(
+        operation.id,
+        register_pipeline(name, stages),
+        operation.completed_steps,
+        correlation_id=definition["correlation_id"],
+        organization_guid=huey.organization_for_operation(operation.id),
+        priority=huey.Priority(definition["priority"]),
+    )
+    return True
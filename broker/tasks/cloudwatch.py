@@ -1,11 +1,13 @@
 import logging
+import time
 
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, WaiterError
 
 from sqlalchemy.orm.attributes import flag_modified
 
 from broker.aws import cloudwatch_commercial
 from broker.extensions import config
+from broker.lib.utils import map_concurrently
 from broker.tasks.huey import pipeline_operation
 
 logger = logging.getLogger(__name__)
@@ -13,6 +15,10 @@ logger = logging.getLogger(__name__)
 
 @pipeline_operation("Creating Cloudwatch alarms for Route53 health checks")
 def create_health_check_alarms(operation_id: int, *, operation, db, **kwargs):
+    """
+    create the health check alarms, and the DDoS detection alarm if it's missing,
+    in one batch
+    """
     service_instance = operation.service_instance
 
     if not service_instance.sns_notification_topic_arn:
@@ -20,20 +26,40 @@ def create_health_check_alarms(operation_id: int, *, operation, db, **kwargs):
             f"Could not find sns_notification_topic_arn for instance {service_instance.id}"
         )
 
-    if len(service_instance.route53_health_checks) == 0:
+    health_checks = service_instance.route53_health_checks or []
+    if len(health_checks) == 0:
         logger.info(
             f"No Route53 health checks to create alarms on instance {service_instance.id}"
         )
+
+    alarms = {
+        _get_alarm_name(check["health_check_id"]): _health_check_alarm(
+            check["health_check_id"]
+        )
+        for check in health_checks
+    }
+    ddos_detected_alarm_name = service_instance.ddos_detected_cloudwatch_alarm_name
+    if not ddos_detected_alarm_name:
+        ddos_detected_alarm_name = generate_ddos_alarm_name(service_instance.id)
+        alarms[ddos_detected_alarm_name] = _ddos_detected_alarm(service_instance)
+
+    if not alarms:
         return
 
-    new_health_check_alarms = _create_health_check_alarms(
-        service_instance.route53_health_checks,
-        [],
-        service_instance.sns_notification_topic_arn,
-        service_instance.tags,
+    _create_cloudwatch_alarms(
+        alarms, service_instance.sns_notification_topic_arn, service_instance.tags
     )
-    service_instance.cloudwatch_health_check_alarms = new_health_check_alarms
-    flag_modified(service_instance, "cloudwatch_health_check_alarms")
+
+    if health_checks:
+        service_instance.cloudwatch_health_check_alarms = [
+            {
+                "alarm_name": _get_alarm_name(check["health_check_id"]),
+                "health_check_id": check["health_check_id"],
+            }
+            for check in health_checks
+        ]
+        flag_modified(service_instance, "cloudwatch_health_check_alarms")
+    service_instance.ddos_detected_cloudwatch_alarm_name = ddos_detected_alarm_name
 
     db.session.add(service_instance)
     db.session.commit()
@@ -80,20 +106,10 @@ def create_ddos_detected_alarm(operation_id: int, *, operation, db, **kwargs):
         return
 
     ddos_detected_alarm_name = generate_ddos_alarm_name(service_instance.id)
-    _create_cloudwatch_alarm(
-        generate_ddos_alarm_name(service_instance.id),
+    _create_cloudwatch_alarms(
+        {ddos_detected_alarm_name: _ddos_detected_alarm(service_instance)},
         service_instance.sns_notification_topic_arn,
         service_instance.tags,
-        MetricName="DDoSDetected",
-        Namespace="AWS/DDoSProtection",
-        Statistic="Maximum",
-        Dimensions=[
-            {
-                "Name": "ResourceArn",
-                "Value": service_instance.cloudfront_distribution_arn,
-            }
-        ],
-        ComparisonOperator="GreaterThanOrEqualToThreshold",
     )
     service_instance.ddos_detected_cloudwatch_alarm_name = ddos_detected_alarm_name
     db.session.add(service_instance)
@@ -113,36 +129,8 @@ def delete_ddos_detected_alarm(operation_id: int, *, operation, db, **kwargs):
     db.session.commit()
 
 
-def _create_health_check_alarms(
-    health_checks_to_create_alarms,
-    existing_health_check_alarms,
-    sns_notification_topic_arn,
-    tags,
-):
-    for health_check in health_checks_to_create_alarms:
-        health_check_id = health_check["health_check_id"]
-        alarm_name = _create_health_check_alarm(
-            health_check_id, sns_notification_topic_arn, tags
-        )
-
-        existing_health_check_alarms.append(
-            {
-                "alarm_name": alarm_name,
-                "health_check_id": health_check_id,
-            }
-        )
-    return existing_health_check_alarms
-
-
-def _create_health_check_alarm(
-    health_check_id, sns_notification_topic_arn, tags
-) -> str:
-    alarm_name = _get_alarm_name(health_check_id)
-
-    _create_cloudwatch_alarm(
-        alarm_name,
-        sns_notification_topic_arn,
-        tags,
+def _health_check_alarm(health_check_id) -> dict:
+    return dict(
         MetricName="HealthCheckStatus",
         Namespace="AWS/Route53",
         Statistic="Minimum",
@@ -154,34 +142,72 @@ def _create_health_check_alarm(
         ],
         ComparisonOperator="LessThanThreshold",
     )
-    return alarm_name
-
 
-def _create_cloudwatch_alarm(alarm_name, notification_sns_topic_arn, tags, **kwargs):
-    if tags:
-        kwargs["Tags"] = tags
 
-    cloudwatch_commercial.put_metric_alarm(
-        AlarmName=alarm_name,
-        AlarmActions=[notification_sns_topic_arn],
-        Period=60,
-        EvaluationPeriods=1,
-        DatapointsToAlarm=1,
-        Threshold=1,
-        **kwargs,
+def _ddos_detected_alarm(service_instance) -> dict:
+    return dict(
+        MetricName="DDoSDetected",
+        Namespace="AWS/DDoSProtection",
+        Statistic="Maximum",
+        Dimensions=[
+            {
+                "Name": "ResourceArn",
+                "Value": service_instance.cloudfront_distribution_arn,
+            }
+        ],
+        ComparisonOperator="GreaterThanOrEqualToThreshold",
     )
 
-    # wait for alarm to exist
-    waiter = cloudwatch_commercial.get_waiter("alarm_exists")
-    waiter.wait(
-        AlarmNames=[alarm_name],
-        AlarmTypes=[
-            "MetricAlarm",
-        ],
-        WaiterConfig={
-            "Delay": config.AWS_POLL_WAIT_TIME_IN_SECONDS,
-            "MaxAttempts": config.AWS_POLL_MAX_ATTEMPTS,
-        },
+
+def _create_cloudwatch_alarms(alarms: dict, notification_sns_topic_arn, tags):
+    """
+    put each alarm (name: metric kwargs), several at a time, then wait for all of
+    them to exist
+    """
+
+    def put(name_and_kwargs):
+        alarm_name, kwargs = name_and_kwargs
+        if tags:
+            kwargs = dict(kwargs, Tags=tags)
+        cloudwatch_commercial.put_metric_alarm(
+            AlarmName=alarm_name,
+            AlarmActions=[notification_sns_topic_arn],
+            Period=60,
+            EvaluationPeriods=1,
+            DatapointsToAlarm=1,
+            Threshold=1,
+            **kwargs,
+        )
+
+    map_concurrently(put, alarms.items())
+    _wait_for_alarms(list(alarms))
+
+
+def _wait_for_alarms(alarm_names):
+    # describe_alarms takes at most 100 names at a time
+    batches = [
+        alarm_names[start : start + 100] for start in range(0, len(alarm_names), 100)
+    ]
+    for attempt in range(config.AWS_POLL_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(config.AWS_POLL_WAIT_TIME_IN_SECONDS)
+        missing = []
+        for batch in batches:
+            response = cloudwatch_commercial.describe_alarms(
+                AlarmNames=batch,
+                AlarmTypes=[
+                    "MetricAlarm",
+                ],
+            )
+            if len(response["MetricAlarms"]) < len(batch):
+                missing.append(batch)
+        if not missing:
+            return
+        batches = missing
+    raise WaiterError(
+        name="AlarmExists",
+        reason="Max attempts exceeded",
+        last_response=response,
     )
 
 
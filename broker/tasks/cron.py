@@ -3,11 +3,14 @@ import functools
 import logging
 
 from huey import crontab
+from sqlalchemy import or_, select
 
 from broker.aws import alb
 from broker.extensions import db, config
 from broker.lib.cdn import is_cdn_instance
+from broker.lib.reference_data import refresh_all
 from broker.models import (
+    ALBListener,
     Certificate,
     Operation,
     DedicatedALB,
@@ -16,9 +19,19 @@ from broker.models import (
     ServiceInstanceTypes,
 )
 from broker.tasks import huey
+from broker.tasks.alb import (
+    find_movable_instance,
+    get_listener_pools,
+    index_listeners,
+    plan_listener_moves,
+    prepare_listener_move,
+)
+from broker.tasks.branches import resume_pipeline
+from broker.tasks.shield import shield_protections
 from broker.pipelines.alb import (
     queue_all_alb_deprovision_tasks_for_operation,
     queue_all_alb_provision_tasks_for_operation,
+    queue_all_alb_rebalance_tasks_for_operation,
     queue_all_alb_renewal_tasks_for_operation,
     queue_all_alb_update_tasks_for_operation,
 )
@@ -36,6 +49,7 @@ from broker.pipelines.cdn_dedicated_waf import (
 from broker.pipelines.dedicated_alb import (
     queue_all_dedicated_alb_renewal_tasks_for_operation,
     queue_all_dedicated_alb_provision_tasks_for_operation,
+    queue_all_dedicated_alb_rebalance_tasks_for_operation,
     queue_all_dedicated_alb_update_tasks_for_operation,
 )
 from broker.pipelines.migration import (
@@ -101,19 +115,110 @@ def scan_for_expiring_certs():
         return [instance.service_instance_id for instance in renew_instances]
 
 
-@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*/5"))
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*"))
 def restart_stalled_pipelines():
     with huey.huey.flask_app.app_context():
         for operation_id in scan_for_stalled_pipelines():
             reschedule_operation(operation_id)
 
 
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*"))
+def log_queue_depth_metrics():
+    for priority, depth in huey.queue_depths().items():
+        logger.info(f'huey_queue_depth{{priority="{priority}"}} {depth}')
+
+
 @huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="*/15"))
 def load_albs():
     with huey.huey.flask_app.app_context():
         _load_albs(alb, config.DEDICATED_ALB_LISTENER_ARN_MAP)
 
 
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="3-59/15"))
+def reconcile_alb_listeners():
+    with huey.huey.flask_app.app_context():
+        index_listeners(get_all_listener_arns())
+
+
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="47"))
+def rebalance_alb_listeners():
+    with huey.huey.flask_app.app_context():
+        _rebalance_alb_listeners(config.ALB_REBALANCE_MAX_MOVES)
+
+
+def _rebalance_alb_listeners(budget: int):
+    """
+    Start moving up to `budget` certificates from the fullest listeners to the
+    emptiest in each pool, so every listener carries about the same number.
+    """
+    moves = []
+    for instance_model, listener_arns in get_listener_pools():
+        certificate_counts = dict(
+            db.session.execute(
+                select(ALBListener.listener_arn, ALBListener.certificate_count).where(
+                    ALBListener.listener_arn.in_(listener_arns)
+                )
+            ).all()
+        )
+        for source, target in plan_listener_moves(
+            certificate_counts, budget - len(moves)
+        ):
+            service_instance = find_movable_instance(instance_model, source)
+            if service_instance is None:
+                # everything left on this listener is busy; try again next time
+                break
+            logger.info(
+                "Moving instance %s from listener %s to %s",
+                service_instance.id,
+                source,
+                target,
+            )
+            try:
+                prepare_listener_move(service_instance, target)
+            except RuntimeError:
+                logger.exception("Could not reserve listener %s", target)
+                db.session.rollback()
+                break
+            operation = Operation(
+                state=Operation.States.IN_PROGRESS.value,
+                service_instance=service_instance,
+                action=Operation.Actions.REBALANCE.value,
+                step_description="Queuing tasks",
+            )
+            db.session.add(operation)
+            db.session.add(service_instance)
+            db.session.commit()
+            moves.append(operation)
+
+    for operation in moves:
+        if (
+            operation.service_instance.instance_type
+            == ServiceInstanceTypes.DEDICATED_ALB.value
+        ):
+            queue_all_dedicated_alb_rebalance_tasks_for_operation(operation.id)
+        else:
+            queue_all_alb_rebalance_tasks_for_operation(operation.id)
+    # n.b. this return is only for testing - huey ignores it.
+    return [operation.service_instance_id for operation in moves]
+
+
+def get_all_listener_arns():
+    listener_arns = set(config.ALB_LISTENER_ARNS)
+    listener_arns.update(db.session.scalars(select(DedicatedALBListener.listener_arn)))
+    return sorted(listener_arns)
+
+
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="37"))
+def refresh_shield_protections():
+    count = shield_protections.refresh()
+    logger.info("Cached %s Shield protections", count)
+
+
+@huey.huey.periodic_task(crontab(month="*", hour="*", day="*", minute="7"))
+def refresh_reference_data():
+    refresh_all()
+
+
 @functools.cache
 def get_alb_listener_info(alb_client, listener_arn):
     return alb_client.describe_listeners(ListenerArns=[listener_arn])
@@ -141,19 +246,40 @@ def _load_albs(alb_client, dedicated_listener_arn_map: dict[str]):
 
 
 def scan_for_stalled_pipelines():
+    """
+    in-progress operations that nothing is working on: no worker is running a step
+    for them (no heartbeat) and they have no task queued, scheduled or waiting to
+    retry. Operations updated in the last STALLED_PIPELINE_GRACE_TIME seconds are
+    left alone, since their next step may be about to be queued
+    """
     logger.info("Scanning for stalled pipelines")
-    fifteen_minutes_ago = datetime.datetime.now() - datetime.timedelta(minutes=15)
+    grace_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        seconds=config.STALLED_PIPELINE_GRACE_TIME
+    )
     operations = Operation.query.filter(
         Operation.state == Operation.States.IN_PROGRESS.value,
-        Operation.updated_at <= fifteen_minutes_ago,
+        Operation.updated_at <= grace_time,
         Operation.canceled_at.is_(None),
+        # operations waiting to resume aren't stalled until they miss their time
+        or_(
+            Operation.resume_at.is_(None),
+            Operation.resume_at <= grace_time,
+        ),
     )
-    return [operation.id for operation in operations]
+    operation_ids = [operation.id for operation in operations]
+    if not operation_ids:
+        return []
+    busy = huey.operations_with_heartbeats(operation_ids)
+    busy |= huey.queued_operations(operation_ids)
+    return [operation_id for operation_id in operation_ids if operation_id not in busy]
 
 
 def reschedule_operation(operation_id):
     operation = db.session.get(Operation, operation_id)
     service_instance = operation.service_instance
+    if resume_pipeline(operation):
+        # this line is only used for testing
+        return resume_pipeline
     logger.info(
         f"Restarting {operation.action} operation {operation.id} for service instance {service_instance.id}"
     )
@@ -163,6 +289,7 @@ def reschedule_operation(operation_id):
         actions.PROVISION.value: queue_all_alb_provision_tasks_for_operation,
         actions.RENEW.value: queue_all_alb_renewal_tasks_for_operation,
         actions.UPDATE.value: queue_all_alb_update_tasks_for_operation,
+        actions.REBALANCE.value: queue_all_alb_rebalance_tasks_for_operation,
     }
     cdn_queues = {
         actions.DEPROVISION.value: queue_all_cdn_deprovision_tasks_for_operation,
@@ -176,6 +303,7 @@ def reschedule_operation(operation_id):
         actions.PROVISION.value: queue_all_dedicated_alb_provision_tasks_for_operation,
         actions.RENEW.value: queue_all_dedicated_alb_renewal_tasks_for_operation,
         actions.UPDATE.value: queue_all_dedicated_alb_update_tasks_for_operation,
+        actions.REBALANCE.value: queue_all_dedicated_alb_rebalance_tasks_for_operation,
     }
     cdn_dedicated_waf_queues = {
         actions.DEPROVISION.value: queue_all_cdn_dedicated_waf_deprovision_tasks_for_operation,
@@ -1,32 +1,54 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from enum import Enum, IntEnum
 import logging
 import functools
+import random
+import threading
+import time
 
+from acme import errors as acme_errors, messages as acme_messages
+from botocore import exceptions as botocore_exceptions
 from flask import Flask
-from redis import ConnectionPool, SSLConnection
-from huey import RedisHuey, signals
+from redis.exceptions import RedisError, ResponseError
+from requests import exceptions as requests_exceptions
+from huey import signals
+from huey.exceptions import CancelExecution, RetryTask
+from sqlalchemy import update
 from sqlalchemy.orm.attributes import flag_modified
 
 from sap import cf_logging
 
-from broker.extensions import config, db
-from broker.models import Operation
+from broker.extensions import config, connection_pool, db
+from broker.lib.circuit_breaker import CircuitOpen
+from broker.lib.fair_queue import FairRedisHuey
+from broker.lib.rate_limit import RateLimitExceeded
+from broker.models import Operation, release_alb_listener_reservation
 from broker.smtp import send_failed_operation_alert
 
 logger = logging.getLogger(__name__)
 
 
-if config.REDIS_SSL:
-    redis_kwargs = dict(connection_class=SSLConnection, ssl_cert_reqs=None)
-else:
-    redis_kwargs = dict()
-
-connection_pool = ConnectionPool(
-    host=config.REDIS_HOST,
-    port=config.REDIS_PORT,
-    password=config.REDIS_PASSWORD,
-    **redis_kwargs,
+huey = FairRedisHuey(
+    connection_pool=connection_pool,
+    default_limit=config.ORG_CONCURRENCY_LIMIT,
+    limits=config.ORG_CONCURRENCY_LIMITS,
+    weights=config.ORG_SCHEDULING_WEIGHTS,
+    lease_time=config.ORG_TASK_LEASE_TIME,
 )
-huey = RedisHuey(connection_pool=connection_pool)
+
+
+class Priority(IntEnum):
+    """
+    Huey runs queued tasks with higher priority first. Anything queued without a
+    priority, like the periodic tasks, gets MAINTENANCE.
+    """
+
+    MAINTENANCE = 0
+    RENEWAL = 10
+    USER = 20
+
 
 # these two lines need to be here so we can define [non]retriable_task
 huey.flask_app = Flask(__name__)
@@ -35,13 +57,333 @@ huey.flask_app.config.from_object(config)
 # this line is so this all works the same in tests
 db.init_app(huey.flask_app)
 
+
+# every task defined with app_context_task, by task_name, so the steps of a
+# registered pipeline can be found by name (see broker.tasks.branches)
+registered_tasks = {}
+
+
+def task_name(task_class) -> str:
+    return f"{task_class.__module__}.{task_class.__name__}"
+
+
+class ErrorClass(Enum):
+    """what kind of failure a task ran into, which decides how soon to retry it"""
+
+    # the API is telling us to slow down
+    THROTTLE = "throttle"
+    # the call might well work if we just make it again
+    TRANSIENT = "transient"
+    # something we depend on isn't ready yet, like a certificate IAM hasn't
+    # propagated, or a distribution that's still disabling
+    NOT_READY = "not ready"
+    # we've used up a quota that only resets after an hour or more, like Let's
+    # Encrypt's rate limits
+    QUOTA = "quota"
+    # trying again won't help
+    PERMANENT = "permanent"
+
+
+AWS_ERROR_CLASSES = {
+    **dict.fromkeys(
+        [
+            "Throttling",
+            "ThrottlingException",
+            "ThrottledException",
+            "RequestThrottled",
+            "RequestThrottledException",
+            "RequestLimitExceeded",
+            "TooManyRequestsException",
+            "SlowDown",
+            "PriorRequestNotComplete",
+        ],
+        ErrorClass.THROTTLE,
+    ),
+    **dict.fromkeys(
+        [
+            "InternalError",
+            "InternalFailure",
+            "InternalServiceError",
+            "ServiceUnavailable",
+            "ServiceUnavailableException",
+            "RequestTimeout",
+            "RequestTimeoutException",
+        ],
+        ErrorClass.TRANSIENT,
+    ),
+    **dict.fromkeys(
+        [
+            "CertificateNotFound",
+            # IAM won't delete a certificate until it sees it's no longer in use
+            "DeleteConflict",
+            "DependencyViolation",
+            "DistributionNotDisabled",
+            # CloudFront can't see an IAM certificate until it's propagated
+            "InvalidViewerCertificate",
+            "PreconditionFailed",
+            "ResourceInUse",
+            "ResourceInUseException",
+            "WAFUnavailableEntityException",
+        ],
+        ErrorClass.NOT_READY,
+    ),
+    **dict.fromkeys(
+        [
+            "AccessDenied",
+            "AccessDeniedException",
+            "InvalidClientTokenId",
+            "InvalidInput",
+            "InvalidParameterCombination",
+            "InvalidParameterValue",
+            "MalformedCertificate",
+            "ValidationError",
+        ],
+        ErrorClass.PERMANENT,
+    ),
+}
+
+ACME_ERROR_CLASSES = {
+    "badNonce": ErrorClass.TRANSIENT,
+    "connection": ErrorClass.TRANSIENT,
+    "serverInternal": ErrorClass.TRANSIENT,
+    "orderNotReady": ErrorClass.NOT_READY,
+    # Let's Encrypt's limits are per hour or per week, so backing off for seconds
+    # doesn't help
+    "rateLimited": ErrorClass.QUOTA,
+    **dict.fromkeys(
+        [
+            "badCSR",
+            "badPublicKey",
+            "badSignatureAlgorithm",
+            "invalidContact",
+            "malformed",
+            "rejectedIdentifier",
+            "unsupportedContact",
+            "unsupportedIdentifier",
+        ],
+        ErrorClass.PERMANENT,
+    ),
+}
+
+
+def classify_error(exc: Exception) -> ErrorClass | None:
+    """
+    the ErrorClass of an exception from AWS or the ACME server, or None if we don't
+    know, in which case the task retries the way it always has
+    """
+    if isinstance(exc, botocore_exceptions.ClientError):
+        error = exc.response.get("Error", {})
+        error_class = AWS_ERROR_CLASSES.get(error.get("Code"))
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        if error_class is None and status >= 500:
+            return ErrorClass.TRANSIENT
+        return error_class
+    if isinstance(
+        exc,
+        (botocore_exceptions.ConnectionError, botocore_exceptions.HTTPClientError),
+    ):
+        return ErrorClass.TRANSIENT
+    if isinstance(exc, botocore_exceptions.WaiterError):
+        return ErrorClass.NOT_READY
+    if isinstance(exc, botocore_exceptions.ParamValidationError):
+        return ErrorClass.PERMANENT
+    if isinstance(exc, acme_messages.Error):
+        return ACME_ERROR_CLASSES.get(exc.code)
+    if isinstance(exc, acme_errors.TimeoutError):
+        return ErrorClass.NOT_READY
+    if isinstance(
+        exc, (requests_exceptions.ConnectionError, requests_exceptions.Timeout)
+    ):
+        return ErrorClass.TRANSIENT
+    return None
+
+
+class RetryPolicy:
+    """
+    how to retry a task after a kind of error. The nth retry in a row for this kind
+    of error waits delay * backoff ** n seconds, up to max_delay, or a random time up
+    to that with jitter, so tasks throttled together don't all come back at once. A
+    policy with retry=False fails the task outright.
+
+    Retries come out of the task's usual allowance, unless the policy has a
+    time_limit: then the task keeps retrying until it's been failing this way for
+    that many seconds, however many tries that takes.
+    """
+
+    def __init__(
+        self,
+        delay: float = 0,
+        backoff: float = 1,
+        max_delay: float | None = None,
+        jitter: bool = False,
+        retry: bool = True,
+        time_limit: float | None = None,
+    ):
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry = retry
+        self.time_limit = time_limit
+
+    def delay_for(self, attempt: int) -> float:
+        delay = self.delay * self.backoff**attempt
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+RETRY_POLICIES = {
+    # these all get at least the four hours a task's allowance of retries used to
+    # give it, however often they retry
+    ErrorClass.THROTTLE: RetryPolicy(
+        delay=1, backoff=2, max_delay=60, jitter=True, time_limit=4 * 60 * 60
+    ),
+    ErrorClass.TRANSIENT: RetryPolicy(
+        delay=5, backoff=2, max_delay=5 * 60, time_limit=4 * 60 * 60
+    ),
+    ErrorClass.NOT_READY: RetryPolicy(delay=5 * 60, time_limit=4 * 60 * 60),
+    ErrorClass.QUOTA: RetryPolicy(delay=60 * 60, time_limit=24 * 60 * 60),
+    ErrorClass.PERMANENT: RetryPolicy(retry=False),
+}
+
+# how long to remember a task's failures, comfortably longer than any time limit
+FAILURE_STREAK_TTL = 2 * 24 * 60 * 60
+
+
+def _failure_streak_key(task) -> str:
+    return f"task:{task.id}:failures"
+
+
+# KEYS[1]: the task's failure streak. ARGV: error class, now, expiry. Counts a
+# failure in the task's streak of failures of one kind, starting a new streak if
+# the last one was of another kind. Returns the failures in the streak, and when
+# the first of them happened
+_count_failure = huey.storage.conn.register_script("""
+local streak = KEYS[1]
+if redis.call('HGET', streak, 'class') ~= ARGV[1] then
+    redis.call('DEL', streak)
+    redis.call('HSET', streak, 'class', ARGV[1], 'since', ARGV[2])
+end
+local failures = redis.call('HINCRBY', streak, 'failures', 1)
+redis.call('EXPIRE', streak, ARGV[3])
+return {failures, redis.call('HGET', streak, 'since')}
+""")
+
+
+def count_failure(task, error_class: ErrorClass | None) -> tuple[int, float]:
+    """
+    how many times in a row the task has now failed with this kind of error, and
+    how many seconds since the first of them
+    """
+    now = time.time()
+    failures, since = _count_failure(
+        keys=[_failure_streak_key(task)],
+        args=[
+            error_class.value if error_class else "unclassified",
+            now,
+            FAILURE_STREAK_TTL,
+        ],
+    )
+    return int(failures), now - float(since)
+
+
+def apply_retry_policy(task, exc: Exception, retry_policies: dict | None = None):
+    """
+    set up the task's next retry, if it has one, for the kind of error it raised.
+    retry_policies overrides RETRY_POLICIES for some kinds of error. Unclassified
+    errors retry after the task's usual delay
+    """
+    if not task.retries:
+        return
+    error_class = classify_error(exc)
+    policy = {**RETRY_POLICIES, **(retry_policies or {})}.get(error_class)
+    if policy is not None and not policy.retry:
+        logger.error(
+            "Task %s failed with %s error %r, not retrying",
+            task.id,
+            error_class.value,
+            exc,
+        )
+        task.retries = 0
+        return
+    try:
+        failures, failing_for = count_failure(task, error_class)
+    except RedisError:
+        logger.warning("Could not count failures of task %s", task.id, exc_info=True)
+        failures, failing_for = task.default_retries - task.retries + 1, None
+    if policy is None:
+        # a policy from an earlier retry may have changed it
+        task.retry_delay = task.default_retry_delay
+        return
+    if policy.time_limit is not None and failing_for is not None:
+        if failing_for >= policy.time_limit:
+            logger.error(
+                "Task %s has failed with %s errors for %ds, not retrying",
+                task.id,
+                error_class.value,
+                failing_for,
+            )
+            task.retries = 0
+            return
+        # give back the retry huey is about to take from the allowance
+        task.retries += 1
+    task.retry_delay = policy.delay_for(failures - 1)
+    logger.info(
+        "Task %s failed with %s error %r, retrying in %.1fs",
+        task.id,
+        error_class.value,
+        exc,
+        task.retry_delay,
+    )
+
+
+def app_context_task(retry_policies: dict | None = None, **kwargs):
+    """
+    like huey.context_task, but every run gets a fresh app context, and so its own
+    db session. Greenlet workers run many tasks at once in the same process, and they
+    can't share one context.
+
+    When the task fails, how soon it's retried depends on the kind of error (see
+    apply_retry_policy). retry_policies maps an ErrorClass to the RetryPolicy this
+    task should use instead of the default in RETRY_POLICIES.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def inner(*args, task=None, **task_kwargs):
+            with huey.flask_app.app_context():
+                try:
+                    return fn(*args, **task_kwargs)
+                except (CancelExecution, RetryTask):
+                    raise
+                except (CircuitOpen, RateLimitExceeded) as e:
+                    # the service is down or busy, not the task, so it shouldn't use
+                    # up a retry waiting for it
+                    logger.info("%s, deferring task", e)
+                    raise RetryTask(delay=e.retry_after)
+                except Exception as e:
+                    # task is only missing when the function is called directly
+                    if task is not None:
+                        apply_retry_policy(task, e, retry_policies)
+                    raise
+
+        task = huey.task(context=True, **kwargs)(inner)
+        registered_tasks[task_name(task.task_class)] = task
+        return task
+
+    return decorator
+
+
 # Normal task, no retries
-nonretriable_task = huey.context_task(huey.flask_app.app_context())
+nonretriable_task = app_context_task()
 
-# These tasks retry every 10 minutes for four hours.
-retriable_task = huey.context_task(
-    huey.flask_app.app_context(), retries=6 * 4, retry_delay=10 * 60
-)
+# These tasks retry every 10 minutes for four hours, unless the error they hit
+# calls for something else
+RETRIABLE = dict(retries=6 * 4, retry_delay=10 * 60)
+retriable_task = app_context_task(**RETRIABLE)
 
 
 @huey.on_startup(name="get_flask")
@@ -55,7 +397,8 @@ def create_app():
 @huey.pre_execute(name="Set Correlation ID")
 def register_correlation_id(task):
     args, kwargs = task.data
-    correlation_id = kwargs.pop("correlation_id", "Rogue Task")
+    # left in the kwargs so retries and the next step in the pipeline keep it
+    correlation_id = kwargs.get("correlation_id", "Rogue Task")
     cf_logging.FRAMEWORK.context.set_correlation_id(correlation_id)
 
 
@@ -74,22 +417,440 @@ def mark_operation_failed(signal, task, exc=None):
             # assume this task doesn't follow our pattern of operation_id as the first param
             # in which case this task is not a part of a provisioning/upgrade/deprovisioning pipeline
             return
-        operation.state = Operation.States.FAILED.value
+        fail_operation(operation)
+        send_failed_operation_alert(operation)
+
+
+def fail_operation(operation):
+    """
+    mark the operation failed, and give back the listener capacity and the lock on
+    its service instance that it was holding. While other parallel branches are
+    still running, the lock is kept until they've joined (see
+    broker.tasks.branches.join_branches)
+    """
+    operation.state = Operation.States.FAILED.value
+    release_alb_listener_reservation(operation.service_instance)
+    db.session.add(operation)
+    db.session.commit()
+    if not branches_in_flight(operation.id):
+        unlock_service_instance(operation)
+
+
+def record_pipeline(operation_id, definition: dict):
+    """
+    save the pipeline about to run for an operation, with none of its steps done.
+    definition has the pipeline's registered reference, priority, correlation_id
+    and stages (see broker.tasks.branches.Pipeline)
+    """
+    operation = db.session.get(Operation, operation_id)
+    if operation is None:
+        return
+    operation.pipeline = definition
+    operation.completed_steps = 0
+    db.session.add(operation)
+    db.session.commit()
+
+
+def complete_step(operation_id, step: int | None):
+    """record that the operation's pipeline got through step `step`"""
+    if step is None:
+        return
+    db.session.execute(
+        update(Operation)
+        .where(Operation.id == operation_id, Operation.completed_steps <= step)
+        .values(completed_steps=step + 1)
+    )
+    db.session.commit()
+
+
+def _heartbeat_key(operation_id) -> str:
+    return f"operation:{operation_id}:heartbeat"
+
+
+# operations this process is running a step for, with their service instance, and how
+# many steps of each (parallel branches of one operation can run at once)
+_beating = Counter()
+_beating_lock = threading.Lock()
+_heartbeats_started = False
+
+
+@contextmanager
+def heartbeat(operation_id, service_instance_id=None):
+    """
+    keep a heartbeat for the operation in redis while the block runs, and renew its
+    lock on the service instance if it has one. The heartbeat isn't removed at the
+    end, it expires, so the operation still looks alive in the moment before its
+    next step is queued
+    """
+    running = (operation_id, service_instance_id)
+    with _beating_lock:
+        _beating[running] += 1
+    huey.storage.conn.set(
+        _heartbeat_key(operation_id), 1, ex=config.PIPELINE_HEARTBEAT_TTL
+    )
+    try:
+        yield
+    finally:
+        with _beating_lock:
+            _beating[running] -= 1
+            if not _beating[running]:
+                del _beating[running]
+
+
+def refresh_heartbeats():
+    with _beating_lock:
+        running = list(_beating)
+    with huey.storage.conn.pipeline() as pipe:
+        for operation_id, service_instance_id in running:
+            pipe.set(_heartbeat_key(operation_id), 1, ex=config.PIPELINE_HEARTBEAT_TTL)
+            if service_instance_id is not None:
+                _renew_lock(
+                    keys=[_lock_key(service_instance_id)],
+                    args=[operation_id, config.SERVICE_INSTANCE_LOCK_LEASE_TIME],
+                    client=pipe,
+                )
+        pipe.execute()
+
+
+def _beat_forever():
+    while True:
+        time.sleep(config.PIPELINE_HEARTBEAT_INTERVAL)
+        try:
+            refresh_heartbeats()
+        except Exception:
+            logger.exception("Could not refresh operation heartbeats")
+
+
+@huey.on_startup(name="start_heartbeats")
+def start_heartbeats():
+    """start refreshing heartbeats, once per process however many workers it has"""
+    global _heartbeats_started
+    with _beating_lock:
+        if _heartbeats_started:
+            return
+        _heartbeats_started = True
+    threading.Thread(
+        target=_beat_forever, name="operation-heartbeats", daemon=True
+    ).start()
+
+
+def operations_with_heartbeats(operation_ids) -> set:
+    """which of the given operations a worker is running a step for right now"""
+    operation_ids = list(operation_ids)
+    with huey.storage.conn.pipeline() as pipe:
+        for operation_id in operation_ids:
+            pipe.exists(_heartbeat_key(operation_id))
+        beating = pipe.execute()
+    return {
+        operation_id for operation_id, exists in zip(operation_ids, beating) if exists
+    }
+
+
+# how long an operation's set of waiting tasks outlives the last task added to it,
+# well past the longest a task waits to be retried. It's only reached if a task
+# disappears without running, which would otherwise hide the stalled operation forever
+WAITING_TASKS_TTL = 24 * 60 * 60
+
+
+def _waiting_tasks_key(operation_id) -> str:
+    return f"operation:{operation_id}:tasks"
+
+
+@huey.signal(signals.SIGNAL_ENQUEUED, signals.SIGNAL_SCHEDULED)
+def track_waiting_task(signal, task):
+    """
+    keep track of the operation's tasks that are queued, scheduled or waiting for a
+    retry, so finding stalled operations doesn't have to read the whole queue
+    """
+    if not task.args:
+        return
+    key = _waiting_tasks_key(task.args[0])
+    with huey.storage.conn.pipeline() as pipe:
+        pipe.sadd(key, task.id)
+        pipe.expire(key, WAITING_TASKS_TTL)
+        pipe.execute()
+
+
+@huey.signal(signals.SIGNAL_EXECUTING, signals.SIGNAL_REVOKED, signals.SIGNAL_EXPIRED)
+def untrack_waiting_task(signal, task):
+    # a running task has a heartbeat instead, and a retry is tracked again when
+    # it's requeued
+    if task.args:
+        huey.storage.conn.srem(_waiting_tasks_key(task.args[0]), task.id)
+
+
+def queued_operations(operation_ids) -> set:
+    """which of the given operations have a task queued, scheduled or due to retry"""
+    operation_ids = list(operation_ids)
+    with huey.storage.conn.pipeline() as pipe:
+        for operation_id in operation_ids:
+            pipe.exists(_waiting_tasks_key(operation_id))
+        waiting = pipe.execute()
+    return {
+        operation_id for operation_id, exists in zip(operation_ids, waiting) if exists
+    }
+
+
+def _lock_key(service_instance_id) -> str:
+    return f"service_instance:{service_instance_id}:lock"
+
+
+# take the lock if it's free, already ours, or held by the operation in ARGV[3], which
+# we've found has finished. Returns whichever operation holds it afterwards
+_take_lock = huey.storage.conn.register_script("""
+local holder = redis.call('GET', KEYS[1])
+if not holder or holder == ARGV[1] or holder == ARGV[3] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return ARGV[1]
+end
+return holder
+""")
+
+# make sure the lock lasts at least ARGV[2] more seconds, if ARGV[1] still holds it
+_renew_lock = huey.storage.conn.register_script("""
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if redis.call('TTL', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+""")
+
+_release_lock = huey.storage.conn.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def lock_service_instance(operation):
+    """
+    take or renew the operation's lease on its service instance, so no other
+    operation's pipeline works on the instance at the same time. If another
+    operation that's still running holds it, renewals that haven't finished a step
+    yet give up, since the next scan for expiring certificates will start another;
+    anything else waits its turn without using up its retries
+    """
+    key = _lock_key(operation.service_instance_id)
+    lease_time = config.SERVICE_INSTANCE_LOCK_LEASE_TIME
+    holder = int(_take_lock(keys=[key], args=[operation.id, lease_time, ""]))
+    if holder == operation.id:
+        return
+    other = db.session.get(Operation, holder)
+    if other is None or (
+        (
+            other.state != Operation.States.IN_PROGRESS.value
+            or other.canceled_at is not None
+        )
+        and not branches_in_flight(other.id)
+    ):
+        # it finished without letting go
+        holder = int(_take_lock(keys=[key], args=[operation.id, lease_time, holder]))
+        if holder == operation.id:
+            return
+    if (
+        operation.action == Operation.Actions.RENEW.value
+        and not operation.completed_steps
+    ):
+        logger.info(
+            "Canceling renewal %s, operation %s is running on service instance %s",
+            operation.id,
+            holder,
+            operation.service_instance_id,
+        )
+        operation.canceled_at = datetime.now(timezone.utc)
+        operation.step_description = "Canceled for another operation"
+        fail_operation(operation)
+        raise CancelExecution(retry=False)
+    logger.info(
+        "Operation %s is waiting for operation %s on service instance %s",
+        operation.id,
+        holder,
+        operation.service_instance_id,
+    )
+    raise RetryTask(delay=config.SERVICE_INSTANCE_LOCK_RETRY_DELAY)
+
+
+def unlock_service_instance(operation):
+    """give up the operation's lease on its service instance, if it still has it"""
+    _release_lock(keys=[_lock_key(operation.service_instance_id)], args=[operation.id])
+
+
+def extend_service_instance_lock(operation, seconds: float):
+    """
+    make the operation's lease on its service instance last at least `seconds`
+    plus the usual lease time, if it still has it
+    """
+    _renew_lock(
+        keys=[_lock_key(operation.service_instance_id)],
+        args=[operation.id, int(seconds) + config.SERVICE_INSTANCE_LOCK_LEASE_TIME],
+    )
+
+
+@huey.post_execute(name="hold_lock_until_retry")
+def hold_lock_until_retry(task, task_value, exc):
+    """
+    a task that's going to run again later, whether it's waiting to resume or to
+    retry after an error, keeps its operation's lease on the service instance
+    until then, so another operation can't start in the middle of its pipeline
+    """
+    if exc is None or not task.retries or not task.args:
+        return
+    if isinstance(exc, RetryTask) and exc.delay is not None:
+        delay = exc.delay
+    elif isinstance(exc, RetryTask) and exc.eta is not None:
+        delay = (exc.eta - datetime.now(exc.eta.tzinfo)).total_seconds()
+    else:
+        delay = task.retry_delay or 0
+    with huey.flask_app.app_context():
+        try:
+            operation = db.session.get(Operation, task.args[0])
+        except Exception:
+            # not a task for an operation
+            return
+        if operation is not None:
+            extend_service_instance_lock(operation, delay)
+
+
+def queue_depths() -> dict[str, int]:
+    """
+    how many tasks are waiting to run, by priority. This doesn't count tasks waiting
+    for a retry or a scheduled time
+    """
+    depths = huey.storage.queue_depths()
+    return {priority.name.lower(): depths.get(priority, 0) for priority in Priority}
+
+
+@huey.on_startup(name="requeue_legacy_tasks")
+def requeue_legacy_tasks():
+    """
+    The queue used to be a redis list, and then a sorted set, under the queue key.
+    Move anything left in one onto the fair queue.
+    """
+    conn = huey.storage.conn
+    key_type = conn.type(huey.storage.queue_key)
+    if key_type not in (b"list", b"zset"):
+        return
+    legacy_key = f"{huey.storage.queue_key}.legacy"
+    try:
+        conn.rename(huey.storage.queue_key, legacy_key)
+    except ResponseError:
+        # another worker got there first
+        return
+    while True:
+        if key_type == b"list":
+            data = conn.rpop(legacy_key)
+        else:
+            items = conn.zpopmin(legacy_key)
+            # the sorted set prefixed each task with an 8 byte timestamp
+            data = items[0][0][8:] if items else None
+        if data is None:
+            return
+        huey.storage.enqueue(data, huey.deserialize_task(data).priority)
+
+
+def organization_for_operation(operation_id) -> str | None:
+    """the GUID of the org an operation's service instance belongs to, if we know it"""
+    operation = db.session.get(Operation, operation_id)
+    if operation is None:
+        return None
+    service_instance = operation.service_instance
+    organization_guid = getattr(service_instance, "org_id", None)
+    if organization_guid:
+        return organization_guid
+    for tag in service_instance.tags or []:
+        if tag["Key"] == "Organization GUID":
+            return tag["Value"]
+    return None
+
+
+def _branches_key(operation_id) -> str:
+    return f"operation:{operation_id}:branches"
+
+
+def track_branches(operation_id, count: int):
+    """
+    start tracking what each of `count` parallel branches of an operation is doing
+    """
+    key = _branches_key(operation_id)
+    with huey.storage.conn.pipeline() as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping={str(branch): "" for branch in range(count)})
+        pipe.execute()
+
+
+def describe_branch(operation_id, branch: int, description: str | None) -> str:
+    """
+    record what a parallel branch is doing, or that it's finished if description is
+    None, and return what all the unfinished branches are doing in the order they were
+    declared, suitable for the operation's step_description
+    """
+    key = _branches_key(operation_id)
+    conn = huey.storage.conn
+    if description is None:
+        conn.hdel(key, str(branch))
+    else:
+        conn.hset(key, str(branch), description)
+    branches = conn.hgetall(key)
+    descriptions = [branches[branch].decode() for branch in sorted(branches, key=int)]
+    return "; ".join(description for description in descriptions if description)
+
+
+def untrack_branches(operation_id):
+    huey.storage.conn.delete(_branches_key(operation_id))
+
+
+def branches_in_flight(operation_id) -> bool:
+    """
+    whether the operation has parallel branches that haven't joined yet. A branch
+    that stopped early never clears its entry, so this holds until the join runs
+    """
+    return bool(huey.storage.conn.exists(_branches_key(operation_id)))
+
+
+def wait_without_blocking(operation, db, seconds: int):
+    """
+    Return once `seconds` have passed since the calling pipeline task first got
+    here. Until then, record on the operation when it will resume and have huey run
+    the task again at that time, freeing the worker in the meantime.
+
+    Code before this call runs again when the task resumes, so it must be safe to
+    repeat.
+    """
+    if seconds <= 0:
+        return
+    now = datetime.now(timezone.utc)
+    if operation.resume_at is None:
+        operation.resume_at = now + timedelta(seconds=seconds)
         db.session.add(operation)
         db.session.commit()
-        send_failed_operation_alert(operation)
+    if operation.resume_at > now:
+        logger.info("Operation %s will resume at %s", operation.id, operation.resume_at)
+        raise RetryTask(delay=(operation.resume_at - now).total_seconds())
+    # committed along with whatever the task does next
+    operation.resume_at = None
+    db.session.add(operation)
 
 
-def pipeline_operation(description, is_retriable=True):
+def pipeline_operation(description, is_retriable=True, retry_policies=None):
     """
     define a function as a task with an operation intended to be used in a pipeline.
     :param description: the end-user friendly step description
     :param is_retriable: if true, this task may be retried up to 24 times on failure
+    :param retry_policies: RetryPolicy overrides for this step, by ErrorClass
 
     The wrapped function must:
     - have operation_id as a positional argument
     - accept operation and db as keyword arguments
 
+    When the task runs in a parallel branch (see broker.tasks.branches), the
+    operation's step_description lists what every active branch is doing.
+
+    Steps only run while their operation holds the lease on its service instance,
+    and wait for any other operation that has it (see lock_service_instance).
+
     Usage:
 
     @pipeline_operation("Get cookies from jar", is_retriable=False):
@@ -97,7 +858,11 @@ def pipeline_operation(description, is_retriable=True):
         service_instance = operation.service_instance
         db.session.query("select cookie from jar")
     """
-    if is_retriable:
+    if retry_policies is not None:
+        huey_task = app_context_task(
+            retry_policies, **(RETRIABLE if is_retriable else {})
+        )
+    elif is_retriable:
         huey_task = retriable_task
     else:
         huey_task = nonretriable_task
@@ -106,14 +871,25 @@ def pipeline_operation(description, is_retriable=True):
         @huey_task
         @functools.wraps(func)
         def task(operation_id, **kwargs):
-            operation = db.session.get(Operation, operation_id)
-
-            operation.step_description = description
+            branch = kwargs.pop("branch", None)
+            # parallel branches lock the operation so branches describing themselves
+            # at the same time can't save a description that's missing the other's step
+            operation = db.session.get(
+                Operation, operation_id, with_for_update=branch is not None
+            )
+            lock_service_instance(operation)
+            if branch is None:
+                operation.step_description = description
+            else:
+                operation.step_description = describe_branch(
+                    operation_id, branch, description
+                )
             flag_modified(operation, "step_description")
             db.session.add(operation)
             db.session.commit()
 
-            return func(operation_id, operation=operation, db=db, **kwargs)
+            with heartbeat(operation_id, operation.service_instance_id):
+                return func(operation_id, operation=operation, db=db, **kwargs)
 
         return task
 
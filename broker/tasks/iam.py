@@ -21,17 +21,14 @@ def upload_server_certificate(operation_id: int, *, operation, db, **kwargs):
 
     if is_cdn_instance(service_instance):
         iam_server_certificate_prefix = config.CLOUDFRONT_IAM_SERVER_CERTIFICATE_PREFIX
-        propagation_time = 0
     else:
         iam_server_certificate_prefix = config.ALB_IAM_SERVER_CERTIFICATE_PREFIX
-        propagation_time = config.IAM_CERTIFICATE_PROPAGATION_TIME
 
     _upload_server_certificate(
         db,
         iam,
         service_instance,
         iam_server_certificate_prefix,
-        propagation_time,
     )
 
 
@@ -39,14 +36,12 @@ def upload_server_certificate(operation_id: int, *, operation, db, **kwargs):
 def upload_cloudfront_server_certificate(operation_id: int, *, operation, db, **kwargs):
     service_instance = operation.service_instance
     iam_server_certificate_prefix = config.CLOUDFRONT_IAM_SERVER_CERTIFICATE_PREFIX
-    propagation_time = 0
 
     _upload_server_certificate(
         db,
         iam_commercial,
         service_instance,
         iam_server_certificate_prefix,
-        propagation_time,
     )
 
 
@@ -88,7 +83,6 @@ def _upload_server_certificate(
     iam,
     service_instance,
     iam_server_certificate_prefix,
-    propagation_time,
 ):
     if service_instance.new_certificate.iam_server_certificate_arn is not None:
         return
@@ -137,8 +131,6 @@ def _upload_server_certificate(
     db.session.add(certificate)
     db.session.commit()
 
-    time.sleep(propagation_time)
-
 
 def _delete_previous_server_ceritficate(service_instance, iam, db):
     certificates_to_delete = Certificate.query.filter(
@@ -168,12 +160,39 @@ def _delete_server_certificate(iam, certificate):
             cert_is_deleted = True
 
     if not cert_is_deleted:
-        # now we know the cert exists, so any errors should be treated as unexpected
-        iam.delete_server_certificate(
-            ServerCertificateName=certificate.iam_server_certificate_name
+        # now we know the cert exists, so any errors other than the load balancer
+        # detachment not having propagated yet should be treated as unexpected
+        call_when_propagated(
+            iam.delete_server_certificate,
+            ["DeleteConflict"],
+            ServerCertificateName=certificate.iam_server_certificate_name,
         )
 
 
+def call_when_propagated(call, not_ready_codes, **kwargs):
+    """
+    Make an AWS call that depends on a change to an IAM server certificate, e.g. adding
+    a certificate we just uploaded to a listener. IAM is eventually consistent, so until
+    the change propagates the call fails with one of not_ready_codes. We retry with
+    exponential backoff until IAM_CERTIFICATE_PROPAGATION_TIME runs out, then give up
+    and let the task's own retries take over.
+    """
+    deadline = time.monotonic() + config.IAM_CERTIFICATE_PROPAGATION_TIME
+    delay = config.IAM_CERTIFICATE_PROBE_INITIAL_DELAY
+    while True:
+        try:
+            return call(**kwargs)
+        except ClientError as e:
+            remaining = deadline - time.monotonic()
+            if e.response["Error"]["Code"] not in not_ready_codes or remaining <= 0:
+                raise
+            logger.info(
+                f"Got {e.response['Error']['Code']}, waiting {delay}s for IAM to catch up"
+            )
+            time.sleep(min(delay, remaining))
+            delay *= 2
+
+
 def _get_iam_client(service_instance):
     if is_cdn_instance(service_instance):
         iam = iam_commercial
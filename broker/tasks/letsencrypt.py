@@ -1,7 +1,6 @@
 import json
 import logging
 import re
-import time
 from datetime import datetime, timedelta, timezone
 
 import josepy
@@ -14,7 +13,7 @@ from huey import CancelExecution
 
 from broker.extensions import config
 from broker.models import ACMEUser, Certificate, Challenge, Operation
-from broker.tasks.huey import pipeline_operation
+from broker.tasks.huey import pipeline_operation, wait_without_blocking
 from broker.acme_client import AcmeClient
 
 logger = logging.getLogger(__name__)
@@ -184,7 +183,7 @@ def answer_challenges(operation_id: int, *, operation, db, **kwargs):
     if not unanswered:
         return
 
-    time.sleep(config.DNS_PROPAGATION_SLEEP_TIME)
+    wait_without_blocking(operation, db, config.DNS_PROPAGATION_SLEEP_TIME)
 
     account_key = serialization.load_pem_private_key(
         acme_user.private_key_pem.encode(), password=None, backend=default_backend()
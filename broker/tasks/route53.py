@@ -4,6 +4,7 @@ from sqlalchemy.orm.attributes import flag_modified
 
 from broker.aws import route53
 from broker.extensions import config
+from broker.lib.utils import map_concurrently
 from broker.tasks.huey import pipeline_operation
 
 logger = logging.getLogger(__name__)
@@ -249,17 +250,25 @@ def _create_health_checks(
 ):
     tags = service_instance.tags if service_instance.tags else []
 
-    updated_health_checks = existing_health_checks
-    for idx, domain_name in enumerate(health_check_domains_to_create):
-        health_check_id = _create_health_check(
-            idx, service_instance.id, domain_name, tags
-        )
-        updated_health_checks.append(
-            {
-                "domain_name": domain_name,
-                "health_check_id": health_check_id,
-            }
+    # if one of these fails, nothing is saved. The retry gets the same health checks
+    # back for the ones that were created, because the caller references match
+    def create(idx_and_domain_name):
+        idx, domain_name = idx_and_domain_name
+        return _create_health_check(idx, service_instance.id, domain_name, tags)
+
+    health_check_ids = map_concurrently(
+        create, enumerate(health_check_domains_to_create)
+    )
+
+    updated_health_checks = existing_health_checks + [
+        {
+            "domain_name": domain_name,
+            "health_check_id": health_check_id,
+        }
+        for domain_name, health_check_id in zip(
+            health_check_domains_to_create, health_check_ids
         )
+    ]
     return sorted(
         updated_health_checks,
         key=lambda check: check["domain_name"],
@@ -287,16 +296,13 @@ def _create_health_check(idx, service_instance_id, domain_name, tags):
 
 
 def _delete_health_checks(health_checks_to_delete, existing_health_checks):
-    updated_health_checks = existing_health_checks
-    for health_check in health_checks_to_delete:
-        health_check_id = health_check["health_check_id"]
-        _delete_health_check(health_check_id)
-        updated_health_checks = [
-            check
-            for check in updated_health_checks
-            if check["health_check_id"] != health_check_id
-        ]
-    return updated_health_checks
+    deleted_ids = [check["health_check_id"] for check in health_checks_to_delete]
+    map_concurrently(_delete_health_check, deleted_ids)
+    return [
+        check
+        for check in existing_health_checks
+        if check["health_check_id"] not in deleted_ids
+    ]
 
 
 def _delete_health_check(health_check_id):
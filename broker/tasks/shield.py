@@ -3,12 +3,15 @@ import logging
 from sqlalchemy.orm.attributes import flag_modified
 
 from broker.aws import shield
+from broker.extensions import config
 from broker.lib.shield_protections import ShieldProtections
-from broker.tasks.huey import pipeline_operation
+from broker.tasks.huey import huey, pipeline_operation
 
 logger = logging.getLogger(__name__)
 
-shield_protections = ShieldProtections(shield)
+shield_protections = ShieldProtections(
+    shield, huey.storage.conn, config.SHIELD_PROTECTION_CACHE_TTL_IN_SECONDS
+)
 
 
 @pipeline_operation("Associating health check with Shield")
@@ -29,7 +32,10 @@ def associate_health_check(operation_id: int, *, operation, db, **kwargs):
         health_check = service_instance.route53_health_checks[0]
 
         shield_associated_health_check = _associate_health_check(
-            health_check["domain_name"], protection_id, health_check["health_check_id"]
+            health_check["domain_name"],
+            protection_id,
+            health_check["health_check_id"],
+            service_instance.cloudfront_distribution_arn,
         )
         service_instance.shield_associated_health_check = shield_associated_health_check
 
@@ -79,6 +85,7 @@ def update_associated_health_check(operation_id: int, *, operation, db, **kwargs
                 health_check["domain_name"],
                 protection_id,
                 health_check["health_check_id"],
+                service_instance.cloudfront_distribution_arn,
             )
             service_instance.shield_associated_health_check = (
                 shield_associated_health_check
@@ -114,11 +121,19 @@ def get_health_check_arn(health_check_id):
     return f"arn:aws:route53:::healthcheck/{health_check_id}"
 
 
-def _associate_health_check(domain_name, protection_id, health_check_id):
-    shield.associate_health_check(
-        ProtectionId=protection_id,
-        HealthCheckArn=get_health_check_arn(health_check_id),
-    )
+def _associate_health_check(
+    domain_name, protection_id, health_check_id, cloudfront_arn
+):
+    try:
+        shield.associate_health_check(
+            ProtectionId=protection_id,
+            HealthCheckArn=get_health_check_arn(health_check_id),
+        )
+    except shield.exceptions.ResourceNotFoundException:
+        # the protection was replaced since we cached its ID, so look it up again
+        # when this task is retried
+        shield_protections.forget(cloudfront_arn)
+        raise
     logger.info(f"Saving associated Route53 health check ID: {health_check_id}")
     return {
         "domain_name": domain_name,
@@ -148,10 +163,7 @@ def _disassociate_health_check(health_check):
 
 
 def _get_cloudfront_shield_protection_id(service_instance):
-    protected_cloudfront_ids = shield_protections.get_cloudfront_protections(
-        should_refresh=True
-    )
-    protection_id = protected_cloudfront_ids.get(
+    protection_id = shield_protections.get_protection_id(
         service_instance.cloudfront_distribution_arn
     )
     if not protection_id:
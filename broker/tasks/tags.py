@@ -0,0 +1,20 @@
+import logging
+
+from sqlalchemy.orm.attributes import flag_modified
+
+from broker.lib.tags import add_name_tags
+from broker.tasks.huey import pipeline_operation
+
+logger = logging.getLogger(__name__)
+
+
+@pipeline_operation("Looking up space and organization names")
+def add_names_to_tags(operation_id: int, *, operation, db, **kwargs):
+    # the provision request only records GUIDs, so it doesn't wait on the CF API.
+    # This runs before anything is created in AWS, so every resource gets the names
+    service_instance = operation.service_instance
+
+    service_instance.tags = add_name_tags(service_instance.tags)
+    flag_modified(service_instance, "tags")
+    db.session.add(service_instance)
+    db.session.commit()
@@ -6,6 +6,7 @@ from huey.exceptions import CancelExecution
 from broker.extensions import db
 from broker.models import Operation
 from broker.tasks import huey
+from broker.tasks.branches import cancel_branch
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,8 @@ def cancel_canceled_operations(task):
         finally:
             db.session.close()
         if op.canceled_at is not None:
+            # so a parallel stage doesn't leave its join waiting
+            cancel_branch(task, op)
             raise CancelExecution
 
 
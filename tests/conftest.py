@@ -1,6 +1,7 @@
 from tests.lib.client import (
     app,
     clean_db,
+    clean_redis,
     client,
     no_context_clean_db,
     no_context_app,
@@ -13,6 +13,7 @@ from broker.models import ALBServiceInstance
 from broker.tasks.letsencrypt import retrieve_certificate
 
 from tests.lib.provision import (
+    subtest_provision_adds_names_to_tags,
     subtest_provision_creates_LE_user,
     subtest_provision_creates_private_key_and_csr,
     subtest_provision_initiates_LE_challenge,
@@ -32,6 +33,9 @@ def test_stuff(client, dns, tasks, route53, organization_guid, space_guid):
     subtest_provision_creates_provision_operation(
         client, dns, organization_guid, space_guid, instance_model
     )
+    subtest_provision_adds_names_to_tags(
+        tasks, instance_model, organization_guid, space_guid
+    )
     subtest_provision_creates_LE_user(tasks, instance_model)
     subtest_provision_creates_private_key_and_csr(tasks, instance_model)
     subtest_provision_initiates_LE_challenge(tasks, instance_model)
@@ -4,6 +4,7 @@ from tests.lib.client import check_last_operation_description
 
 
 from tests.lib.provision import (
+    subtest_provision_adds_names_to_tags,
     subtest_provision_creates_LE_user,
     subtest_provision_creates_private_key_and_csr,
     subtest_provision_initiates_LE_challenge,
@@ -52,6 +53,12 @@ def test_provision_happy_path(
         client, dns, organization_guid, space_guid, instance_model
     )
     check_last_operation_description(client, "4321", operation_id, "Queuing tasks")
+    subtest_provision_adds_names_to_tags(
+        tasks, instance_model, organization_guid, space_guid
+    )
+    check_last_operation_description(
+        client, "4321", operation_id, "Looking up space and organization names"
+    )
     subtest_provision_creates_LE_user(tasks, instance_model)
     check_last_operation_description(
         client, "4321", operation_id, "Registering user for Lets Encrypt"
@@ -112,9 +119,12 @@ def test_provision_happy_path(
 
 def subtest_provision_selects_alb(tasks, alb):
     db.session.expunge_all()
-    alb.expect_get_certificates_for_listener("listener-arn-0", 1)
-    alb.expect_get_certificates_for_listener("listener-arn-1", 5)
-    alb.expect_get_listeners("listener-arn-0", "alb-listener-arn-0")
+    alb.expect_index_listeners(
+        {
+            "listener-arn-0": ("alb-listener-arn-0", 1),
+            "listener-arn-1": ("alb-listener-arn-1", 5),
+        }
+    )
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     service_instance = db.session.get(ALBServiceInstance, "4321")
@@ -129,7 +139,6 @@ def subtest_provision_adds_certificate_to_alb(tasks, alb):
     alb.expect_add_certificate_to_listener(
         "listener-arn-0", certificate.iam_server_certificate_arn
     )
-    alb.expect_describe_alb("alb-listener-arn-0", "alb.cloud.test")
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     db.session.expunge_all()
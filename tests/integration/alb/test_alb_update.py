@@ -81,9 +81,6 @@ def subtest_update_creates_update_operation(client, dns, instance_model):
 
 def subtest_update_selects_alb(tasks, alb, instance_model):
     db.session.expunge_all()
-    alb.expect_get_certificates_for_listener("listener-arn-0", 1)
-    alb.expect_get_certificates_for_listener("listener-arn-1", 5)
-    alb.expect_get_listeners("listener-arn-0", "alb-listener-arn-0")
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     service_instance = db.session.get(instance_model, "4321")
@@ -98,7 +95,6 @@ def subtest_update_adds_certificate_to_alb(tasks, alb, instance_model):
     alb.expect_add_certificate_to_listener(
         "listener-arn-0", certificate.iam_server_certificate_arn
     )
-    alb.expect_describe_alb("alb-listener-arn-0", "alb.cloud.test")
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     db.session.expunge_all()
@@ -10,6 +10,7 @@ from broker.models import (
     CDNDedicatedWAFServiceInstance,
     CDNServiceInstance,
 )
+from broker.tasks.huey import huey
 
 
 @pytest.fixture
@@ -453,7 +454,11 @@ def test_provision_sets_cache_policy(
     # it caches the cache policies fetched by AWS. For testing purposes, we mock
     # the cache_policy_manager and re-initialize it in every test so that we can
     # consistently expect it to make mocked requests to AWS
-    with patch.object(cdn, "cache_policy_manager", CachePolicyManager(real_cloudfront)):
+    with patch.object(
+        cdn,
+        "cache_policy_manager",
+        CachePolicyManager(real_cloudfront, huey.storage.conn),
+    ):
         cloudfront.expect_list_cache_policies("managed", cache_policies)
 
         client.provision_instance(
@@ -547,7 +552,7 @@ def test_provision_sets_origin_request_policy(
     with patch.object(
         cdn,
         "origin_request_policy_manager",
-        OriginRequestPolicyManager(real_cloudfront),
+        OriginRequestPolicyManager(real_cloudfront, huey.storage.conn),
     ):
         cloudfront.expect_list_origin_request_policies(
             "managed", origin_request_policies
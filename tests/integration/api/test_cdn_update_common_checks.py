@@ -10,6 +10,7 @@ from broker.models import (
     CDNServiceInstance,
     CDNDedicatedWAFServiceInstance,
 )
+from broker.tasks.huey import huey
 
 from tests.lib import factories
 
@@ -395,7 +396,11 @@ def test_update_sets_cache_policy_id(
     # it caches the cache policies fetched by AWS. For testing purposes, we mock
     # the cache_policy_manager and re-initialize it in every test so that we can
     # consistently expect it to make mocked requests to AWS
-    with patch.object(cdn, "cache_policy_manager", CachePolicyManager(real_cloudfront)):
+    with patch.object(
+        cdn,
+        "cache_policy_manager",
+        CachePolicyManager(real_cloudfront, huey.storage.conn),
+    ):
         cloudfront.expect_list_cache_policies("managed", cache_policies)
 
         client.update_instance(
@@ -471,7 +476,7 @@ def test_update_sets_origin_request_policy_id(
     with patch.object(
         cdn,
         "origin_request_policy_manager",
-        OriginRequestPolicyManager(real_cloudfront),
+        OriginRequestPolicyManager(real_cloudfront, huey.storage.conn),
     ):
         cloudfront.expect_list_origin_request_policies(
             "managed", origin_request_policies
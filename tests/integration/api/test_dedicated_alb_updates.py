@@ -10,6 +10,7 @@ from broker.models import (
     MigrateDedicatedALBToCDNDedicatedWafServiceInstance,
     ServiceInstanceTypes,
 )
+from broker.tasks.huey import huey
 
 from tests.lib import factories
 
@@ -363,7 +364,11 @@ def test_provision_sets_cache_policy(
     # it caches the cache policies fetched by AWS. For testing purposes, we mock
     # the cache_policy_manager and re-initialize it in every test so that we can
     # consistently expect it to make mocked requests to AWS
-    with patch.object(cdn, "cache_policy_manager", CachePolicyManager(real_cloudfront)):
+    with patch.object(
+        cdn,
+        "cache_policy_manager",
+        CachePolicyManager(real_cloudfront, huey.storage.conn),
+    ):
         cloudfront.expect_list_cache_policies("managed", cache_policies)
 
         client.update_dedicated_alb_to_cdn_dedicated_waf_instance(
@@ -433,7 +438,7 @@ def test_provision_sets_origin_request_policy(
     with patch.object(
         cdn,
         "origin_request_policy_manager",
-        OriginRequestPolicyManager(real_cloudfront),
+        OriginRequestPolicyManager(real_cloudfront, huey.storage.conn),
     ):
         cloudfront.expect_list_origin_request_policies(
             "managed", origin_request_policies
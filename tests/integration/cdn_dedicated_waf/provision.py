@@ -103,7 +103,7 @@ def subtest_provision_associate_health_check(
         "Id": protection_id,
         "ResourceArn": service_instance.cloudfront_distribution_arn,
     }
-    shield.expect_list_protections([protection])
+    shield.expect_describe_protection(protection)
 
     health_check_id = service_instance.route53_health_checks[0]["health_check_id"]
     shield.expect_associate_health_check(protection_id, health_check_id)
@@ -129,28 +129,35 @@ def subtest_provision_creates_health_check_alarms(
 ):
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, service_instance_id)
-    tags = service_instance.tags if service_instance.tags else []
     expected_health_check_alarms = []
+    alarm_names = []
 
-    for _, health_check in enumerate(service_instance.route53_health_checks):
+    for health_check in service_instance.route53_health_checks:
         health_check_id = health_check["health_check_id"]
         alarm_name = _get_alarm_name(health_check_id)
 
         cloudwatch_commercial.expect_put_metric_alarm(
             health_check_id, alarm_name, service_instance
         )
-        alarm_arn = f"{health_check_id} ARN"
         expected_health_check_alarms.append(
             {
                 "alarm_name": alarm_name,
                 "health_check_id": health_check_id,
             }
         )
+        alarm_names.append(alarm_name)
 
-        # wait for alarm
-        cloudwatch_commercial.expect_describe_alarms(
-            alarm_name, [{"AlarmArn": alarm_arn}]
-        )
+    # the DDoS detection alarm is created in the same batch
+    ddos_alarm_name = generate_ddos_alarm_name(service_instance_id)
+    cloudwatch_commercial.expect_put_ddos_detected_alarm(
+        ddos_alarm_name, service_instance, service_instance.sns_notification_topic_arn
+    )
+    alarm_names.append(ddos_alarm_name)
+
+    # wait for all the alarms at once
+    cloudwatch_commercial.expect_describe_alarms(
+        alarm_names, [{"AlarmArn": f"{name} ARN"} for name in alarm_names]
+    )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
 
@@ -160,6 +167,7 @@ def subtest_provision_creates_health_check_alarms(
     assert (
         service_instance.cloudwatch_health_check_alarms == expected_health_check_alarms
     )
+    assert service_instance.ddos_detected_cloudwatch_alarm_name == ddos_alarm_name
 
     cloudwatch_commercial.assert_no_pending_responses()
 
@@ -187,32 +195,6 @@ def subtest_provision_creates_sns_notification_topic(
     )
 
 
-def subtest_provision_creates_ddos_detected_alarm(
-    tasks,
-    cloudwatch_commercial,
-    instance_model,
-    service_instance_id="4321",
-):
-    db.session.expunge_all()
-    service_instance = db.session.get(instance_model, service_instance_id)
-
-    alarm_name = generate_ddos_alarm_name(service_instance_id)
-    cloudwatch_commercial.expect_put_ddos_detected_alarm(
-        alarm_name, service_instance, service_instance.sns_notification_topic_arn
-    )
-    cloudwatch_commercial.expect_describe_alarms(
-        alarm_name, [{"AlarmArn": f"ddos-{service_instance.id}-arn"}]
-    )
-
-    tasks.run_queued_tasks_and_enqueue_dependents()
-    cloudwatch_commercial.assert_no_pending_responses()
-
-    db.session.expunge_all()
-    service_instance = db.session.get(instance_model, service_instance_id)
-
-    assert service_instance.ddos_detected_cloudwatch_alarm_name == alarm_name
-
-
 def subtest_provision_subscribes_sns_notification_topic(
     tasks,
     sns_commercial,
@@ -1,10 +1,13 @@
 import pytest  # noqa F401
+from huey.exceptions import RetryTask
 
-from broker.extensions import db
-from broker.models import CDNDedicatedWAFServiceInstance
+from broker.extensions import config, db
+from broker.models import CDNDedicatedWAFServiceInstance, Operation
 from broker.tasks.cloudwatch import _get_alarm_name
+from broker.tasks.huey import huey, lock_service_instance
 
 from tests.lib import factories
+from tests.lib.tasks import fallible_huey
 from tests.lib.client import check_last_operation_description
 from tests.lib.cdn.deprovision import (
     subtest_deprovision_creates_deprovision_operation,
@@ -271,6 +274,87 @@ def test_deprovision_happy_path(
     check_last_operation_description(client, "1234", operation_id, "Complete!")
 
 
+def test_deprovision_failed_branch_stops_at_the_join(
+    client,
+    service_instance,
+    tasks,
+    route53,
+    sns_commercial,
+    cloudfront,
+    monkeypatch,
+):
+    monkeypatch.setattr(config, "PIPELINE_PARALLEL_BRANCHES", True)
+    instance_model = CDNDedicatedWAFServiceInstance
+    # leave only the SNS branch with anything to do in AWS
+    service_instance.ddos_detected_cloudwatch_alarm_name = None
+    service_instance.cloudwatch_health_check_alarms = None
+    service_instance.shield_associated_health_check = None
+    service_instance.route53_health_checks = None
+    service_instance.cloudfront_distribution_id = None
+    db.session.add(service_instance)
+    db.session.commit()
+
+    operation_id = int(
+        subtest_deprovision_creates_deprovision_operation(instance_model, client)
+    )
+    subtest_deprovision_removes_ALIAS_records(tasks, route53)
+    subtest_deprovision_removes_TXT_records(tasks, route53)
+    db.session.expunge_all()
+    completed_steps = db.session.get(Operation, operation_id).completed_steps
+
+    sns_commercial.stubber.add_client_error(
+        "unsubscribe",
+        service_error_code="AccessDenied",
+        service_message="Access denied",
+        http_status_code=403,
+        expected_params={"SubscriptionArn": "fake-sns-subscription-arn"},
+    )
+
+    def lock_holder():
+        holder = huey.storage.conn.get("service_instance:1234:lock")
+        return int(holder) if holder else None
+
+    # another operation that wants the instance has to wait for the join
+    other_id = factories.OperationFactory.create(
+        service_instance=service_instance,
+        action=Operation.Actions.UPDATE.value,
+    ).id
+    db.session.commit()
+
+    # start_branches, then the first step of every branch
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    with fallible_huey():
+        tasks.run_queued_tasks_and_enqueue_dependents()
+    sns_commercial.assert_no_pending_responses()
+
+    db.session.expunge_all()
+    operation = db.session.get(Operation, operation_id)
+    assert operation.state == Operation.States.FAILED.value
+    # the other branches are still going, so the lock stays with the operation
+    assert lock_holder() == operation_id
+
+    with fallible_huey():
+        while huey.pending_count():
+            if huey.storage.conn.exists(f"operation:{operation_id}:branches"):
+                assert lock_holder() == operation_id
+                with pytest.raises(RetryTask):
+                    lock_service_instance(db.session.get(Operation, other_id))
+            else:
+                assert lock_holder() is None
+            tasks.run_queued_tasks_and_enqueue_dependents()
+
+    # the join released the lock, and never queued the next stage
+    assert lock_holder() is None
+    assert huey.pending_count() == 0
+    assert huey.scheduled_count() == 0
+    cloudfront.assert_no_pending_responses()
+    db.session.expunge_all()
+    operation = db.session.get(Operation, operation_id)
+    assert operation.state == Operation.States.FAILED.value
+    assert operation.completed_steps == completed_steps
+    assert not huey.storage.conn.exists(f"operation:{operation_id}:branches")
+
+
 def subtest_deprovision_disassociate_health_check_when_missing(
     instance_model, tasks, service_instance, shield
 ):
@@ -4,6 +4,7 @@ from broker.models import (
 from tests.lib.client import check_last_operation_description
 
 from tests.lib.provision import (
+    subtest_provision_adds_names_to_tags,
     subtest_provision_creates_LE_user,
     subtest_provision_creates_private_key_and_csr,
     subtest_provision_initiates_LE_challenge,
@@ -54,7 +55,6 @@ from tests.integration.cdn_dedicated_waf.provision import (
     subtest_provision_associate_health_check,
     subtest_provision_creates_health_check_alarms,
     subtest_provision_creates_sns_notification_topic,
-    subtest_provision_creates_ddos_detected_alarm,
     subtest_provision_subscribes_sns_notification_topic,
 )
 from tests.integration.cdn_dedicated_waf.update import (
@@ -67,11 +67,9 @@ from tests.integration.cdn_dedicated_waf.update import (
     subtest_update_deletes_health_check_alarms,
     subtest_update_creates_health_check_alarms,
     subtest_update_does_not_create_sns_notification_topic,
-    subtest_update_does_not_create_ddos_cloudwatch_alarm,
     subtest_update_unsubscribe_sns_notification_topic,
 )
 
-
 # The subtests below are "interesting".  Before test_provision_happy_path, we
 # had separate tests for each stage in the task pipeline.  But each test would
 # have to duplicate much of the previous test.  This was arduous and slow. Now
@@ -102,6 +100,12 @@ def test_provision_happy_path(
         client, dns, organization_guid, space_guid, instance_model
     )
     check_last_operation_description(client, "4321", operation_id, "Queuing tasks")
+    subtest_provision_adds_names_to_tags(
+        tasks, instance_model, organization_guid, space_guid
+    )
+    check_last_operation_description(
+        client, "4321", operation_id, "Looking up space and organization names"
+    )
     subtest_provision_creates_LE_user(tasks, instance_model)
     check_last_operation_description(
         client, "4321", operation_id, "Registering user for Lets Encrypt"
@@ -193,12 +197,6 @@ def test_provision_happy_path(
         operation_id,
         "Creating Cloudwatch alarms for Route53 health checks",
     )
-    subtest_provision_creates_ddos_detected_alarm(
-        tasks, cloudwatch_commercial, instance_model
-    )
-    check_last_operation_description(
-        client, "4321", operation_id, "Creating DDoS detection alarm"
-    )
     subtest_provision_marks_operation_as_succeeded(tasks, instance_model)
     check_last_operation_description(client, "4321", operation_id, "Complete!")
     subtest_update_happy_path(
@@ -305,12 +303,6 @@ def subtest_update_happy_path(
         operation_id,
         "Creating Cloudwatch alarms for Route53 health checks",
     )
-    subtest_update_does_not_create_ddos_cloudwatch_alarm(
-        tasks, cloudwatch_commercial, instance_model
-    )
-    check_last_operation_description(
-        client, "4321", operation_id, "Creating DDoS detection alarm"
-    )
     subtest_update_marks_update_complete(tasks, instance_model)
 
 
@@ -368,7 +360,4 @@ def subtest_update_same_domains(
     subtest_update_creates_health_check_alarms(
         tasks, cloudwatch_commercial, instance_model
     )
-    subtest_update_does_not_create_ddos_cloudwatch_alarm(
-        tasks, cloudwatch_commercial, instance_model
-    )
     subtest_update_marks_update_complete(tasks, instance_model)
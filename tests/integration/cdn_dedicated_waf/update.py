@@ -1,5 +1,4 @@
 import pytest  # noqa F401
-import uuid
 
 from broker.extensions import db
 from broker.tasks.cloudwatch import _get_alarm_name
@@ -101,13 +100,7 @@ def subtest_updates_associated_health_check(
     protection_id = service_instance.shield_associated_health_check["protection_id"]
 
     shield.expect_disassociate_health_check(protection_id, "example.com ID")
-
-    protection_id = str(uuid.uuid4())
-    protection = {
-        "Id": protection_id,
-        "ResourceArn": service_instance.cloudfront_distribution_arn,
-    }
-    shield.expect_list_protections([protection])
+    # the protection ID is still cached from provisioning, so it isn't looked up again
     shield.expect_associate_health_check(protection_id, "bar.com ID")
 
     tasks.run_queued_tasks_and_enqueue_dependents()
@@ -170,6 +163,9 @@ def subtest_update_creates_health_check_alarms(
     db.session.expunge_all()
     service_instance = db.session.get(instance_model, service_instance_id)
 
+    # the DDoS detection alarm already exists, so it isn't in the batch
+    assert service_instance.ddos_detected_cloudwatch_alarm_name
+
     expect_create_health_check_ids = ["bar.com ID", "foo.com ID"]
     for expect_create_health_check_id in expect_create_health_check_ids:
         cloudwatch_commercial.expect_put_metric_alarm(
@@ -177,10 +173,10 @@ def subtest_update_creates_health_check_alarms(
             _get_alarm_name(expect_create_health_check_id),
             service_instance,
         )
-        cloudwatch_commercial.expect_describe_alarms(
-            _get_alarm_name(expect_create_health_check_id),
-            [{"AlarmArn": f"{expect_create_health_check_id} ARN"}],
-        )
+    cloudwatch_commercial.expect_describe_alarms(
+        [_get_alarm_name(id) for id in expect_create_health_check_ids],
+        [{"AlarmArn": f"{id} ARN"} for id in expect_create_health_check_ids],
+    )
 
     tasks.run_queued_tasks_and_enqueue_dependents()
 
@@ -227,26 +223,6 @@ def subtest_update_does_not_create_sns_notification_topic(
     assert service_instance.sns_notification_topic_arn
 
 
-def subtest_update_does_not_create_ddos_cloudwatch_alarm(
-    tasks,
-    cloudwatch_commercial,
-    instance_model,
-    service_instance_id="4321",
-):
-    db.session.expunge_all()
-    service_instance = db.session.get(instance_model, service_instance_id)
-
-    assert service_instance.ddos_detected_cloudwatch_alarm_name
-
-    tasks.run_queued_tasks_and_enqueue_dependents()
-    cloudwatch_commercial.assert_no_pending_responses()
-
-    db.session.expunge_all()
-    service_instance = db.session.get(instance_model, service_instance_id)
-
-    assert service_instance.ddos_detected_cloudwatch_alarm_name
-
-
 def subtest_update_unsubscribe_sns_notification_topic(
     tasks,
     sns_commercial,
@@ -1,10 +1,10 @@
-import json
 import pytest
 
 from broker.commands.tags import add_dedicated_alb_tags
 from broker.extensions import config
 from broker.models import DedicatedALB
 from tests.lib import factories
+from tests.lib.cf import mock_organizations
 from tests.lib.tags import sort_instance_tags
 
 
@@ -35,13 +35,8 @@ def test_add_dedicated_alb_tags(
     wafv2_govcloud,
 ):
 
-    response = json.dumps({"guid": organization_guid, "name": "org-1234"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/{organization_guid}",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
+    mock_organizations(
+        mock_with_uaa_auth, access_token, {organization_guid: "org-1234"}
     )
 
     assert not dedicated_alb.tags
@@ -96,13 +91,8 @@ def test_add_dedicated_alb_tags_requires_waf_arn(
     clean_db.session.add(dedicated_alb)
     clean_db.session.commit()
 
-    response = json.dumps({"guid": organization_guid, "name": "org-1234"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/{organization_guid}",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
+    mock_organizations(
+        mock_with_uaa_auth, access_token, {organization_guid: "org-1234"}
     )
 
     add_dedicated_alb_tags()
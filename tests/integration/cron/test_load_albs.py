@@ -1,6 +1,6 @@
-import json
 from broker.models import DedicatedALB, DedicatedALBListener
 from broker.tasks.cron import _load_albs
+from tests.lib.cf import mock_organizations
 
 
 class FakeALBClient:
@@ -23,14 +23,7 @@ class FakeALBClient:
 
 
 def test_get_alb_listener_info(clean_db, mock_with_uaa_auth, access_token):
-    response = json.dumps({"guid": "org-1", "name": "org1-name"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/org-1",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
-    )
+    mock_organizations(mock_with_uaa_auth, access_token, {"org-1": "org1-name"})
 
     fake_alb = FakeALBClient({"listener-1": "alb-1"})
     _load_albs(fake_alb, {"listener-1": "org-1"})
@@ -39,14 +32,7 @@ def test_get_alb_listener_info(clean_db, mock_with_uaa_auth, access_token):
 
 
 def test_load_albs(clean_db, mock_with_uaa_auth, access_token):
-    response = json.dumps({"guid": "org-1", "name": "org1-name"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/org-1",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
-    )
+    mock_organizations(mock_with_uaa_auth, access_token, {"org-1": "org1-name"})
 
     fake_alb = FakeALBClient({"listener-1": "alb-1"})
     _load_albs(fake_alb, {"listener-1": "org-1"})
@@ -0,0 +1,107 @@
+from sqlalchemy import select
+
+from broker.extensions import db
+from broker.models import ALBListener, ALBServiceInstance, Operation
+from broker.tasks.cron import _rebalance_alb_listeners
+from tests.lib import factories
+
+
+def _certificate_counts():
+    return dict(
+        db.session.execute(
+            select(ALBListener.listener_arn, ALBListener.certificate_count)
+        ).all()
+    )
+
+
+def _create_instance(service_instance_id, listener_arn):
+    service_instance = factories.ALBServiceInstanceFactory.create(
+        id=service_instance_id,
+        domain_names=["example.com"],
+        alb_arn=f"alb-{listener_arn}",
+        alb_listener_arn=listener_arn,
+        domain_internal="alb.cloud.test",
+        route53_alias_hosted_zone="ALBHOSTEDZONEID",
+    )
+    certificate = factories.CertificateFactory.create(
+        service_instance=service_instance,
+        iam_server_certificate_arn=f"certificate-arn-{service_instance_id}",
+        private_key_pem="SOMEPRIVATEKEY",
+    )
+    service_instance.current_certificate = certificate
+    db.session.add(service_instance)
+    db.session.commit()
+    return service_instance
+
+
+def test_rebalance_moves_certificates_to_emptier_listener(
+    clean_db, tasks, alb, route53
+):
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=3
+    )
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-1", certificate_count=0
+    )
+    for service_instance_id in ["1", "2", "3"]:
+        _create_instance(service_instance_id, "listener-arn-0")
+
+    assert _rebalance_alb_listeners(5) == ["1"]
+
+    db.session.expunge_all()
+    service_instance = db.session.get(ALBServiceInstance, "1")
+    assert service_instance.previous_alb_listener_arn == "listener-arn-0"
+    assert service_instance.alb_listener_arn == "listener-arn-1"
+    assert service_instance.new_certificate_id == (
+        service_instance.current_certificate_id
+    )
+    assert _certificate_counts() == {"listener-arn-0": 3, "listener-arn-1": 1}
+
+    # add the certificate to the new listener
+    alb.expect_add_certificate_to_listener("listener-arn-1", "certificate-arn-1")
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    # point DNS at the new load balancer
+    change_id = route53.expect_create_ALIAS_and_return_change_id(
+        "example.com.domains.cloud.test", "alb.cloud.test", "ALBHOSTEDZONEID"
+    )
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    route53.expect_wait_for_change_insync(change_id)
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    # remove the certificate from the old listener
+    alb.expect_remove_certificate_from_listener("listener-arn-0", "certificate-arn-1")
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    alb.assert_no_pending_responses()
+    route53.assert_no_pending_responses()
+
+    db.session.expunge_all()
+    service_instance = db.session.get(ALBServiceInstance, "1")
+    assert service_instance.alb_listener_arn == "listener-arn-1"
+    assert service_instance.previous_alb_listener_arn is None
+    assert service_instance.reserved_alb_listener_arn is None
+    assert service_instance.new_certificate is None
+    assert service_instance.current_certificate.iam_server_certificate_arn == (
+        "certificate-arn-1"
+    )
+    operation = service_instance.operations.one()
+    assert operation.action == Operation.Actions.REBALANCE.value
+    assert operation.state == Operation.States.SUCCEEDED.value
+    assert _certificate_counts() == {"listener-arn-0": 2, "listener-arn-1": 1}
+
+
+def test_rebalance_skips_busy_instances(clean_db, tasks):
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=2
+    )
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-1", certificate_count=0
+    )
+    service_instance = _create_instance("1", "listener-arn-0")
+    factories.OperationFactory.create(
+        service_instance=service_instance,
+        state=Operation.States.IN_PROGRESS.value,
+        action=Operation.Actions.RENEW.value,
+    )
+
+    assert _rebalance_alb_listeners(5) == []
+    assert _certificate_counts() == {"listener-arn-0": 2, "listener-arn-1": 0}
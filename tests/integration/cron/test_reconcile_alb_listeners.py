@@ -0,0 +1,66 @@
+from sqlalchemy import select
+
+from broker.models import ALBListener
+from broker.tasks.cron import reconcile_alb_listeners
+from tests.lib import factories
+
+
+def test_reconciles_shared_and_dedicated_listeners(clean_db, alb):
+    factories.DedicatedALBListenerFactory.create(
+        id=1,
+        listener_arn="dedicated-arn-0",
+        alb_arn="alb-dedicated-arn-0",
+        dedicated_org="org-1",
+    )
+    # our count has drifted from what AWS says
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=12
+    )
+    alb.expect_index_listeners(
+        {
+            "dedicated-arn-0": ("alb-dedicated-arn-0", 0),
+            "listener-arn-0": ("alb-listener-arn-0", 3),
+            "listener-arn-1": ("alb-listener-arn-1", 2),
+        }
+    )
+
+    reconcile_alb_listeners.call_local()
+    alb.assert_no_pending_responses()
+
+    clean_db.session.expunge_all()
+    counts = dict(
+        clean_db.session.execute(
+            select(ALBListener.listener_arn, ALBListener.certificate_count)
+        ).all()
+    )
+    assert counts == {"dedicated-arn-0": 0, "listener-arn-0": 3, "listener-arn-1": 2}
+
+
+def test_reconciling_keeps_reservations_in_the_count(clean_db, alb):
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=4
+    )
+    # a certificate we've picked this listener for, but haven't added yet
+    factories.ALBServiceInstanceFactory.create(
+        id="1234",
+        alb_listener_arn="listener-arn-0",
+        reserved_alb_listener_arn="listener-arn-0",
+    )
+    clean_db.session.commit()
+    alb.expect_index_listeners(
+        {
+            "listener-arn-0": ("alb-listener-arn-0", 3),
+            "listener-arn-1": ("alb-listener-arn-1", 2),
+        }
+    )
+
+    reconcile_alb_listeners.call_local()
+    alb.assert_no_pending_responses()
+
+    clean_db.session.expunge_all()
+    counts = dict(
+        clean_db.session.execute(
+            select(ALBListener.listener_arn, ALBListener.certificate_count)
+        ).all()
+    )
+    assert counts == {"listener-arn-0": 4, "listener-arn-1": 2}
@@ -4,12 +4,37 @@ import pytest
 from broker.extensions import db
 from broker.models import Operation
 from broker.tasks.cron import scan_for_stalled_pipelines, reschedule_operation
-from broker.tasks.huey import huey
+from broker.tasks.huey import (
+    heartbeat,
+    huey,
+    nonretriable_task,
+    operations_with_heartbeats,
+    refresh_heartbeats,
+)
 from sqlalchemy import text
 
 import tests.lib.factories as factories
 
 
+@nonretriable_task
+def stalled_step(operation_id):
+    pass
+
+
+def set_updated_at(operation_id, minutes_ago):
+    updated_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        minutes=minutes_ago
+    )
+    # have to do this manually to skip the onupdate on the model
+    db.session.execute(
+        text("UPDATE operation SET updated_at = :time WHERE id = :id").bindparams(
+            time=updated_at.isoformat(), id=operation_id
+        )
+    )
+    db.session.commit()
+    return updated_at
+
+
 def test_finds_stalled_operations(clean_db):
     stalled_operation = factories.OperationFactory.create(
         id=1234, state="in progress", action="Deprovision"
@@ -23,23 +48,9 @@ def test_finds_stalled_operations(clean_db):
     db.session.add(stalled_operation)
     db.session.commit()
 
-    ok = datetime.datetime.now() - datetime.timedelta(minutes=13)
-    ok = ok.replace(tzinfo=datetime.timezone.utc)
-    too_old = datetime.datetime.now() - datetime.timedelta(minutes=16)
-    too_old = too_old.replace(tzinfo=datetime.timezone.utc)
-
-    # have to do this manually to skip the onupdate on the model
-    db.session.execute(
-        text("UPDATE operation SET updated_at = :time WHERE id = 1234").bindparams(
-            time=too_old.isoformat()
-        )
-    )
-    db.session.execute(
-        text("UPDATE operation SET updated_at = :time WHERE id = 4321").bindparams(
-            time=ok.isoformat()
-        )
-    )
-    db.session.commit()
+    too_old = set_updated_at(1234, 16)
+    # recently updated operations may be about to queue their next step
+    set_updated_at(4321, 1)
 
     # sanity check - did we actually set updated_at?
     stalled_operation = db.session.get(Operation, 1234)
@@ -48,6 +59,57 @@ def test_finds_stalled_operations(clean_db):
     assert scan_for_stalled_pipelines() == [1234]
 
 
+def test_does_not_find_operations_with_a_heartbeat(clean_db):
+    factories.OperationFactory.create(id=1234, state="in progress", action="Renew")
+    factories.OperationFactory.create(id=4321, state="in progress", action="Renew")
+    set_updated_at(1234, 60)
+    set_updated_at(4321, 60)
+
+    with heartbeat(4321):
+        assert scan_for_stalled_pipelines() == [1234]
+    # the heartbeat outlives the step, until it expires
+    assert scan_for_stalled_pipelines() == [1234]
+
+    huey.storage.conn.delete("operation:4321:heartbeat")
+    assert scan_for_stalled_pipelines() == [1234, 4321]
+
+
+def test_refreshes_heartbeats_of_running_operations(clean_db):
+    with heartbeat(1234):
+        huey.storage.conn.delete("operation:1234:heartbeat")
+        refresh_heartbeats()
+        assert operations_with_heartbeats([1234, 4321]) == {1234}
+
+    huey.storage.conn.delete("operation:1234:heartbeat")
+    refresh_heartbeats()
+    assert operations_with_heartbeats([1234, 4321]) == set()
+
+
+def test_does_not_find_operations_with_queued_tasks(clean_db):
+    for operation_id in (1234, 4321, 5678):
+        factories.OperationFactory.create(
+            id=operation_id, state="in progress", action="Renew"
+        )
+        set_updated_at(operation_id, 60)
+
+    stalled_step(4321)
+    stalled_step.schedule((5678,), delay=600)
+
+    assert scan_for_stalled_pipelines() == [1234]
+
+
+def test_finds_operations_once_their_tasks_have_run(clean_db, tasks):
+    factories.OperationFactory.create(id=1234, state="in progress", action="Renew")
+    set_updated_at(1234, 60)
+
+    stalled_step(1234)
+    assert scan_for_stalled_pipelines() == []
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    huey.storage.conn.delete("operation:1234:heartbeat")
+    assert scan_for_stalled_pipelines() == [1234]
+
+
 @pytest.mark.parametrize("state", ["completed", "failed"])
 def test_does_not_find_ended_operations(clean_db, state):
     complete = factories.OperationFactory.create(
@@ -106,3 +168,31 @@ def test_reschedules_operation(clean_db, action):
     reschedule_operation(1234)
     assert len(huey.pending()) == 1
     huey.dequeue()
+
+
+def test_does_not_find_operations_waiting_to_resume(clean_db):
+    factories.OperationFactory.create(
+        id=1234,
+        state="in progress",
+        action="Renew",
+        resume_at=datetime.datetime.now(datetime.timezone.utc)
+        + datetime.timedelta(minutes=5),
+    )
+    factories.OperationFactory.create(
+        id=4321,
+        state="in progress",
+        action="Renew",
+        resume_at=datetime.datetime.now(datetime.timezone.utc)
+        - datetime.timedelta(minutes=20),
+    )
+    too_old = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        minutes=20
+    )
+    db.session.execute(
+        text("UPDATE operation SET updated_at = :time").bindparams(
+            time=too_old.isoformat()
+        )
+    )
+    db.session.commit()
+
+    assert scan_for_stalled_pipelines() == [4321]
@@ -107,9 +107,9 @@ def test_selects_existing_dedicated_alb(clean_db, alb, service_instance):
 
     clean_db.session.expunge_all()
     service_instance = clean_db.session.get(DedicatedALBServiceInstance, "4321")
-    alb.expect_get_certificates_for_listener("our-arn-0", 16)
-    alb.expect_get_certificates_for_listener("our-arn-1", 17)
-    alb.expect_get_listeners("our-arn-0", "alb-our-arn-0")
+    alb.expect_index_listeners(
+        {"our-arn-0": ("alb-our-arn-0", 16), "our-arn-1": ("alb-our-arn-1", 17)}
+    )
     get_lowest_dedicated_alb(service_instance, clean_db)
     alb.assert_no_pending_responses()
     clean_db.session.expunge_all()
@@ -179,8 +179,7 @@ def test_adds_new_alb_when_assigned_is_near_full(clean_db, alb, service_instance
 
     clean_db.session.expunge_all()
     service_instance = clean_db.session.get(DedicatedALBServiceInstance, "4321")
-    alb.expect_get_certificates_for_listener("available-arn-0", 0)
-    alb.expect_get_listeners("available-arn-0", "alb-our-arn-1")
+    alb.expect_index_listeners({"available-arn-0": ("alb-our-arn-1", 0)})
     get_lowest_dedicated_alb(service_instance, clean_db)
     alb.assert_no_pending_responses()
     clean_db.session.expunge_all()
@@ -220,8 +219,7 @@ def test_selects_existing_dedicated_alb_when_it_has_deactivated_instances(
 
     clean_db.session.expunge_all()
     service_instance = clean_db.session.get(DedicatedALBServiceInstance, "4321")
-    alb.expect_get_certificates_for_listener("our-arn-0", 0)
-    alb.expect_get_listeners("our-arn-0", "alb-our-arn-0")
+    alb.expect_index_listeners({"our-arn-0": ("alb-our-arn-0", 0)})
     get_lowest_dedicated_alb(service_instance, clean_db)
     alb.assert_no_pending_responses()
     clean_db.session.expunge_all()
@@ -7,6 +7,7 @@ from broker.models import (
 
 from tests.lib.client import check_last_operation_description
 from tests.lib.provision import (
+    subtest_provision_adds_names_to_tags,
     subtest_provision_creates_LE_user,
     subtest_provision_creates_private_key_and_csr,
     subtest_provision_initiates_LE_challenge,
@@ -114,6 +115,19 @@ def subtest_provision_dedicated_alb_instance(
     check_last_operation_description(
         client, service_instance_id, operation_id, "Queuing tasks"
     )
+    subtest_provision_adds_names_to_tags(
+        tasks,
+        instance_model,
+        organization_guid,
+        space_guid,
+        service_instance_id=service_instance_id,
+    )
+    check_last_operation_description(
+        client,
+        service_instance_id,
+        operation_id,
+        "Looking up space and organization names",
+    )
     subtest_provision_creates_LE_user(
         tasks, instance_model, service_instance_id=service_instance_id
     )
@@ -215,9 +229,12 @@ def subtest_provision_dedicated_alb_instance(
 def subtest_provision_selects_dedicated_alb(
     tasks, alb, dedicated_alb_arn, service_instance_id="4321"
 ):
-    alb.expect_get_certificates_for_listener("our-arn-0", 1)
-    alb.expect_get_certificates_for_listener("our-arn-1", 5)
-    alb.expect_get_listeners("our-arn-0", dedicated_alb_arn)
+    alb.expect_index_listeners(
+        {
+            "our-arn-0": (dedicated_alb_arn, 1),
+            "our-arn-1": ("alb-our-arn-1", 5),
+        }
+    )
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     db.session.expunge_all()
@@ -235,7 +252,6 @@ def subtest_provision_adds_certificate_to_alb(
     alb.expect_add_certificate_to_listener(
         "our-arn-0", certificate.iam_server_certificate_arn
     )
-    alb.expect_describe_alb(dedicated_alb_arn, "alb.cloud.test")
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     db.session.expunge_all()
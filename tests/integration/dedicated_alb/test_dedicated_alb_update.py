@@ -101,9 +101,6 @@ def subtest_update_creates_update_operation(client, dns):
 
 def subtest_update_selects_alb(tasks, alb, dedicated_alb_arn):
     db.session.expunge_all()
-    alb.expect_get_certificates_for_listener("our-arn-0", 1)
-    alb.expect_get_certificates_for_listener("our-arn-1", 5)
-    alb.expect_get_listeners("our-arn-0", dedicated_alb_arn)
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     service_instance = db.session.get(DedicatedALBServiceInstance, "4321")
@@ -118,7 +115,6 @@ def subtest_update_adds_certificate_to_alb(tasks, alb, dedicated_alb_arn):
     alb.expect_add_certificate_to_listener(
         "our-arn-0", certificate.iam_server_certificate_arn
     )
-    alb.expect_describe_alb(dedicated_alb_arn, "alb.cloud.test")
     tasks.run_queued_tasks_and_enqueue_dependents()
     alb.assert_no_pending_responses()
     db.session.expunge_all()
@@ -0,0 +1,25 @@
+from threading import Barrier, Thread
+
+from broker.extensions import db
+from broker.tasks.huey import nonretriable_task
+
+
+def test_concurrent_tasks_get_their_own_session():
+    both_running = Barrier(2)
+    sessions = []
+
+    @nonretriable_task
+    def session_task():
+        session = db.session()
+        # make sure the other task is in flight before we finish
+        both_running.wait(timeout=5)
+        sessions.append(session)
+
+    runs = [Thread(target=session_task.call_local) for _ in range(2)]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+
+    assert len(sessions) == 2
+    assert sessions[0] is not sessions[1]
@@ -0,0 +1,133 @@
+import pytest
+
+from broker.extensions import config, db
+from broker.models import Operation
+from broker.tasks.branches import Pipeline, enqueue_pipeline
+from broker.tasks.cron import reschedule_operation
+from broker.tasks.huey import Priority, huey, pipeline_operation
+
+from tests.lib.factories import OperationFactory
+
+executed = []
+
+
+@pipeline_operation("Checkpoint one")
+def checkpoint_one(operation_id, *, operation, db, **kwargs):
+    executed.append("one")
+
+
+@pipeline_operation("Checkpoint two")
+def checkpoint_two(operation_id, *, operation, db, **kwargs):
+    executed.append("two")
+
+
+@pipeline_operation("Checkpoint three")
+def checkpoint_three(operation_id, *, operation, db, **kwargs):
+    executed.append("three")
+
+
+@pipeline_operation("Checkpoint four")
+def checkpoint_four(operation_id, *, operation, db, **kwargs):
+    executed.append("four")
+
+
+@pytest.fixture
+def operation(clean_db):
+    executed.clear()
+    operation = OperationFactory.create(id=4321)
+    clean_db.session.commit()
+    return operation
+
+
+def completed_steps(operation_id):
+    db.session.expunge_all()
+    return db.session.get(Operation, operation_id).completed_steps
+
+
+def stall():
+    """lose everything queued, the way a crashed worker would"""
+    huey.flush()
+    executed.clear()
+
+
+def test_linear_pipeline_resumes_after_last_completed_step(operation, tasks):
+    enqueue_pipeline(
+        "checkpoints",
+        checkpoint_one.s(4321, correlation_id="correlation")
+        .then(checkpoint_two, 4321, correlation_id="correlation")
+        .then(checkpoint_three, 4321, correlation_id="correlation"),
+        Priority.RENEWAL,
+    )
+    assert completed_steps(4321) == 0
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["one", "two"]
+    assert completed_steps(4321) == 2
+
+    stall()
+    assert reschedule_operation(4321) is not None
+
+    resumed = huey.dequeue()
+    assert resumed.name == "checkpoint_three"
+    assert resumed.priority == Priority.RENEWAL
+    assert resumed.kwargs["correlation_id"] == "correlation"
+    huey.execute(resumed)
+    assert executed == ["three"]
+    assert completed_steps(4321) == 3
+
+
+@pytest.mark.parametrize("parallel_branches", [True, False])
+def test_branched_pipeline_resumes_after_last_completed_stage(
+    operation, tasks, monkeypatch, parallel_branches
+):
+    monkeypatch.setattr(config, "PIPELINE_PARALLEL_BRANCHES", parallel_branches)
+    (
+        Pipeline("checkpoints", 4321, "correlation", Priority.USER)
+        .then(checkpoint_one)
+        .parallel([checkpoint_two], [checkpoint_three])
+        .then(checkpoint_four)
+        .enqueue()
+    )
+
+    # run until the parallel stage has joined, but stop before the last step
+    while completed_steps(4321) < 2:
+        tasks.run_queued_tasks_and_enqueue_dependents()
+    assert sorted(executed) == ["one", "three", "two"]
+
+    stall()
+    reschedule_operation(4321)
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["four"]
+    assert completed_steps(4321) == 3
+
+
+def test_resumes_from_start_when_nothing_completed(operation, tasks):
+    enqueue_pipeline(
+        "checkpoints",
+        checkpoint_one.s(4321, correlation_id="correlation").then(
+            checkpoint_two, 4321, correlation_id="correlation"
+        ),
+        Priority.USER,
+    )
+
+    stall()
+    reschedule_operation(4321)
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["one", "two"]
+
+
+def test_replays_whole_pipeline_for_unknown_tasks(operation, tasks):
+    operation.action = Operation.Actions.RENEW.value
+    operation.pipeline = {
+        "priority": 10,
+        "correlation_id": "Renewal",
+        "stages": ["broker.tasks.nowhere.renamed_task"],
+    }
+    db.session.add(operation)
+    db.session.commit()
+
+    assert reschedule_operation(4321).__name__ == (
+        "queue_all_cdn_renewal_tasks_for_operation"
+    )
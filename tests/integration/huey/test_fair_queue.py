@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+import threading
+import time
+
+from huey.exceptions import CancelExecution
+import pytest
+
+from broker.lib.fair_queue import FairRedisHuey
+from broker.pipelines.alb import queue_all_alb_provision_tasks_for_operation
+from broker.tasks.huey import connection_pool, huey, organization_for_operation
+
+from tests.lib.factories import (
+    ALBServiceInstanceFactory,
+    DedicatedALBServiceInstanceFactory,
+    OperationFactory,
+)
+
+
+def _fair_huey(**kwargs):
+    fair_huey = FairRedisHuey(
+        name="fair-test", connection_pool=connection_pool, **kwargs
+    )
+
+    @fair_huey.task()
+    def work(number, organization_guid=None):
+        pass
+
+    return fair_huey, work
+
+
+def _queue(work, organization_guid, count):
+    for number in range(count):
+        work(f"{organization_guid}-{number}", organization_guid=organization_guid)
+
+
+def _dequeue_all(fair_huey):
+    dequeued = []
+    while (task := fair_huey.dequeue()) is not None:
+        dequeued.append(task.args[0])
+    return dequeued
+
+
+def test_takes_turns_between_organizations(clean_redis):
+    fair_huey, work = _fair_huey()
+    _queue(work, "big-org", 4)
+    _queue(work, "small-org", 2)
+
+    assert _dequeue_all(fair_huey) == [
+        "big-org-0",
+        "small-org-0",
+        "big-org-1",
+        "small-org-1",
+        "big-org-2",
+        "big-org-3",
+    ]
+
+
+def test_weighted_organizations_get_more_turns(clean_redis):
+    fair_huey, work = _fair_huey(weights={"big-org": 2})
+    _queue(work, "big-org", 4)
+    _queue(work, "small-org", 2)
+
+    assert _dequeue_all(fair_huey) == [
+        "big-org-0",
+        "big-org-1",
+        "small-org-0",
+        "big-org-2",
+        "big-org-3",
+        "small-org-1",
+    ]
+
+
+def test_higher_priorities_go_first(clean_redis):
+    fair_huey, work = _fair_huey()
+    fair_huey.enqueue(work.s("low", organization_guid="big-org"))
+    fair_huey.enqueue(work.s("high", organization_guid="small-org", priority=10))
+
+    assert _dequeue_all(fair_huey) == ["high", "low"]
+
+
+def test_skips_organizations_at_their_limit(clean_redis):
+    fair_huey, work = _fair_huey(default_limit=1, limits={"big-org": 2})
+    _queue(work, "big-org", 3)
+    _queue(work, "small-org", 2)
+
+    running = [fair_huey.dequeue() for _ in range(3)]
+    assert [task.args[0] for task in running] == [
+        "big-org-0",
+        "small-org-0",
+        "big-org-1",
+    ]
+    assert fair_huey.dequeue() is None
+    assert fair_huey.pending_count() == 2
+
+    fair_huey.storage.release(running[1].id, "small-org")
+    assert fair_huey.dequeue().args[0] == "small-org-1"
+
+    fair_huey.execute(running[0])
+    assert fair_huey.dequeue().args[0] == "big-org-2"
+
+
+def test_expired_leases_stop_counting_against_the_limit(clean_redis):
+    fair_huey, work = _fair_huey(default_limit=1, lease_time=-1)
+    _queue(work, "big-org", 2)
+
+    assert fair_huey.dequeue().args[0] == "big-org-0"
+    assert fair_huey.dequeue().args[0] == "big-org-1"
+
+
+def test_idle_workers_wake_up_when_a_task_is_queued(clean_redis):
+    fair_huey, work = _fair_huey(read_timeout=5)
+    queueing = threading.Timer(0.2, _queue, (work, "big-org", 1))
+    queueing.start()
+
+    started = time.monotonic()
+    assert fair_huey.dequeue().args[0] == "big-org-0"
+    assert time.monotonic() - started < 5
+    queueing.join()
+
+
+def test_idle_workers_give_up_after_the_read_timeout(clean_redis):
+    fair_huey, work = _fair_huey(read_timeout=1)
+
+    started = time.monotonic()
+    assert fair_huey.dequeue() is None
+    assert time.monotonic() - started >= 1
+
+
+@pytest.mark.parametrize(
+    "skip",
+    [
+        lambda fair_huey, task: fair_huey.revoke(task),
+        lambda fair_huey, task: setattr(
+            task, "eta", datetime.utcnow() + timedelta(hours=1)
+        ),
+    ],
+)
+def test_tasks_that_do_not_run_release_their_lease(clean_redis, skip):
+    fair_huey, work = _fair_huey(default_limit=1)
+    _queue(work, "big-org", 2)
+
+    task = fair_huey.dequeue()
+    skip(fair_huey, task)
+    fair_huey.execute(task)
+
+    assert fair_huey.dequeue().args[0] == "big-org-1"
+
+
+def test_tasks_canceled_before_running_release_their_lease(clean_redis):
+    fair_huey, work = _fair_huey(default_limit=1)
+
+    @fair_huey.pre_execute()
+    def cancel(task):
+        raise CancelExecution(retry=False)
+
+    _queue(work, "big-org", 2)
+    fair_huey.execute(fair_huey.dequeue())
+
+    assert fair_huey.dequeue().args[0] == "big-org-1"
+
+
+@pytest.mark.parametrize(
+    "factory,organization_fields,expected",
+    [
+        (
+            DedicatedALBServiceInstanceFactory,
+            {"org_id": "org-from-column"},
+            "org-from-column",
+        ),
+        (
+            ALBServiceInstanceFactory,
+            {"tags": [{"Key": "Organization GUID", "Value": "org-from-tags"}]},
+            "org-from-tags",
+        ),
+    ],
+)
+def test_pipelines_carry_their_organization(
+    clean_db, factory, organization_fields, expected
+):
+    service_instance = factory.create(id="1234", **organization_fields)
+    operation = OperationFactory.create(id=5, service_instance=service_instance)
+
+    assert organization_for_operation(operation.id) == expected
+
+    queue_all_alb_provision_tasks_for_operation(operation.id, "correlation")
+    assert huey.dequeue().kwargs["organization_guid"] == expected
+
+
+def test_operations_without_an_organization(clean_db):
+    service_instance = ALBServiceInstanceFactory.create(id="1234")
+    operation = OperationFactory.create(id=5, service_instance=service_instance)
+
+    assert organization_for_operation(operation.id) is None
+    assert organization_for_operation(404) is None
@@ -0,0 +1,197 @@
+import time
+
+import pytest
+
+from broker.extensions import config, db
+from broker.models import ALBListener, ALBServiceInstance, Operation
+from broker.tasks.branches import enqueue_pipeline
+from broker.tasks.huey import (
+    Priority,
+    huey,
+    pipeline_operation,
+    wait_without_blocking,
+)
+
+from tests.lib.factories import (
+    ALBServiceInstanceFactory,
+    CDNServiceInstanceFactory,
+    OperationFactory,
+)
+from tests.lib.tasks import fallible_huey
+
+executed = []
+
+
+@pipeline_operation("Locked step")
+def locked_step(operation_id, *, operation, db, **kwargs):
+    executed.append(operation_id)
+
+
+@pipeline_operation("Parked step")
+def parked_step(operation_id, *, operation, db, **kwargs):
+    wait_without_blocking(operation, db, 3)
+    executed.append(operation_id)
+
+
+@pipeline_operation("Failing step")
+def failing_step(operation_id, *, operation, db, **kwargs):
+    raise RuntimeError("try again later")
+
+
+@pytest.fixture
+def service_instance(clean_db):
+    executed.clear()
+    service_instance = CDNServiceInstanceFactory.create(id="1234")
+    OperationFactory.create(id=1, service_instance=service_instance)
+    OperationFactory.create(
+        id=2,
+        service_instance=service_instance,
+        action=Operation.Actions.UPDATE.value,
+    )
+    clean_db.session.commit()
+    return service_instance
+
+
+def lock_holder():
+    holder = huey.storage.conn.get("service_instance:1234:lock")
+    return None if holder is None else int(holder)
+
+
+def run(operation_id):
+    task = locked_step.s(operation_id)
+    with fallible_huey():
+        huey.execute(task)
+    db.session.expunge_all()
+    return task
+
+
+def test_steps_take_the_lock_for_their_operation(service_instance):
+    run(1)
+    run(1)
+
+    assert executed == [1, 1]
+    assert lock_holder() == 1
+
+
+def test_other_operations_wait_without_using_retries(service_instance):
+    run(1)
+    task = run(2)
+
+    assert executed == [1]
+    assert lock_holder() == 1
+    [waiting] = huey.scheduled()
+    assert waiting.id == task.id
+    assert waiting.retries == task.retries
+
+
+@pytest.mark.parametrize(
+    "finished",
+    [{"state": Operation.States.SUCCEEDED.value}, {"canceled_at": "2024-01-01"}],
+)
+def test_finished_operations_give_up_the_lock(service_instance, finished):
+    run(1)
+    db.session.query(Operation).filter_by(id=1).update(finished)
+    db.session.commit()
+    run(2)
+
+    assert executed == [1, 2]
+    assert lock_holder() == 2
+
+
+def test_renewals_cancel_instead_of_waiting(service_instance):
+    OperationFactory.create(
+        id=3, service_instance=service_instance, action=Operation.Actions.RENEW.value
+    )
+    db.session.commit()
+    run(1)
+    run(3)
+
+    assert executed == [1]
+    assert huey.scheduled() == []
+    renewal = db.session.get(Operation, 3)
+    assert renewal.state == Operation.States.FAILED.value
+    assert renewal.canceled_at is not None
+
+
+def test_finished_pipelines_release_the_lock(service_instance, tasks):
+    enqueue_pipeline(
+        "locks",
+        locked_step.s(1, correlation_id="correlation").then(
+            locked_step, 1, correlation_id="correlation"
+        ),
+        Priority.USER,
+    )
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert lock_holder() == 1
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert lock_holder() is None
+
+
+def test_renewals_part_way_through_wait_instead(service_instance):
+    OperationFactory.create(
+        id=3,
+        service_instance=service_instance,
+        action=Operation.Actions.RENEW.value,
+        completed_steps=1,
+    )
+    db.session.commit()
+    run(1)
+    run(3)
+
+    assert executed == [1]
+    assert len(huey.scheduled()) == 1
+    assert db.session.get(Operation, 3).state == Operation.States.IN_PROGRESS.value
+
+
+def test_canceled_renewals_release_their_listener_reservation(clean_db):
+    executed.clear()
+    service_instance = ALBServiceInstanceFactory.create(
+        id="1234", reserved_alb_listener_arn="listener-arn"
+    )
+    db.session.add(
+        ALBListener(
+            listener_arn="listener-arn",
+            alb_arn="alb-arn",
+            dns_name="alb.example.com",
+            canonical_hosted_zone_id="zone",
+            certificate_count=1,
+        )
+    )
+    OperationFactory.create(id=1, service_instance=service_instance)
+    OperationFactory.create(
+        id=3, service_instance=service_instance, action=Operation.Actions.RENEW.value
+    )
+    db.session.commit()
+    run(1)
+    run(3)
+
+    assert db.session.get(Operation, 3).state == Operation.States.FAILED.value
+    assert db.session.get(ALBListener, 1).certificate_count == 0
+    instance = db.session.get(ALBServiceInstance, "1234")
+    assert instance.reserved_alb_listener_arn is None
+
+
+def test_parked_pipelines_keep_the_lock_past_the_lease_time(
+    service_instance, monkeypatch
+):
+    monkeypatch.setattr(config, "SERVICE_INSTANCE_LOCK_LEASE_TIME", 1)
+    with fallible_huey():
+        huey.execute(parked_step.s(1))
+    assert executed == []
+
+    time.sleep(1.5)
+    run(2)
+
+    assert executed == []
+    assert lock_holder() == 1
+
+
+def test_failed_steps_keep_the_lock_until_they_retry(service_instance):
+    with fallible_huey():
+        huey.execute(failing_step.s(1))
+
+    [retry] = huey.scheduled()
+    ttl = huey.storage.conn.ttl("service_instance:1234:lock")
+    assert ttl > retry.retry_delay
+    assert lock_holder() == 1
@@ -0,0 +1,170 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from broker.extensions import config, db
+from broker.models import Operation
+from broker.tasks.branches import Pipeline
+from broker.tasks.huey import Priority, huey, pipeline_operation
+
+from tests.lib.factories import OperationFactory
+from tests.lib.tasks import fallible_huey
+
+executed = []
+
+
+@pipeline_operation("Starting")
+def branching_start(operation_id, *, operation, db, **kwargs):
+    executed.append("start")
+
+
+@pipeline_operation("First branch, step one")
+def branching_first_one(operation_id, *, operation, db, **kwargs):
+    executed.append("first one")
+
+
+@pipeline_operation("First branch, step two")
+def branching_first_two(operation_id, *, operation, db, **kwargs):
+    executed.append("first two")
+
+
+@pipeline_operation("Second branch")
+def branching_second(operation_id, *, operation, db, **kwargs):
+    executed.append("second")
+
+
+@pipeline_operation("Failing branch", is_retriable=False)
+def branching_failure(operation_id, *, operation, db, **kwargs):
+    raise RuntimeError("this branch can't go on")
+
+
+@pipeline_operation("Finishing")
+def branching_finish(operation_id, *, operation, db, **kwargs):
+    executed.append("finish")
+
+
+@pytest.fixture
+def parallel_branches(monkeypatch):
+    monkeypatch.setattr(config, "PIPELINE_PARALLEL_BRANCHES", True)
+    executed.clear()
+
+
+def enqueue_pipeline(operation_id):
+    (
+        Pipeline("branching", operation_id, "correlation", Priority.USER)
+        .then(branching_start)
+        .parallel([branching_first_one, branching_first_two], [branching_second])
+        .then(branching_finish)
+        .enqueue()
+    )
+
+
+def step_description(operation_id):
+    db.session.expunge_all()
+    return db.session.get(Operation, operation_id).step_description
+
+
+def test_branches_run_in_parallel_and_join(clean_db, tasks, parallel_branches):
+    OperationFactory.create(id=4321)
+    clean_db.session.commit()
+    enqueue_pipeline(4321)
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["start"]
+    assert step_description(4321) == "Starting"
+
+    # start_branches
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["start"]
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["start", "first one", "second"]
+    assert step_description(4321) == "First branch, step one; Second branch"
+
+    # the second branch finishes while the first takes its second step
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["start", "first one", "second", "first two"]
+    assert step_description(4321) == "First branch, step two"
+
+    # the first branch finishes, which triggers the join
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["start", "first one", "second", "first two"]
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["start", "first one", "second", "first two", "finish"]
+    assert step_description(4321) == "Finishing"
+    assert huey.pending_count() == 0
+
+
+def test_branches_run_in_order_when_parallel_branches_are_disabled(
+    clean_db, tasks, monkeypatch
+):
+    monkeypatch.setattr(config, "PIPELINE_PARALLEL_BRANCHES", False)
+    executed.clear()
+    OperationFactory.create(id=4321)
+    clean_db.session.commit()
+    enqueue_pipeline(4321)
+
+    for _ in range(5):
+        tasks.run_queued_tasks_and_enqueue_dependents()
+
+    assert executed == ["start", "first one", "first two", "second", "finish"]
+    assert step_description(4321) == "Finishing"
+    assert huey.pending_count() == 0
+
+
+def assert_branches_cleaned_up(operation_id):
+    assert huey.pending_count() == 0
+    assert huey.scheduled_count() == 0
+    assert not huey.storage.conn.exists(f"operation:{operation_id}:branches")
+    assert not list(huey.storage.conn.scan_iter(match="*chord*"))
+
+
+def test_failed_branches_stop_the_pipeline_at_the_join(
+    clean_db, tasks, parallel_branches
+):
+    OperationFactory.create(id=4321)
+    clean_db.session.commit()
+    (
+        Pipeline("failing", 4321, "correlation", Priority.USER)
+        .then(branching_start)
+        .parallel([branching_failure, branching_first_two], [branching_second])
+        .then(branching_finish)
+        .enqueue()
+    )
+
+    with fallible_huey():
+        while huey.pending_count():
+            tasks.run_queued_tasks_and_enqueue_dependents()
+
+    # the failed branch's later steps never ran, and neither did the next stage
+    assert executed == ["start", "second"]
+    db.session.expunge_all()
+    operation = db.session.get(Operation, 4321)
+    assert operation.state == Operation.States.FAILED.value
+    assert operation.completed_steps == 1
+    assert_branches_cleaned_up(4321)
+
+
+def test_canceled_operations_clean_up_their_branches(
+    clean_db, tasks, parallel_branches
+):
+    OperationFactory.create(id=4321)
+    clean_db.session.commit()
+    enqueue_pipeline(4321)
+
+    # start, then start_branches
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    db.session.query(Operation).filter_by(id=4321).update(
+        {"canceled_at": datetime.now(timezone.utc)}
+    )
+    db.session.commit()
+
+    with fallible_huey():
+        while huey.pending_count():
+            tasks.run_queued_tasks_and_enqueue_dependents()
+
+    assert executed == ["start"]
+    assert_branches_cleaned_up(4321)
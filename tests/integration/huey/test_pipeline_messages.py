@@ -0,0 +1,108 @@
+import pytest
+
+from broker.extensions import config
+from broker.tasks import branches
+from broker.tasks.branches import Pipeline, enqueue_pipeline, pipeline_stages
+from broker.tasks.huey import Priority, huey, pipeline_operation
+
+from tests.lib.factories import OperationFactory
+from tests.lib.tasks import fallible_huey
+
+executed = []
+
+
+@pipeline_operation("Message one")
+def message_one(operation_id, *, operation, db, **kwargs):
+    executed.append("one")
+
+
+@pipeline_operation("Message two")
+def message_two(operation_id, *, operation, db, **kwargs):
+    executed.append("two")
+
+
+@pipeline_operation("Message failing", is_retriable=False)
+def message_failing(operation_id, *, operation, db, **kwargs):
+    raise RuntimeError("failing branch")
+
+
+@pytest.fixture
+def operation(clean_db):
+    executed.clear()
+    operation = OperationFactory.create(id=4321)
+    clean_db.session.commit()
+    return operation
+
+
+def queue_pipeline(steps):
+    chain = message_one.s(4321, correlation_id="correlation")
+    for _ in range(steps - 1):
+        chain.then(message_two, 4321, correlation_id="correlation")
+    enqueue_pipeline("messages", chain, Priority.RENEWAL)
+
+
+def test_messages_carry_a_reference_instead_of_the_chain(operation):
+    queue_pipeline(3)
+    task = huey.dequeue()
+
+    assert task.on_complete is None
+    assert sorted(task.kwargs) == [
+        "correlation_id",
+        "organization_guid",
+        "pipeline",
+        "step",
+    ]
+    assert task.kwargs["pipeline"].startswith("messages:")
+    assert task.kwargs["step"] == 0
+    stages = pipeline_stages(task.kwargs["pipeline"])
+    assert [stage.split(".")[-1] for stage in stages] == [
+        "message_one",
+        "message_two",
+        "message_two",
+    ]
+
+
+def test_message_size_does_not_grow_with_the_pipeline(operation):
+    queue_pipeline(2)
+    short = huey.serialize_task(huey.dequeue())
+    queue_pipeline(20)
+    long = huey.serialize_task(huey.dequeue())
+
+    assert len(long) == len(short)
+
+
+def test_finished_steps_queue_the_next_one(operation, tasks):
+    queue_pipeline(2)
+
+    tasks.run_queued_tasks_and_enqueue_dependents()
+    assert executed == ["one"]
+    next_task = huey.dequeue()
+    assert next_task.name == "message_two"
+    assert next_task.priority == Priority.RENEWAL
+    assert next_task.kwargs["step"] == 1
+    assert next_task.kwargs["correlation_id"] == "correlation"
+
+    huey.execute(next_task)
+    assert executed == ["one", "two"]
+    assert huey.pending_count() == 0
+
+
+def test_workers_find_pipelines_registered_elsewhere(operation, monkeypatch):
+    queue_pipeline(2)
+    task = huey.dequeue()
+    monkeypatch.setattr(branches, "_pipelines", {})
+
+    assert len(pipeline_stages(task.kwargs["pipeline"])) == 2
+
+
+def test_failed_branches_stop_the_pipeline(operation, tasks, monkeypatch):
+    monkeypatch.setattr(config, "PIPELINE_PARALLEL_BRANCHES", True)
+    Pipeline("messages", 4321, "correlation", Priority.USER).parallel(
+        [message_one], [message_failing]
+    ).then(message_two).enqueue()
+
+    with fallible_huey():
+        while huey.pending_count():
+            tasks.run_queued_tasks_and_enqueue_dependents()
+
+    assert executed == ["one"]
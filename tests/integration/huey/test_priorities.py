@@ -0,0 +1,62 @@
+from broker.pipelines.alb import (
+    queue_all_alb_provision_tasks_for_operation,
+    queue_all_alb_rebalance_tasks_for_operation,
+    queue_all_alb_renewal_tasks_for_operation,
+)
+from broker.tasks import cron
+from broker.tasks.cron import log_queue_depth_metrics
+from broker.tasks.huey import huey, queue_depths, requeue_legacy_tasks
+
+
+def test_user_operations_run_before_renewals_and_maintenance(clean_db):
+    queue_all_alb_rebalance_tasks_for_operation(1)
+    queue_all_alb_renewal_tasks_for_operation(2)
+    queue_all_alb_provision_tasks_for_operation(3, "correlation")
+
+    assert queue_depths() == {"maintenance": 1, "renewal": 1, "user": 1}
+    operation_ids = [huey.dequeue().args[0] for _ in range(3)]
+    assert operation_ids == [3, 2, 1]
+    assert queue_depths() == {"maintenance": 0, "renewal": 0, "user": 0}
+
+
+def test_pipelines_keep_their_priority(clean_db):
+    queue_all_alb_renewal_tasks_for_operation(2)
+
+    # each step queues the next at its own priority, see test_pipeline_messages
+    assert huey.dequeue().priority == 10
+
+
+def test_requeues_tasks_left_in_fifo_queue(clean_db):
+    queue_all_alb_renewal_tasks_for_operation(2)
+    # put it back the way it was queued before we had priorities
+    data = huey.storage.dequeue()
+    huey.storage.conn.lpush(huey.storage.queue_key, data)
+
+    requeue_legacy_tasks()
+
+    assert queue_depths() == {"maintenance": 0, "renewal": 1, "user": 0}
+    assert huey.dequeue().args[0] == 2
+
+
+def test_requeues_tasks_left_in_priority_queue(clean_db):
+    queue_all_alb_renewal_tasks_for_operation(2)
+    # put it back the way it was queued before we took turns between orgs
+    data = huey.storage.dequeue()
+    huey.storage.conn.zadd(huey.storage.queue_key, {b"\0" * 8 + data: -10})
+
+    requeue_legacy_tasks()
+
+    assert queue_depths() == {"maintenance": 0, "renewal": 1, "user": 0}
+    assert huey.dequeue().args[0] == 2
+
+
+def test_logs_queue_depth_metrics(clean_db, caplog, monkeypatch):
+    # alembic's fileConfig disables existing loggers when migrations run
+    monkeypatch.setattr(cron.logger, "disabled", False)
+    caplog.set_level("INFO")
+    queue_all_alb_provision_tasks_for_operation(3, "correlation")
+
+    log_queue_depth_metrics.call_local()
+
+    assert 'huey_queue_depth{priority="user"} 1' in caplog.text
+    assert 'huey_queue_depth{priority="renewal"} 0' in caplog.text
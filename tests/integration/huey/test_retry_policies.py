@@ -0,0 +1,193 @@
+import time
+
+import pytest
+
+from acme import messages
+from botocore.exceptions import ClientError, EndpointConnectionError
+from requests.exceptions import ConnectionError
+
+from broker.extensions import db
+from broker.models import Operation
+from broker.tasks.huey import (
+    ErrorClass,
+    RetryPolicy,
+    classify_error,
+    huey,
+    pipeline_operation,
+    retriable_task,
+)
+
+from tests.lib.factories import OperationFactory
+from tests.lib.tasks import fallible_huey
+
+failures = []
+
+
+@pipeline_operation(
+    "Failing with overrides",
+    retry_policies={ErrorClass.NOT_READY: RetryPolicy(delay=30)},
+)
+def failing_step(operation_id, *, operation, db, **kwargs):
+    raise failures.pop(0)
+
+
+def client_error(code, status=400):
+    return ClientError(
+        {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "SomeOperation",
+    )
+
+
+@retriable_task
+def failing_task(operation_id, **kwargs):
+    raise failures.pop(0)
+
+
+@pytest.mark.parametrize(
+    "exc,expected",
+    [
+        (client_error("Throttling"), ErrorClass.THROTTLE),
+        (client_error("PriorRequestNotComplete"), ErrorClass.THROTTLE),
+        (client_error("SomethingNew", 503), ErrorClass.TRANSIENT),
+        (EndpointConnectionError(endpoint_url="https://iam"), ErrorClass.TRANSIENT),
+        (ConnectionError(), ErrorClass.TRANSIENT),
+        (client_error("CertificateNotFound"), ErrorClass.NOT_READY),
+        (client_error("InvalidViewerCertificate"), ErrorClass.NOT_READY),
+        (client_error("DeleteConflict", 409), ErrorClass.NOT_READY),
+        (client_error("ValidationError"), ErrorClass.PERMANENT),
+        (messages.Error.with_code("serverInternal"), ErrorClass.TRANSIENT),
+        (messages.Error.with_code("rateLimited"), ErrorClass.QUOTA),
+        (messages.Error.with_code("malformed"), ErrorClass.PERMANENT),
+        (client_error("SomethingNew"), None),
+        (RuntimeError("oops"), None),
+    ],
+)
+def test_classifies_errors(exc, expected):
+    assert classify_error(exc) == expected
+
+
+def run(task):
+    with fallible_huey():
+        huey.execute(task)
+    [retry] = huey.scheduled()
+    huey.storage.flush_schedule()
+    # so it runs now instead of being scheduled again
+    retry.eta = None
+    return retry
+
+
+@pytest.fixture
+def operation(clean_db):
+    failures.clear()
+    operation = OperationFactory.create(id=4321)
+    clean_db.session.commit()
+    return operation
+
+
+def test_throttles_back_off_quickly_with_jitter(operation):
+    failures.extend([client_error("Throttling")] * 3)
+    task = failing_task.s(4321)
+    delays = []
+    for _ in range(3):
+        task = run(task)
+        delays.append(task.retry_delay)
+
+    assert 0 <= delays[0] <= 1
+    assert 0 <= delays[1] <= 2
+    assert 0 <= delays[2] <= 4
+    # and they don't use up the task's retries
+    assert task.retries == failing_task.task_class.default_retries
+
+
+def test_transient_errors_retry_in_seconds(operation):
+    failures.extend([client_error("InternalError", 500)] * 2)
+    task = run(failing_task.s(4321))
+    assert task.retry_delay == 5
+    assert run(task).retry_delay == 10
+
+
+def test_unclassified_errors_go_back_to_the_usual_delay(operation):
+    failures.extend([client_error("Throttling"), RuntimeError("oops")])
+    task = run(run(failing_task.s(4321)))
+    assert task.retry_delay == 10 * 60
+
+
+def test_permanent_errors_fail_the_operation(operation):
+    failures.append(client_error("ValidationError"))
+    with fallible_huey():
+        huey.execute(failing_task.s(4321))
+
+    assert huey.scheduled() == []
+    db.session.expunge_all()
+    assert db.session.get(Operation, 4321).state == Operation.States.FAILED.value
+
+
+def test_not_ready_errors_poll_without_using_up_retries(operation):
+    failures.extend([client_error("CertificateNotFound")] * 2)
+    task = run(run(failing_task.s(4321)))
+    assert task.retry_delay == 5 * 60
+    assert task.retries == failing_task.task_class.default_retries
+
+
+def test_quotas_wait_an_hour(operation):
+    failures.append(messages.Error.with_code("rateLimited"))
+    task = run(failing_task.s(4321))
+    assert task.retry_delay == 60 * 60
+    assert task.retries == failing_task.task_class.default_retries
+
+
+def test_unclassified_errors_use_up_retries(operation):
+    failures.extend([RuntimeError("oops")] * 2)
+    task = run(run(failing_task.s(4321)))
+    assert task.retries == failing_task.task_class.default_retries - 2
+
+
+@pytest.mark.parametrize(
+    "error,time_limit",
+    [
+        (client_error("Throttling"), 4 * 60 * 60),
+        (client_error("CertificateNotFound"), 4 * 60 * 60),
+        (messages.Error.with_code("rateLimited"), 24 * 60 * 60),
+    ],
+)
+def test_retries_give_up_after_their_time_limit(operation, error, time_limit):
+    failures.extend([error] * 2)
+    task = run(failing_task.s(4321))
+    huey.storage.conn.hset(
+        f"task:{task.id}:failures", "since", time.time() - time_limit
+    )
+    with fallible_huey():
+        huey.execute(task)
+
+    assert huey.scheduled() == []
+    db.session.expunge_all()
+    assert db.session.get(Operation, 4321).state == Operation.States.FAILED.value
+
+
+def test_other_errors_start_the_backoff_over(operation):
+    failures.extend(
+        [client_error("InternalError", 500)] * 2
+        + [client_error("CertificateNotFound"), client_error("InternalError", 500)]
+    )
+    task = run(run(failing_task.s(4321)))
+    assert task.retry_delay == 10
+    task = run(run(task))
+    assert task.retry_delay == 5
+
+
+def test_steps_can_override_one_policy_and_keep_the_rest(operation):
+    failures.extend(
+        [
+            client_error("CertificateNotFound"),
+            client_error("InternalError", 500),
+            client_error("ValidationError"),
+        ]
+    )
+    task = run(failing_step.s(4321))
+    assert task.retry_delay == 30
+    task = run(task)
+    assert task.retry_delay == 5
+
+    with fallible_huey():
+        huey.execute(task)
+    assert huey.scheduled() == []
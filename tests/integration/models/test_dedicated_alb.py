@@ -1,9 +1,9 @@
-import json
 import pytest
 
 from broker.extensions import config
 from broker.models import DedicatedALB
 from tests.lib import factories
+from tests.lib.cf import mock_organizations
 from tests.lib.tags import sort_instance_tags
 
 
@@ -13,22 +13,8 @@ def test_load_albs_raises_error():
 
 
 def test_load_albs_on_startup(clean_db, mock_with_uaa_auth, access_token):
-    response = json.dumps({"guid": "org1", "name": "org1-name"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/org1",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
-    )
-
-    response = json.dumps({"guid": "org2", "name": "org2-name"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/org2",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
+    mock_organizations(
+        mock_with_uaa_auth, access_token, {"org1": "org1-name", "org2": "org2-name"}
     )
 
     albs = DedicatedALB.query.all()
@@ -82,22 +68,8 @@ def test_load_albs_on_startup(clean_db, mock_with_uaa_auth, access_token):
 def test_load_albs_on_startup_doesnt_modify_assigned_org(
     clean_db, mock_with_uaa_auth, access_token
 ):
-    response = json.dumps({"guid": "org1", "name": "org1-name"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/org1",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
-    )
-
-    response = json.dumps({"guid": "org2", "name": "org2-name"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/org2",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
+    mock_organizations(
+        mock_with_uaa_auth, access_token, {"org1": "org1-name", "org2": "org2-name"}
     )
 
     listeners = DedicatedALB.query.all()
@@ -129,14 +101,7 @@ def test_load_albs_on_startup_doesnt_modify_assigned_org(
 def test_load_albs_doesnt_modify_assigned_waf(
     clean_db, mock_with_uaa_auth, access_token
 ):
-    response = json.dumps({"guid": "org1", "name": "org1-name"})
-    mock_with_uaa_auth.get(
-        f"http://mock.cf/v3/organizations/org1",
-        text=response,
-        request_headers={
-            "Authorization": f"Bearer {access_token}",
-        },
-    )
+    mock_organizations(mock_with_uaa_auth, access_token, {"org1": "org1-name"})
 
     dedicated_alb = factories.DedicatedALBFactory.create(
         alb_arn="alb-1", dedicated_org="org1", dedicated_waf_web_acl_arn="waf-arn-1"
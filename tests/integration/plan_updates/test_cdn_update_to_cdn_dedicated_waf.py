@@ -46,7 +46,6 @@ from tests.integration.cdn_dedicated_waf.provision import (
     subtest_provision_associate_health_check,
     subtest_provision_creates_health_check_alarms,
     subtest_provision_creates_sns_notification_topic,
-    subtest_provision_creates_ddos_detected_alarm,
     subtest_provision_subscribes_sns_notification_topic,
 )
 
@@ -145,9 +144,6 @@ def test_update_plan_only(
     subtest_provision_creates_health_check_alarms(
         tasks, cloudwatch_commercial, instance_model
     )
-    subtest_provision_creates_ddos_detected_alarm(
-        tasks, cloudwatch_commercial, instance_model
-    )
     subtest_update_marks_update_complete(tasks, instance_model)
 
 
@@ -223,9 +219,6 @@ def test_update_plan_and_domains(
     subtest_provision_creates_health_check_alarms(
         tasks, cloudwatch_commercial, instance_model
     )
-    subtest_provision_creates_ddos_detected_alarm(
-        tasks, cloudwatch_commercial, instance_model
-    )
     subtest_update_marks_update_complete(tasks, instance_model)
 
 
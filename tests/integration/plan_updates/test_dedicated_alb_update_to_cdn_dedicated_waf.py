@@ -39,7 +39,6 @@ from tests.integration.cdn_dedicated_waf.provision import (
     subtest_provision_creates_health_checks,
     subtest_provision_associate_health_check,
     subtest_provision_creates_health_check_alarms,
-    subtest_provision_creates_ddos_detected_alarm,
 )
 from tests.integration.dedicated_alb.test_dedicated_alb_provisioning import (
     subtest_provision_dedicated_alb_instance,
@@ -255,15 +254,6 @@ def test_update_dedicated_alb_to_cdn_dedicated_waf_happy_path(
         operation_id,
         "Creating Cloudwatch alarms for Route53 health checks",
     )
-    subtest_provision_creates_ddos_detected_alarm(
-        tasks,
-        cloudwatch_commercial,
-        instance_model,
-        service_instance_id=service_instance_id,
-    )
-    check_last_operation_description(
-        client, service_instance_id, operation_id, "Creating DDoS detection alarm"
-    )
     subtest_migrate_removes_certificate_from_alb(
         tasks, alb, instance_model, service_instance_id=service_instance_id
     )
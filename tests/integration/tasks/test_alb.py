@@ -1,14 +1,28 @@
+import datetime
 import pytest
 import uuid
 
+from botocore.exceptions import ClientError
+from huey.exceptions import RetryTask
+
+from sqlalchemy import select
+
+from broker.extensions import config
+from broker.models import ALBListener, ALBServiceInstance, Operation
 from tests.lib.factories import (
+    ALBListenerFactory,
     ALBServiceInstanceFactory,
     DedicatedALBServiceInstanceFactory,
     CertificateFactory,
     OperationFactory,
 )
 
-from broker.tasks.alb import remove_certificate_from_previous_alb
+from broker.tasks.alb import (
+    add_certificate_to_alb,
+    remove_certificate_from_alb,
+    remove_certificate_from_previous_alb,
+    remove_certificate_from_previous_alb_during_update_to_dedicated,
+)
 
 
 @pytest.fixture
@@ -125,3 +139,143 @@ def test_remove_certificate_from_previous_alb_gives_up_after_max_retries(
         remove_certificate_from_previous_alb.call_local(operation_id)
 
     alb.assert_no_pending_responses()
+
+
+@pytest.mark.parametrize("reserved", [False, True])
+def test_remove_certificate_from_alb_frees_listener_capacity(
+    clean_db, alb, service_instance_id, operation_id, reserved
+):
+    ALBListenerFactory.create(listener_arn="listener-arn-0", certificate_count=3)
+    service_instance = ALBServiceInstanceFactory.create(
+        id=service_instance_id,
+        domain_names=["example.com"],
+        alb_arn="alb-listener-arn-0",
+        alb_listener_arn="listener-arn-0",
+        # provisioning stopped before the certificate was added to the listener
+        reserved_alb_listener_arn="listener-arn-0" if reserved else None,
+    )
+    certificate = CertificateFactory.create(
+        service_instance=service_instance,
+        iam_server_certificate_arn="certificate-arn",
+        private_key_pem="SOMEPRIVATEKEY",
+    )
+    service_instance.current_certificate = certificate
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+    OperationFactory.create(id=operation_id, service_instance=service_instance)
+    alb.expect_remove_certificate_from_listener("listener-arn-0", "certificate-arn")
+
+    remove_certificate_from_alb.call_local(operation_id)
+
+    alb.assert_no_pending_responses()
+    clean_db.session.expunge_all()
+    certificate_count = clean_db.session.scalars(
+        select(ALBListener.certificate_count)
+    ).one()
+    assert certificate_count == 2
+
+
+def test_waits_for_overlap_without_blocking(
+    clean_db, alb, service_instance_id, operation_id, monkeypatch
+):
+    monkeypatch.setattr(config, "ALB_OVERLAP_SLEEP_TIME", 900)
+    service_instance = DedicatedALBServiceInstanceFactory.create(
+        id=service_instance_id,
+        domain_names=["example.com"],
+        alb_listener_arn="listener-arn-1",
+        previous_alb_listener_arn="listener-arn-0",
+    )
+    certificate = CertificateFactory.create(
+        service_instance=service_instance,
+        iam_server_certificate_arn="certificate-arn",
+        private_key_pem="SOMEPRIVATEKEY",
+    )
+    service_instance.current_certificate = certificate
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+    OperationFactory.create(id=operation_id, service_instance=service_instance)
+
+    # the overlap hasn't passed, so huey is asked to run the task again later
+    with pytest.raises(RetryTask) as retry:
+        remove_certificate_from_previous_alb_during_update_to_dedicated.call_local(
+            operation_id
+        )
+    assert 890 < retry.value.delay <= 900
+    clean_db.session.expunge_all()
+    operation = clean_db.session.get(Operation, operation_id)
+    assert operation.resume_at is not None
+
+    # run it again once the overlap has passed
+    operation.resume_at = datetime.datetime.now(
+        datetime.timezone.utc
+    ) - datetime.timedelta(seconds=1)
+    clean_db.session.commit()
+    alb.expect_remove_certificate_from_listener("listener-arn-0", "certificate-arn")
+
+    remove_certificate_from_previous_alb_during_update_to_dedicated.call_local(
+        operation_id
+    )
+
+    alb.assert_no_pending_responses()
+    clean_db.session.expunge_all()
+    assert clean_db.session.get(Operation, operation_id).resume_at is None
+
+
+def _new_certificate_instance(clean_db, service_instance_id, operation_id):
+    ALBListenerFactory.create(listener_arn="listener-arn-0", certificate_count=1)
+    service_instance = ALBServiceInstanceFactory.create(
+        id=service_instance_id,
+        domain_names=["example.com"],
+        alb_arn="alb-listener-arn-0",
+        alb_listener_arn="listener-arn-0",
+        reserved_alb_listener_arn="listener-arn-0",
+    )
+    certificate = CertificateFactory.create(
+        service_instance=service_instance,
+        iam_server_certificate_arn="certificate-arn",
+        private_key_pem="SOMEPRIVATEKEY",
+    )
+    service_instance.new_certificate = certificate
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+    OperationFactory.create(id=operation_id, service_instance=service_instance)
+
+
+def test_add_certificate_waits_for_iam_propagation(
+    clean_db, alb, service_instance_id, operation_id, monkeypatch
+):
+    monkeypatch.setattr(config, "IAM_CERTIFICATE_PROPAGATION_TIME", 30)
+    _new_certificate_instance(clean_db, service_instance_id, operation_id)
+    # the certificate we just uploaded isn't visible to the load balancer yet
+    alb.expect_add_certificate_to_listener_not_found(
+        "listener-arn-0", "certificate-arn"
+    )
+    alb.expect_add_certificate_to_listener_not_found(
+        "listener-arn-0", "certificate-arn"
+    )
+    alb.expect_add_certificate_to_listener("listener-arn-0", "certificate-arn")
+
+    add_certificate_to_alb.call_local(operation_id)
+
+    alb.assert_no_pending_responses()
+    clean_db.session.expunge_all()
+    service_instance = clean_db.session.get(ALBServiceInstance, service_instance_id)
+    assert service_instance.new_certificate is None
+    assert service_instance.current_certificate.iam_server_certificate_arn == (
+        "certificate-arn"
+    )
+
+
+def test_add_certificate_gives_up_waiting_for_iam_propagation(
+    clean_db, alb, service_instance_id, operation_id
+):
+    # the test config doesn't wait at all
+    _new_certificate_instance(clean_db, service_instance_id, operation_id)
+    alb.expect_add_certificate_to_listener_not_found(
+        "listener-arn-0", "certificate-arn"
+    )
+
+    with pytest.raises(ClientError):
+        add_certificate_to_alb.call_local(operation_id)
+
+    alb.assert_no_pending_responses()
@@ -0,0 +1,110 @@
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+from broker.lib.circuit_breaker import CircuitBreaker, CircuitOpen
+from broker.tasks.huey import huey, nonretriable_task
+
+from tests.lib.tasks import fallible_huey
+
+
+@pytest.fixture
+def breaker(clean_redis):
+    return CircuitBreaker(
+        clean_redis, "commercial", "cloudfront", error_rate=0.5, min_calls=4
+    )
+
+
+@pytest.fixture
+def cloudfront(breaker):
+    client = boto3.Session(
+        region_name="us-east-1",
+        aws_access_key_id="fake",
+        aws_secret_access_key="fake",
+    ).client("cloudfront")
+    breaker.watch(client)
+    with Stubber(client) as stubber:
+        yield client, stubber
+
+
+def call(cloudfront, status=200):
+    client, stubber = cloudfront
+    if status >= 300:
+        stubber.add_client_error(
+            "get_distribution", "ServiceUnavailable", http_status_code=status
+        )
+    else:
+        stubber.add_response("get_distribution", {}, {"Id": "distribution"})
+    try:
+        client.get_distribution(Id="distribution")
+    except ClientError:
+        pass
+
+
+def test_opens_once_enough_calls_fail(breaker, cloudfront):
+    call(cloudfront)
+    call(cloudfront, 503)
+    call(cloudfront)
+    breaker.allow()
+
+    call(cloudfront, 503)
+    with pytest.raises(CircuitOpen) as e:
+        breaker.allow()
+    assert 59 < e.value.retry_after <= 60
+    with pytest.raises(CircuitOpen):
+        call(cloudfront)
+
+
+def test_client_errors_do_not_count(breaker, cloudfront):
+    for _ in range(4):
+        call(cloudfront, 404)
+
+    assert breaker.allow() is False
+
+
+def test_half_open_breakers_let_one_probe_through(breaker, cloudfront, clean_redis):
+    for _ in range(4):
+        call(cloudfront, 503)
+    # skip the cool down
+    clean_redis.delete("circuit:commercial:cloudfront.open")
+
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_failed_probes_open_the_breaker_again(breaker, cloudfront, clean_redis):
+    for _ in range(4):
+        call(cloudfront, 503)
+    clean_redis.delete("circuit:commercial:cloudfront.open")
+
+    call(cloudfront, 503)
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_successful_probes_close_the_breaker(breaker, cloudfront, clean_redis):
+    for _ in range(4):
+        call(cloudfront, 503)
+    clean_redis.delete("circuit:commercial:cloudfront.open")
+
+    call(cloudfront)
+    assert breaker.allow() is False
+    # and it starts counting from scratch
+    call(cloudfront, 503)
+    assert breaker.allow() is False
+
+
+def test_tasks_wait_for_open_circuits_without_using_retries(clean_redis):
+    @nonretriable_task
+    def needs_cloudfront(operation_id):
+        raise CircuitOpen("commercial:cloudfront", 30)
+
+    task = needs_cloudfront.s(1234)
+    with fallible_huey():
+        huey.execute(task)
+
+    [deferred] = huey.scheduled()
+    assert deferred.id == task.id
+    assert deferred.retries == 0
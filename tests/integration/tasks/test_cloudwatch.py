@@ -73,6 +73,24 @@ def service_instance(
     return service_instance
 
 
+def expect_put_alarms(cloudwatch_commercial, service_instance, health_checks):
+    """expect the health check alarms, then the DDoS alarm, and return their names"""
+    alarm_names = []
+    for health_check in health_checks:
+        health_check_id = health_check["health_check_id"]
+        alarm_name = f"{config.AWS_RESOURCE_PREFIX}-{health_check_id}"
+        cloudwatch_commercial.expect_put_metric_alarm(
+            health_check_id, alarm_name, service_instance
+        )
+        alarm_names.append(alarm_name)
+    ddos_alarm_name = generate_ddos_alarm_name(service_instance.id)
+    cloudwatch_commercial.expect_put_ddos_detected_alarm(
+        ddos_alarm_name, service_instance, service_instance.sns_notification_topic_arn
+    )
+    alarm_names.append(ddos_alarm_name)
+    return alarm_names
+
+
 def test_create_health_check_alarms(
     clean_db,
     service_instance_id,
@@ -80,23 +98,20 @@ def test_create_health_check_alarms(
     operation_id,
     cloudwatch_commercial,
 ):
-    expected_health_check_alarms = []
-    for health_check in service_instance.route53_health_checks:
-        health_check_id = health_check["health_check_id"]
-        alarm_name = f"{config.AWS_RESOURCE_PREFIX}-{health_check_id}"
-
-        cloudwatch_commercial.expect_put_metric_alarm(
-            health_check_id, alarm_name, service_instance
-        )
-        cloudwatch_commercial.expect_describe_alarms(
-            alarm_name, [{"AlarmArn": f"{health_check_id} ARN"}]
-        )
-        expected_health_check_alarms.append(
-            {
-                "alarm_name": alarm_name,
-                "health_check_id": health_check_id,
-            }
-        )
+    alarm_names = expect_put_alarms(
+        cloudwatch_commercial, service_instance, service_instance.route53_health_checks
+    )
+    # one check for all of the alarms
+    cloudwatch_commercial.expect_describe_alarms(
+        alarm_names, [{"AlarmArn": f"{name} ARN"} for name in alarm_names]
+    )
+    expected_health_check_alarms = [
+        {
+            "alarm_name": f"{config.AWS_RESOURCE_PREFIX}-{check['health_check_id']}",
+            "health_check_id": check["health_check_id"],
+        }
+        for check in service_instance.route53_health_checks
+    ]
 
     create_health_check_alarms.call_local(operation_id)
 
@@ -117,6 +132,47 @@ def test_create_health_check_alarms(
     assert (
         service_instance.cloudwatch_health_check_alarms == expected_health_check_alarms
     )
+    assert (
+        service_instance.ddos_detected_cloudwatch_alarm_name
+        == generate_ddos_alarm_name(service_instance_id)
+    )
+
+
+def test_create_health_check_alarms_ddos_alarm_already_exists(
+    clean_db,
+    service_instance_id,
+    service_instance,
+    operation_id,
+    cloudwatch_commercial,
+):
+    service_instance.ddos_detected_cloudwatch_alarm_name = "fake-alarm"
+    clean_db.session.add(service_instance)
+    clean_db.session.commit()
+
+    alarm_names = []
+    for health_check in service_instance.route53_health_checks:
+        health_check_id = health_check["health_check_id"]
+        alarm_name = f"{config.AWS_RESOURCE_PREFIX}-{health_check_id}"
+        cloudwatch_commercial.expect_put_metric_alarm(
+            health_check_id, alarm_name, service_instance
+        )
+        alarm_names.append(alarm_name)
+    cloudwatch_commercial.expect_describe_alarms(
+        alarm_names, [{"AlarmArn": f"{name} ARN"} for name in alarm_names]
+    )
+
+    create_health_check_alarms.call_local(operation_id)
+
+    cloudwatch_commercial.assert_no_pending_responses()
+
+    clean_db.session.expunge_all()
+
+    service_instance = clean_db.session.get(
+        CDNDedicatedWAFServiceInstance,
+        service_instance_id,
+    )
+    assert len(service_instance.cloudwatch_health_check_alarms) == 2
+    assert service_instance.ddos_detected_cloudwatch_alarm_name == "fake-alarm"
 
 
 def test_create_health_check_alarms_unmigrated_cdn_instance(
@@ -139,23 +195,19 @@ def test_create_health_check_alarms_unmigrated_cdn_instance(
     clean_db.session.add(service_instance)
     clean_db.session.commit()
 
-    expected_health_check_alarms = []
-    for health_check in route53_health_checks:
-        health_check_id = health_check["health_check_id"]
-        alarm_name = f"{config.AWS_RESOURCE_PREFIX}-{health_check_id}"
-
-        cloudwatch_commercial.expect_put_metric_alarm(
-            health_check_id, alarm_name, service_instance
-        )
-        cloudwatch_commercial.expect_describe_alarms(
-            alarm_name, [{"AlarmArn": f"{health_check_id} ARN"}]
-        )
-        expected_health_check_alarms.append(
-            {
-                "alarm_name": alarm_name,
-                "health_check_id": health_check_id,
-            }
-        )
+    alarm_names = expect_put_alarms(
+        cloudwatch_commercial, service_instance, route53_health_checks
+    )
+    cloudwatch_commercial.expect_describe_alarms(
+        alarm_names, [{"AlarmArn": f"{name} ARN"} for name in alarm_names]
+    )
+    expected_health_check_alarms = [
+        {
+            "alarm_name": f"{config.AWS_RESOURCE_PREFIX}-{check['health_check_id']}",
+            "health_check_id": check["health_check_id"],
+        }
+        for check in route53_health_checks
+    ]
 
     create_health_check_alarms.call_local(unmigrated_cdn_service_instance_operation_id)
 
@@ -180,42 +232,16 @@ def test_create_health_check_alarm_waits(
     operation_id,
     cloudwatch_commercial,
 ):
-    expected_health_check_alarms = []
-
-    health_check_id = service_instance.route53_health_checks[0]["health_check_id"]
-    alarm_name = f"{config.AWS_RESOURCE_PREFIX}-{health_check_id}"
-    expected_health_check_alarms.append(
-        {
-            "alarm_name": alarm_name,
-            "health_check_id": health_check_id,
-        }
+    alarm_names = expect_put_alarms(
+        cloudwatch_commercial, service_instance, service_instance.route53_health_checks
     )
-
-    cloudwatch_commercial.expect_put_metric_alarm(
-        health_check_id, alarm_name, service_instance
-    )
-    # waiting for alarm to exist
-    cloudwatch_commercial.expect_describe_alarms(alarm_name, [])
-    cloudwatch_commercial.expect_describe_alarms(alarm_name, [])
+    # waiting for all the alarms to exist
+    cloudwatch_commercial.expect_describe_alarms(alarm_names, [])
     cloudwatch_commercial.expect_describe_alarms(
-        alarm_name, [{"AlarmArn": f"{health_check_id} ARN"}]
+        alarm_names, [{"AlarmArn": f"{alarm_names[0]} ARN"}]
     )
-
-    health_check_id = service_instance.route53_health_checks[1]["health_check_id"]
-    alarm_name = f"{config.AWS_RESOURCE_PREFIX}-{health_check_id}"
-    expected_health_check_alarms.append(
-        {
-            "alarm_name": alarm_name,
-            "health_check_id": health_check_id,
-        }
-    )
-
-    cloudwatch_commercial.expect_put_metric_alarm(
-        health_check_id, alarm_name, service_instance
-    )
-    # waiting for alarm to exist
     cloudwatch_commercial.expect_describe_alarms(
-        alarm_name, [{"AlarmArn": f"{health_check_id} ARN"}]
+        alarm_names, [{"AlarmArn": f"{name} ARN"} for name in alarm_names]
     )
 
     create_health_check_alarms.call_local(operation_id)
@@ -229,9 +255,7 @@ def test_create_health_check_alarm_waits(
         CDNDedicatedWAFServiceInstance,
         service_instance_id,
     )
-    assert (
-        service_instance.cloudwatch_health_check_alarms == expected_health_check_alarms
-    )
+    assert len(service_instance.cloudwatch_health_check_alarms) == 2
 
 
 def test_create_health_check_alarm_error_if_alarm_not_found(
@@ -239,15 +263,14 @@ def test_create_health_check_alarm_error_if_alarm_not_found(
     operation_id,
     cloudwatch_commercial,
 ):
-    health_check_id = service_instance.route53_health_checks[0]["health_check_id"]
-    alarm_name = f"{config.AWS_RESOURCE_PREFIX}-{health_check_id}"
-
-    cloudwatch_commercial.expect_put_metric_alarm(
-        health_check_id, alarm_name, service_instance
+    alarm_names = expect_put_alarms(
+        cloudwatch_commercial, service_instance, service_instance.route53_health_checks
     )
-    # waiting for alarm to exist
+    # waiting for alarms to exist
     for i in list(range(config.AWS_POLL_MAX_ATTEMPTS)):
-        cloudwatch_commercial.expect_describe_alarms(alarm_name, [])
+        cloudwatch_commercial.expect_describe_alarms(
+            alarm_names, [{"AlarmArn": f"{alarm_names[0]} ARN"}]
+        )
 
     with pytest.raises(WaiterError):
         create_health_check_alarms.call_local(operation_id)
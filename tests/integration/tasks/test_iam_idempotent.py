@@ -2,6 +2,7 @@ from datetime import date
 
 import pytest
 
+from broker.extensions import config
 from broker.lib.cdn import is_cdn_instance
 from broker.tasks.iam import (
     upload_server_certificate,
@@ -336,6 +337,38 @@ def test_delete_previous_server_certificate_happy_path(
     assert not certificate
 
 
+@pytest.mark.parametrize(
+    "instance_factory",
+    [
+        factories.ALBServiceInstanceFactory,
+        factories.DedicatedALBServiceInstanceFactory,
+    ],
+)
+def test_delete_previous_server_certificate_waits_for_detachment(
+    clean_db,
+    iam,
+    service_instance_without_new_cert,
+    operation_id,
+    new_cert_id,
+    monkeypatch,
+):
+    monkeypatch.setattr(config, "IAM_CERTIFICATE_PROPAGATION_TIME", 30)
+    name = get_server_certificate_name(
+        service_instance_without_new_cert.id, new_cert_id
+    )
+    iam.expect_get_server_certificate(name)
+    # the load balancer hasn't let go of the certificate yet
+    iam.expects_delete_server_certificate_delete_conflict(name)
+    iam.expects_delete_server_certificate(name)
+
+    delete_previous_server_certificate.call_local(operation_id)
+
+    iam.assert_no_pending_responses()
+
+    clean_db.session.expunge_all()
+    assert not clean_db.session.get(Certificate, new_cert_id)
+
+
 @pytest.mark.parametrize(
     "instance_factory",
     [
@@ -0,0 +1,129 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from broker.lib import rate_limit
+from broker.lib.rate_limit import RateLimiter, RateLimitExceeded
+from broker.tasks.huey import huey, nonretriable_task
+
+from tests.lib.tasks import fallible_huey
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(rate_limit.time, "sleep", sleeps.append)
+    return sleeps
+
+
+@pytest.fixture
+def limiter(clean_redis):
+    return RateLimiter(
+        clean_redis,
+        "commercial",
+        {"route-53.ChangeResourceRecordSets": 2},
+        max_wait=1,
+    )
+
+
+def test_calls_within_the_rate_go_straight_through(limiter, sleeps):
+    limiter.wait("route-53", "ChangeResourceRecordSets")
+    limiter.wait("route-53", "ChangeResourceRecordSets")
+
+    assert sleeps == []
+
+
+def test_calls_over_the_rate_wait_their_turn(limiter, sleeps):
+    for _ in range(4):
+        limiter.wait("route-53", "ChangeResourceRecordSets")
+
+    assert len(sleeps) == 2
+    assert 0.4 < sleeps[0] <= 0.5
+    assert 0.9 < sleeps[1] <= 1
+
+
+def test_calls_that_would_wait_too_long_are_refused(limiter, sleeps):
+    for _ in range(4):
+        limiter.wait("route-53", "ChangeResourceRecordSets")
+
+    with pytest.raises(RateLimitExceeded) as e:
+        limiter.wait("route-53", "ChangeResourceRecordSets")
+    assert 1 < e.value.retry_after <= 1.5
+    assert len(sleeps) == 2
+
+
+def test_long_waits_are_not_spent_sleeping(clean_redis, sleeps):
+    limiter = RateLimiter(
+        clean_redis, "commercial", {"route-53.ChangeResourceRecordSets": 0.1}
+    )
+    limiter.wait("route-53", "ChangeResourceRecordSets")
+
+    with pytest.raises(RateLimitExceeded) as e:
+        limiter.wait("route-53", "ChangeResourceRecordSets")
+    assert 9 < e.value.retry_after <= 10
+    assert sleeps == []
+
+
+def test_buckets_are_per_account_and_operation(limiter, sleeps, clean_redis):
+    govcloud = RateLimiter(
+        clean_redis, "govcloud", {"route-53.ChangeResourceRecordSets": 2}
+    )
+    for _ in range(2):
+        limiter.wait("route-53", "ChangeResourceRecordSets")
+        govcloud.wait("route-53", "ChangeResourceRecordSets")
+        limiter.wait("route-53", "GetChange")
+
+    assert sleeps == []
+
+
+def test_limits_calls_from_the_client(limiter, sleeps):
+    client = boto3.Session(
+        region_name="us-east-1",
+        aws_access_key_id="fake",
+        aws_secret_access_key="fake",
+    ).client("route53")
+    limiter.watch(client)
+    change_batch = {
+        "Changes": [
+            {
+                "Action": "UPSERT",
+                "ResourceRecordSet": {
+                    "Name": "example.com",
+                    "Type": "TXT",
+                    "TTL": 60,
+                    "ResourceRecords": [{"Value": '"txt"'}],
+                },
+            }
+        ]
+    }
+    with Stubber(client) as stubber:
+        for _ in range(3):
+            stubber.add_response(
+                "change_resource_record_sets",
+                {
+                    "ChangeInfo": {
+                        "Id": "change",
+                        "Status": "PENDING",
+                        "SubmittedAt": "2024-01-01T00:00:00Z",
+                    }
+                },
+            )
+            client.change_resource_record_sets(
+                HostedZoneId="zone", ChangeBatch=change_batch
+            )
+
+    assert len(sleeps) == 1
+
+
+def test_tasks_over_the_rate_are_deferred_without_using_retries(clean_redis):
+    @nonretriable_task
+    def busy_route53(operation_id):
+        raise RateLimitExceeded("commercial:route-53.ChangeResourceRecordSets", 5)
+
+    task = busy_route53.s(1234)
+    with fallible_huey():
+        huey.execute(task)
+
+    [deferred] = huey.scheduled()
+    assert deferred.id == task.id
+    assert deferred.retries == 0
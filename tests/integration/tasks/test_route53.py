@@ -1,4 +1,5 @@
 import pytest
+from botocore.exceptions import ClientError
 from sqlalchemy import insert
 
 from broker.tasks.route53 import (
@@ -158,6 +159,52 @@ def test_route53_create_new_health_checks_idempotent(
     route53.assert_no_pending_responses()
 
 
+def test_route53_create_new_health_checks_saves_nothing_on_error(
+    clean_db,
+    service_instance_id,
+    service_instance,
+    operation_id,
+    route53,
+):
+    route53.expect_create_health_check(service_instance_id, "example.com", 0)
+    route53.expect_create_health_check_error(service_instance_id, "foo.com", 1)
+
+    with pytest.raises(ClientError):
+        create_new_health_checks.call_local(operation_id)
+
+    route53.assert_no_pending_responses()
+
+    clean_db.session.expunge_all()
+    service_instance = clean_db.session.get(
+        CDNDedicatedWAFServiceInstance, service_instance_id
+    )
+    assert not service_instance.route53_health_checks
+
+    # the retry uses the same caller references, so route53 returns the check it
+    # already created
+    for idx, domain_name in enumerate(service_instance.domain_names):
+        route53.expect_create_health_check(service_instance_id, domain_name, idx)
+
+    create_new_health_checks.call_local(operation_id)
+
+    route53.assert_no_pending_responses()
+
+    clean_db.session.expunge_all()
+    service_instance = clean_db.session.get(
+        CDNDedicatedWAFServiceInstance, service_instance_id
+    )
+    assert service_instance.route53_health_checks == [
+        {
+            "domain_name": "example.com",
+            "health_check_id": "example.com ID",
+        },
+        {
+            "domain_name": "foo.com",
+            "health_check_id": "foo.com ID",
+        },
+    ]
+
+
 def test_route53_create_new_health_checks_unmigrated_cdn_instance(
     clean_db,
     route53,
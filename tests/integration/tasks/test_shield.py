@@ -1,8 +1,12 @@
+import uuid
+
 import pytest
+from botocore.exceptions import ClientError
 
 from broker.tasks.shield import (
     associate_health_check,
     disassociate_health_check,
+    shield_protections,
     update_associated_health_check,
 )
 from broker.models import CDNDedicatedWAFServiceInstance, Operation
@@ -74,7 +78,7 @@ def test_shield_associate_health_check(
     operation_id,
     shield,
 ):
-    shield.expect_list_protections([protection])
+    shield.expect_describe_protection(protection)
     shield.expect_associate_health_check(protection_id, "example.com ID")
 
     associate_health_check.call_local(operation_id)
@@ -94,6 +98,62 @@ def test_shield_associate_health_check(
     assert operation.step_description == "Associating health check with Shield"
 
 
+def test_shield_associate_health_check_uses_cached_protection(
+    clean_db,
+    protection_id,
+    protection,
+    service_instance,
+    operation_id,
+    shield,
+):
+    shield.expect_list_protections([protection])
+    shield_protections.refresh()
+    shield.expect_associate_health_check(protection_id, "example.com ID")
+
+    associate_health_check.call_local(operation_id)
+
+    shield.assert_no_pending_responses()
+
+
+def test_shield_associate_health_check_forgets_replaced_protection(
+    clean_db,
+    protection_id,
+    protection,
+    service_instance,
+    operation_id,
+    shield,
+    cloudfront_distribution_arn,
+):
+    shield.expect_describe_protection(protection)
+    shield.expect_associate_health_check_not_found(protection_id, "example.com ID")
+
+    with pytest.raises(ClientError):
+        associate_health_check.call_local(operation_id)
+
+    new_protection_id = str(uuid.uuid4())
+    new_protection = {
+        "Id": new_protection_id,
+        "ResourceArn": cloudfront_distribution_arn,
+    }
+    shield.expect_describe_protection(new_protection)
+    shield.expect_associate_health_check(new_protection_id, "example.com ID")
+
+    associate_health_check.call_local(operation_id)
+
+    shield.assert_no_pending_responses()
+
+
+def test_shield_associate_health_check_without_protection(
+    clean_db, service_instance, operation_id, shield, cloudfront_distribution_arn
+):
+    shield.expect_describe_protection_not_found(cloudfront_distribution_arn)
+
+    with pytest.raises(Exception, match="Could not find Shield protection"):
+        associate_health_check.call_local(operation_id)
+
+    shield.assert_no_pending_responses()
+
+
 def test_shield_associate_health_check_unmigrated_cdn_instance(
     clean_db,
     protection_id,
@@ -115,7 +175,7 @@ def test_shield_associate_health_check_unmigrated_cdn_instance(
     clean_db.session.commit()
     clean_db.session.expunge_all()
 
-    shield.expect_list_protections([protection])
+    shield.expect_describe_protection(protection)
     shield.expect_associate_health_check(protection_id, "example.com ID")
 
     associate_health_check.call_local(unmigrated_cdn_service_instance_operation_id)
@@ -148,7 +208,7 @@ def test_shield_update_no_existing_associated_health_check(
     clean_db.session.commit()
     clean_db.session.expunge_all()
 
-    shield.expect_list_protections([protection])
+    shield.expect_describe_protection(protection)
     shield.expect_associate_health_check(protection_id, "example.com ID")
 
     update_associated_health_check.call_local(operation_id)
@@ -240,7 +300,7 @@ def test_shield_update_change_associated_health_check(
     clean_db.session.expunge_all()
 
     shield.expect_disassociate_health_check(protection_id, "example.com ID")
-    shield.expect_list_protections([protection])
+    shield.expect_describe_protection(protection)
     shield.expect_associate_health_check(protection_id, "bar.com ID")
 
     update_associated_health_check.call_local(operation_id)
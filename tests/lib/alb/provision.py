@@ -98,8 +98,6 @@ def subtest_provision_creates_provision_operation(
             {"Key": "Instance GUID", "Value": service_instance_id},
             {"Key": "Organization GUID", "Value": organization_guid},
             {"Key": "Space GUID", "Value": space_guid},
-            {"Key": "Space name", "Value": "space-1234"},
-            {"Key": "Organization name", "Value": "org-1234"},
         ]
     )
 
@@ -12,6 +12,7 @@ from broker.models import (
 from tests.lib.cf import provision_instance_with_mocks
 from tests.lib.client import check_last_operation_description
 from tests.lib.provision import (
+    subtest_provision_adds_names_to_tags,
     subtest_provision_creates_LE_user,
     subtest_provision_creates_private_key_and_csr,
     subtest_provision_initiates_LE_challenge,
@@ -43,6 +44,12 @@ def subtest_provision_cdn_instance(
         instance_model,
     )
     check_last_operation_description(client, "4321", operation_id, "Queuing tasks")
+    subtest_provision_adds_names_to_tags(
+        tasks, instance_model, organization_guid, space_guid
+    )
+    check_last_operation_description(
+        client, "4321", operation_id, "Looking up space and organization names"
+    )
     subtest_provision_creates_LE_user(tasks, instance_model)
     check_last_operation_description(
         client, "4321", operation_id, "Registering user for Lets Encrypt"
@@ -164,8 +171,6 @@ def subtest_provision_creates_provision_operation(
             {"Key": "Instance GUID", "Value": "4321"},
             {"Key": "Organization GUID", "Value": organization_guid},
             {"Key": "Space GUID", "Value": space_guid},
-            {"Key": "Space name", "Value": "space-1234"},
-            {"Key": "Organization name", "Value": "org-1234"},
         ]
     )
 
@@ -4,6 +4,8 @@ import uuid
 import json
 import base64
 
+from contextlib import contextmanager
+
 from requests import Response
 
 from broker.extensions import config
@@ -22,6 +24,28 @@ def match_uaa_basic_auth(request):
     return None
 
 
+def mock_organizations(mocker, access_token, organization_names: dict[str, str]):
+    """answer lookups of many organizations by guid, with the given names"""
+
+    def organizations(request, context):
+        guids = request.qs["guids"][0].split(",")
+        return {
+            "resources": [
+                {"guid": guid, "name": organization_names[guid]}
+                for guid in guids
+                if guid in organization_names
+            ]
+        }
+
+    mocker.get(
+        "http://mock.cf/v3/organizations",
+        json=organizations,
+        request_headers={
+            "Authorization": f"Bearer {access_token}",
+        },
+    )
+
+
 @pytest.fixture(scope="function")
 def space_guid():
     return str(uuid.uuid4())
@@ -83,9 +107,9 @@ def mocked_cf_api(access_token, organization_guid, space_guid, mock_with_uaa_aut
     yield mock_with_uaa_auth
 
 
-def provision_instance_with_mocks(
-    client, instance_model, organization_guid, space_guid, **kwargs
-):
+@contextmanager
+def mock_cf_api(organization_guid, space_guid):
+    """answer the space and organization name lookups made while tagging"""
     access_token = generate_access_token()
     access_token_response = generate_access_token_response(access_token)
 
@@ -112,7 +136,13 @@ def provision_instance_with_mocks(
                 "Authorization": f"Bearer {access_token}",
             },
         )
+        yield m
 
+
+def provision_instance_with_mocks(
+    client, instance_model, organization_guid, space_guid, **kwargs
+):
+    with mock_cf_api(organization_guid, space_guid):
         id = kwargs.get("id", "4321")
         params = kwargs.get("params", {})
 
@@ -442,15 +442,19 @@ def app():
 
 
 @pytest.fixture(scope="function")
-def clean_db(app):
+def clean_redis():
+    print("Clearing Redis")
+    huey.storage.conn.flushall()
+    return huey.storage.conn
+
+
+@pytest.fixture(scope="function")
+def clean_db(app, clean_redis):
     """
     get a db with schema and no contents. Remove contents and restore schema when done
     Note that this pushes an app context, which can hide problems with missing contexts
 
     """
-    print("Clearing Redis")
-    huey.storage.conn.flushall()
-
     yield db
     print("Recreating tables")
     db.session.remove()
@@ -4,6 +4,7 @@ from factory.alchemy import SQLAlchemyModelFactory
 from broker.extensions import db
 from broker.models import (
     ACMEUser,
+    ALBListener,
     Certificate,
     Challenge,
     Operation,
@@ -67,6 +68,15 @@ class DedicatedALBListenerFactory(BaseFactory):
     id = Sequence(lambda n: "UUID {}".format(n))
 
 
+class ALBListenerFactory(BaseFactory):
+    class Meta(object):
+        model = ALBListener
+
+    alb_arn = LazyAttribute(lambda o: f"alb-{o.listener_arn}")
+    dns_name = "alb.cloud.test"
+    canonical_hosted_zone_id = "ALBHOSTEDZONEID"
+
+
 class MigrationServiceInstanceFactory(BaseFactory):
     class Meta(object):
         model = MigrationServiceInstance
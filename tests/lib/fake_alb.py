@@ -6,7 +6,7 @@ from tests.lib.fake_aws import FakeAWS
 
 
 class FakeALB(FakeAWS):
-    def expect_get_listeners(self, listener_arn, alb_arn):
+    def expect_describe_listeners(self, listener_alb_map: dict[str, str]):
         certificates = [{"CertificateArn": "certificate-arn", "IsDefault": True}]
         self.stubber.add_response(
             "describe_listeners",
@@ -33,10 +33,29 @@ class FakeALB(FakeAWS):
                             }
                         ],
                     }
+                    for listener_arn, alb_arn in listener_alb_map.items()
                 ],
                 "NextMarker": "string",
             },
-            {"ListenerArns": [listener_arn]},
+            {"ListenerArns": list(listener_alb_map)},
+        )
+
+    def expect_index_listeners(
+        self,
+        listeners: dict[str, tuple[str, int]],
+        returned_domain: str = "alb.cloud.test",
+    ):
+        """
+        expect the lookups broker.tasks.alb.index_listeners makes for `listeners`,
+        a map of listener arn to (load balancer arn, number of certificates)
+        """
+        for listener_arn, (_, num_certificates) in listeners.items():
+            self.expect_get_certificates_for_listener(listener_arn, num_certificates)
+        self.expect_describe_listeners(
+            {listener_arn: alb_arn for listener_arn, (alb_arn, _) in listeners.items()}
+        )
+        self.expect_describe_albs(
+            sorted({alb_arn for alb_arn, _ in listeners.values()}), returned_domain
         )
 
     def expect_get_certificates_for_listener(
@@ -83,6 +102,18 @@ class FakeALB(FakeAWS):
             },
         )
 
+    def expect_add_certificate_to_listener_not_found(self, listener_arn, iam_cert_arn):
+        self.stubber.add_client_error(
+            "add_listener_certificates",
+            service_error_code="CertificateNotFound",
+            service_message="Certificate not found",
+            http_status_code=400,
+            expected_params={
+                "ListenerArn": listener_arn,
+                "Certificates": [{"CertificateArn": iam_cert_arn}],
+            },
+        )
+
     def expect_remove_certificate_from_listener(self, listener_arn, iam_cert_arn):
         self.stubber.add_response(
             "remove_listener_certificates",
@@ -93,8 +124,8 @@ class FakeALB(FakeAWS):
             },
         )
 
-    def expect_describe_alb(
-        self, alb_arn, returned_domain: str = "somedomain.cloud.test"
+    def expect_describe_albs(
+        self, alb_arns, returned_domain: str = "somedomain.cloud.test"
     ):
         self.stubber.add_response(
             "describe_load_balancers",
@@ -126,10 +157,11 @@ class FakeALB(FakeAWS):
                         "SecurityGroups": ["string"],
                         "IpAddressType": "ipv4",
                     }
+                    for alb_arn in alb_arns
                 ],
                 "NextMarker": "string",
             },
-            {"LoadBalancerArns": [alb_arn]},
+            {"LoadBalancerArns": list(alb_arns)},
         )
 
 
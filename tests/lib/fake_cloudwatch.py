@@ -65,12 +65,14 @@ class FakeCloudwatch(FakeAWS):
             request,
         )
 
-    def expect_describe_alarms(self, alarm_name: str, expected_alarms):
+    def expect_describe_alarms(self, alarm_names: str | list[str], expected_alarms):
+        if isinstance(alarm_names, str):
+            alarm_names = [alarm_names]
         self.stubber.add_response(
             "describe_alarms",
             {"MetricAlarms": expected_alarms},
             {
-                "AlarmNames": [alarm_name],
+                "AlarmNames": alarm_names,
                 "AlarmTypes": [
                     "MetricAlarm",
                 ],
@@ -101,6 +101,15 @@ class FakeIAM(FakeAWS):
             "delete_server_certificate", {}, {"ServerCertificateName": name}
         )
 
+    def expects_delete_server_certificate_delete_conflict(self, name: str):
+        self.stubber.add_client_error(
+            "delete_server_certificate",
+            service_error_code="DeleteConflict",
+            service_message="Certificate is in use",
+            http_status_code=409,
+            expected_params={"ServerCertificateName": name},
+        )
+
     def expects_delete_server_certificate_access_denied(self, name: str):
         self.stubber.add_client_error(
             "delete_server_certificate",
@@ -231,6 +231,21 @@ class FakeRoute53(FakeAWS):
             },
         )
 
+    def expect_create_health_check_error(self, service_instance_id, domain_name, idx):
+        self.stubber.add_client_error(
+            "create_health_check",
+            service_error_code="Throttling",
+            service_message="Rate exceeded",
+            http_status_code=400,
+            expected_params={
+                "CallerReference": f"{service_instance_id}-{idx}",
+                "HealthCheckConfig": {
+                    "Type": "HTTPS",
+                    "FullyQualifiedDomainName": domain_name,
+                },
+            },
+        )
+
     def expect_delete_health_check(self, health_check_id):
         self.stubber.add_response(
             "delete_health_check",
@@ -43,6 +43,22 @@ class FakeShield(FakeAWS):
 
             self.stubber.add_response(method, response, request)
 
+    def expect_describe_protection(self, protection: Protection):
+        self.stubber.add_response(
+            "describe_protection",
+            {"Protection": protection},
+            {"ResourceArn": protection["ResourceArn"]},
+        )
+
+    def expect_describe_protection_not_found(self, resource_arn: str):
+        self.stubber.add_client_error(
+            "describe_protection",
+            service_error_code="ResourceNotFoundException",
+            service_message="Not found",
+            http_status_code=400,
+            expected_params={"ResourceArn": resource_arn},
+        )
+
     def expect_associate_health_check(self, protection_id: str, health_check_id: str):
         self.stubber.add_response(
             "associate_health_check",
@@ -53,6 +69,20 @@ class FakeShield(FakeAWS):
             },
         )
 
+    def expect_associate_health_check_not_found(
+        self, protection_id: str, health_check_id: str
+    ):
+        self.stubber.add_client_error(
+            "associate_health_check",
+            service_error_code="ResourceNotFoundException",
+            service_message="Not found",
+            http_status_code=400,
+            expected_params={
+                "ProtectionId": protection_id,
+                "HealthCheckArn": f"arn:aws:route53:::healthcheck/{health_check_id}",
+            },
+        )
+
     def expect_disassociate_health_check(
         self, protection_id: str, health_check_id: str
     ):
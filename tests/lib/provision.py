@@ -6,6 +6,20 @@ from broker.extensions import db
 from broker.models import (
     Challenge,
 )
+from tests.lib.cf import mock_cf_api
+
+
+def subtest_provision_adds_names_to_tags(
+    tasks, instance_model, organization_guid, space_guid, service_instance_id="4321"
+):
+    db.session.expunge_all()
+    with mock_cf_api(organization_guid, space_guid):
+        tasks.run_queued_tasks_and_enqueue_dependents()
+
+    service_instance = db.session.get(instance_model, service_instance_id)
+    tags = {tag["Key"]: tag["Value"] for tag in service_instance.tags}
+    assert tags["Space name"] == "space-1234"
+    assert tags["Organization name"] == "org-1234"
 
 
 def subtest_provision_creates_LE_user(
@@ -2,83 +2,194 @@ import pytest
 import uuid
 
 from botocore.exceptions import ClientError
+from sqlalchemy import select
 
+from broker.extensions import config
+from broker.models import ALBListener, release_alb_listener_reservation
 from broker.tasks.alb import (
     get_potential_listeners_for_dedicated_instance,
-    get_lowest_used_alb,
+    index_listeners,
+    plan_listener_moves,
+    reserve_lowest_used_alb,
 )
 from tests.lib import factories
 
 
-def test_gets_lowest_used_alb(alb):
-    alb.expect_get_certificates_for_listener("listener-arn-0", 1)
-    alb.expect_get_listeners("listener-arn-0", "alb-listener-arn-0")
-    assert get_lowest_used_alb(["listener-arn-0"]) == (
-        "alb-listener-arn-0",
-        "listener-arn-0",
+def _certificate_count(db, listener_arn):
+    return db.session.scalars(
+        select(ALBListener.certificate_count).where(
+            ALBListener.listener_arn == listener_arn
+        )
+    ).one()
+
+
+def _reserve(db, listener_arns):
+    service_instance = factories.ALBServiceInstanceFactory.create(id=str(uuid.uuid4()))
+    reserve_lowest_used_alb(service_instance, listener_arns)
+    db.session.commit()
+    return service_instance
+
+
+def test_reserves_lowest_used_alb(clean_db):
+    for listener_arn, certificate_count in [
+        ("listener-arn-0", 19),
+        ("listener-arn-1", 0),
+        ("listener-arn-2", 25),
+        ("listener-arn-3", 0),
+    ]:
+        factories.ALBListenerFactory.create(
+            listener_arn=listener_arn, certificate_count=certificate_count
+        )
+
+    service_instance = _reserve(clean_db, ["listener-arn-0"])
+    assert service_instance.alb_arn == "alb-listener-arn-0"
+    assert service_instance.alb_listener_arn == "listener-arn-0"
+    assert service_instance.reserved_alb_listener_arn == "listener-arn-0"
+    assert _certificate_count(clean_db, "listener-arn-0") == 20
+
+    service_instance = _reserve(
+        clean_db, ["listener-arn-0", "listener-arn-3", "listener-arn-1"]
     )
+    assert service_instance.alb_listener_arn == "listener-arn-1"
+
+
+def test_reservations_spread_across_listeners(clean_db):
+    for i in range(3):
+        factories.ALBListenerFactory.create(listener_arn=f"listener-arn-{i}")
+    listener_arns = ["listener-arn-0", "listener-arn-1", "listener-arn-2"]
+
+    selected = [_reserve(clean_db, listener_arns).alb_listener_arn for _ in range(6)]
+
+    assert selected == listener_arns + listener_arns
+    for listener_arn in listener_arns:
+        assert _certificate_count(clean_db, listener_arn) == 2
+
 
-    alb.expect_get_certificates_for_listener("listener-arn-0", 2)
-    alb.expect_get_certificates_for_listener("listener-arn-1", 1)
-    alb.expect_get_listeners("listener-arn-1", "alb-listener-arn-1")
-    assert get_lowest_used_alb(["listener-arn-0", "listener-arn-1"]) == (
-        "alb-listener-arn-1",
-        "listener-arn-1",
+def test_skips_listeners_being_reserved(clean_db):
+    factories.ALBListenerFactory.create(listener_arn="listener-arn-0")
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-1", certificate_count=5
     )
 
-    alb.expect_get_certificates_for_listener("listener-arn-1", 1)
-    alb.expect_get_certificates_for_listener("listener-arn-0", 2)
-    alb.expect_get_listeners("listener-arn-1", "alb-listener-arn-1")
-    assert get_lowest_used_alb(["listener-arn-1", "listener-arn-0"]) == (
-        "alb-listener-arn-1",
-        "listener-arn-1",
+    with clean_db.engine.connect() as other_selection:
+        other_selection.execute(
+            select(ALBListener)
+            .where(ALBListener.listener_arn == "listener-arn-0")
+            .with_for_update()
+        )
+        service_instance = _reserve(clean_db, ["listener-arn-0", "listener-arn-1"])
+        other_selection.rollback()
+
+    assert service_instance.alb_listener_arn == "listener-arn-1"
+
+
+def test_does_not_reserve_full_listeners(clean_db):
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=config.MAX_CERTS_PER_LISTENER
     )
 
-    alb.expect_get_certificates_for_listener("listener-arn-1", 1)
-    alb.expect_get_certificates_for_listener("listener-arn-2", 2)
-    alb.expect_get_certificates_for_listener("listener-arn-0", 2)
-    alb.expect_get_listeners("listener-arn-1", "alb-listener-arn-1")
-    assert get_lowest_used_alb(
-        ["listener-arn-1", "listener-arn-2", "listener-arn-0"]
-    ) == ("alb-listener-arn-1", "listener-arn-1")
-
-    alb.expect_get_certificates_for_listener("listener-arn-0", 19)
-    alb.expect_get_certificates_for_listener("listener-arn-1", 0)
-    alb.expect_get_certificates_for_listener("listener-arn-2", 25)
-    alb.expect_get_certificates_for_listener("listener-arn-3", 20)
-    alb.expect_get_certificates_for_listener("listener-arn-4", 17)
-    alb.expect_get_listeners("listener-arn-1", "alb-listener-arn-1")
-    assert get_lowest_used_alb(
-        [
-            "listener-arn-0",
-            "listener-arn-1",
-            "listener-arn-2",
-            "listener-arn-3",
-            "listener-arn-4",
-        ]
-    ) == ("alb-listener-arn-1", "listener-arn-1")
-
-    alb.expect_get_certificates_for_listener("listener-arn-0", 1)
-    alb.expect_get_certificates_for_listener("listener-arn-1", 1)
-    alb.expect_get_certificates_for_listener("listener-arn-2", 0)
-    alb.expect_get_listeners("listener-arn-2", "alb-listener-arn-2")
-    assert get_lowest_used_alb(
-        ["listener-arn-0", "listener-arn-1", "listener-arn-2"]
-    ) == (
-        "alb-listener-arn-2",
-        "listener-arn-2",
+    with pytest.raises(RuntimeError):
+        _reserve(clean_db, ["listener-arn-0"])
+
+
+def test_reserving_again_releases_previous_reservation(clean_db):
+    factories.ALBListenerFactory.create(listener_arn="listener-arn-0")
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-1", certificate_count=1
     )
+    service_instance = _reserve(clean_db, ["listener-arn-0"])
+
+    reserve_lowest_used_alb(service_instance, ["listener-arn-1"])
+    clean_db.session.commit()
+
+    assert service_instance.reserved_alb_listener_arn == "listener-arn-1"
+    assert _certificate_count(clean_db, "listener-arn-0") == 0
+    assert _certificate_count(clean_db, "listener-arn-1") == 2
+
+
+def test_release_alb_listener_reservation(clean_db):
+    factories.ALBListenerFactory.create(listener_arn="listener-arn-0")
+    service_instance = _reserve(clean_db, ["listener-arn-0"])
+
+    release_alb_listener_reservation(service_instance)
+    release_alb_listener_reservation(service_instance)
+    clean_db.session.commit()
+
+    assert service_instance.reserved_alb_listener_arn is None
+    assert _certificate_count(clean_db, "listener-arn-0") == 0
 
 
-def test_raises_error_getting_listener_certificates(alb):
+def test_indexes_unknown_listeners_before_reserving(clean_db, alb):
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=3
+    )
+    alb.expect_index_listeners({"listener-arn-1": ("alb-listener-arn-1", 1)})
+
+    service_instance = _reserve(clean_db, ["listener-arn-0", "listener-arn-1"])
+    alb.assert_no_pending_responses()
+
+    assert service_instance.alb_arn == "alb-listener-arn-1"
+    listener = clean_db.session.scalars(
+        select(ALBListener).where(ALBListener.listener_arn == "listener-arn-1")
+    ).one()
+    assert listener.certificate_count == 2
+    assert listener.dns_name == "alb.cloud.test"
+    assert listener.canonical_hosted_zone_id == "ALBHOSTEDZONEID"
+    assert listener.reconciled_at is not None
+
+
+def test_index_listeners_counts_every_page_of_certificates(clean_db, alb):
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=30
+    )
+    first_page = [
+        {"CertificateArn": f"certificate-arn-{i}", "IsDefault": i == 0}
+        for i in range(5)
+    ]
+    alb.stubber.add_response(
+        "describe_listener_certificates",
+        {"Certificates": first_page, "NextMarker": "page-2"},
+        {"ListenerArn": "listener-arn-0"},
+    )
+    alb.stubber.add_response(
+        "describe_listener_certificates",
+        {"Certificates": [{"CertificateArn": "certificate-arn-5"}]},
+        {"ListenerArn": "listener-arn-0", "Marker": "page-2"},
+    )
+    alb.expect_describe_listeners({"listener-arn-0": "alb-listener-arn-0"})
+    alb.expect_describe_albs(["alb-listener-arn-0"])
+
+    index_listeners(["listener-arn-0"])
+    alb.assert_no_pending_responses()
+
+    clean_db.session.expunge_all()
+    listener = clean_db.session.scalars(select(ALBListener)).one()
+    # the default certificate isn't counted
+    assert listener.certificate_count == 5
+    assert listener.dns_name == "somedomain.cloud.test"
+
+
+def test_certificate_removed_stops_at_zero(clean_db):
+    factories.ALBListenerFactory.create(
+        listener_arn="listener-arn-0", certificate_count=1
+    )
+
+    for _ in range(3):
+        ALBListener.certificate_removed("listener-arn-0")
+    clean_db.session.commit()
+
+    assert _certificate_count(clean_db, "listener-arn-0") == 0
+
+
+def test_raises_error_getting_listener_certificates(clean_db, alb):
     alb.expect_get_certificates_for_listener_error("listener-arn-0")
     with pytest.raises(ClientError):
-        get_lowest_used_alb(["listener-arn-0"])
+        _reserve(clean_db, ["listener-arn-0"])
 
 
-def test_raises_error_on_empty_input_list_albs():
+def test_raises_error_on_empty_input_list_albs(clean_db):
     with pytest.raises(RuntimeError):
-        get_lowest_used_alb([])
+        _reserve(clean_db, [])
 
 
 def test_get_potential_listeners_with_listeners_for_instance_org(
@@ -135,3 +246,28 @@ def test_get_potential_listeners_no_listeners_found(
 
         with pytest.raises(RuntimeError):
             get_potential_listeners_for_dedicated_instance(service_instance)
+
+
+def test_plan_listener_moves_evens_out_counts():
+    counts = {"listener-arn-0": 7, "listener-arn-1": 1, "listener-arn-2": 4}
+
+    assert plan_listener_moves(counts, 10) == [
+        ("listener-arn-0", "listener-arn-1"),
+        ("listener-arn-0", "listener-arn-1"),
+        ("listener-arn-0", "listener-arn-1"),
+    ]
+    assert counts == {"listener-arn-0": 7, "listener-arn-1": 1, "listener-arn-2": 4}
+
+
+def test_plan_listener_moves_stays_within_budget():
+    counts = {"listener-arn-0": 20, "listener-arn-1": 0}
+
+    assert plan_listener_moves(counts, 2) == [
+        ("listener-arn-0", "listener-arn-1"),
+        ("listener-arn-0", "listener-arn-1"),
+    ]
+
+
+def test_plan_listener_moves_leaves_even_listeners_alone():
+    assert plan_listener_moves({"listener-arn-0": 4, "listener-arn-1": 3}, 5) == []
+    assert plan_listener_moves({"listener-arn-0": 4}, 5) == []
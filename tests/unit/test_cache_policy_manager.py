@@ -9,17 +9,19 @@ def test_is_cache_policy_allowed():
     assert is_cache_policy_allowed("Policy1", ["Policy2"]) == False
 
 
-def test_managed_cache_policies(cloudfront, cache_policy_id):
+def test_managed_cache_policies(cloudfront, clean_redis, cache_policy_id):
     policies = [{"id": cache_policy_id, "name": "Managed-CachingDisabled"}]
 
-    cache_policy_manager = CachePolicyManager(cloudfront_svc)
+    cache_policy_manager = CachePolicyManager(cloudfront_svc, clean_redis)
     cloudfront.expect_list_cache_policies("managed", policies)
     assert cache_policy_manager.managed_policies == {
         "Managed-CachingDisabled": cache_policy_id,
     }
 
 
-def test_managed_cache_policies_handles_paging(cloudfront, cache_policy_id):
+def test_managed_cache_policies_handles_paging(
+    cloudfront, clean_redis, cache_policy_id
+):
     policies = [{"id": cache_policy_id, "name": "Managed-CachingDisabled"}]
     cloudfront.expect_list_cache_policies("managed", policies, next_marker="next")
 
@@ -28,7 +30,7 @@ def test_managed_cache_policies_handles_paging(cloudfront, cache_policy_id):
 
     cloudfront.expect_list_cache_policies("managed", policies, marker="next")
 
-    cache_policy_manager = CachePolicyManager(cloudfront_svc)
+    cache_policy_manager = CachePolicyManager(cloudfront_svc, clean_redis)
 
     assert cache_policy_manager.managed_policies == {
         "Managed-CachingDisabled": cache_policy_id,
@@ -36,23 +38,27 @@ def test_managed_cache_policies_handles_paging(cloudfront, cache_policy_id):
     }
 
 
-def test_managed_cache_policies_ignores_unknown_policies(cloudfront, cache_policy_id):
+def test_managed_cache_policies_ignores_unknown_policies(
+    cloudfront, clean_redis, cache_policy_id
+):
     policies = [
         {"id": cache_policy_id, "name": "Managed-CachingDisabled"},
         {"id": "id-1", "name": "FoobarPolicy"},
     ]
 
-    cache_policy_manager = CachePolicyManager(cloudfront_svc)
+    cache_policy_manager = CachePolicyManager(cloudfront_svc, clean_redis)
     cloudfront.expect_list_cache_policies("managed", policies)
     assert cache_policy_manager.managed_policies == {
         "Managed-CachingDisabled": cache_policy_id,
     }
 
 
-def test_managed_cache_policies_returns_saved_results(cloudfront, cache_policy_id):
+def test_managed_cache_policies_returns_saved_results(
+    cloudfront, clean_redis, cache_policy_id
+):
     policies = [{"id": cache_policy_id, "name": "Managed-CachingDisabled"}]
 
-    cache_policy_manager = CachePolicyManager(cloudfront_svc)
+    cache_policy_manager = CachePolicyManager(cloudfront_svc, clean_redis)
     cloudfront.expect_list_cache_policies("managed", policies)
     policies = cache_policy_manager.managed_policies
     # second call should not cause an API request
@@ -62,10 +68,10 @@ def test_managed_cache_policies_returns_saved_results(cloudfront, cache_policy_i
     }
 
 
-def test_get_managed_cache_policy_id(cloudfront, cache_policy_id):
+def test_get_managed_cache_policy_id(cloudfront, clean_redis, cache_policy_id):
     policies = [{"id": cache_policy_id, "name": "Managed-CachingDisabled"}]
 
-    cache_policy_manager = CachePolicyManager(cloudfront_svc)
+    cache_policy_manager = CachePolicyManager(cloudfront_svc, clean_redis)
     cloudfront.expect_list_cache_policies("managed", policies)
     assert (
         cache_policy_manager.get_managed_policy_id("Managed-CachingDisabled")
@@ -9,13 +9,13 @@ from broker.lib.origin_request_policy_manager import OriginRequestPolicyManager
 
 
 @pytest.fixture
-def cache_policy_manager():
-    return CachePolicyManager(real_cloudfront)
+def cache_policy_manager(clean_redis):
+    return CachePolicyManager(real_cloudfront, clean_redis)
 
 
 @pytest.fixture
-def origin_request_policy_manager():
-    return OriginRequestPolicyManager(real_cloudfront)
+def origin_request_policy_manager(clean_redis):
+    return OriginRequestPolicyManager(real_cloudfront, clean_redis)
 
 
 def test_parse_cache_policy_returns_none(cache_policy_manager):
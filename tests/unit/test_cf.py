@@ -1,11 +1,13 @@
 import pytest
 import json
+import time
 import uuid
 import requests_mock
 
+from concurrent.futures import ThreadPoolExecutor
 from broker.lib import cf
 from requests import exceptions
-from tests.lib.cf import match_uaa_basic_auth
+from tests.lib.cf import match_uaa_basic_auth, mock_organizations
 
 
 @pytest.fixture
@@ -146,3 +148,85 @@ def test_gets_org_name_error(
     )
     with pytest.raises(exceptions.HTTPError):
         cf_api_client.get_organization_name_by_guid(organization_guid)
+
+
+def test_caches_names(organization_guid, access_token, mock_with_uaa_auth):
+    cf_api_client = cf.CFAPIClient()
+    org = mock_with_uaa_auth.get(
+        f"http://mock.cf/v3/organizations/{organization_guid}",
+        text=json.dumps({"guid": organization_guid, "name": "org-1234"}),
+    )
+
+    assert cf_api_client.get_organization_name_by_guid(organization_guid) == "org-1234"
+    assert cf_api_client.get_organization_name_by_guid(organization_guid) == "org-1234"
+    assert org.call_count == 1
+
+
+def test_cached_names_expire(organization_guid, access_token, mock_with_uaa_auth):
+    cf_api_client = cf.CFAPIClient(cache_ttl=0)
+    org = mock_with_uaa_auth.get(
+        f"http://mock.cf/v3/organizations/{organization_guid}",
+        text=json.dumps({"guid": organization_guid, "name": "org-1234"}),
+    )
+
+    cf_api_client.get_organization_name_by_guid(organization_guid)
+    cf_api_client.get_organization_name_by_guid(organization_guid)
+    assert org.call_count == 2
+
+
+def test_concurrent_lookups_share_a_request(
+    organization_guid, access_token, mock_with_uaa_auth
+):
+    cf_api_client = cf.CFAPIClient()
+    # fetch the token first, so the threads only race on the org lookup
+    cf_api_client.access_token
+
+    def slow_response(request, context):
+        time.sleep(0.2)
+        return {"guid": organization_guid, "name": "org-1234"}
+
+    org = mock_with_uaa_auth.get(
+        f"http://mock.cf/v3/organizations/{organization_guid}", json=slow_response
+    )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        names = list(
+            executor.map(
+                cf_api_client.get_organization_name_by_guid, [organization_guid] * 4
+            )
+        )
+
+    assert names == ["org-1234"] * 4
+    assert org.call_count == 1
+
+
+def test_gets_org_names_in_bulk(access_token, mock_with_uaa_auth):
+    cf_api_client = cf.CFAPIClient()
+    mock_organizations(
+        mock_with_uaa_auth, access_token, {"org1": "org1-name", "org2": "org2-name"}
+    )
+
+    names = cf_api_client.get_organization_names_by_guids(["org1", "org2", "org3"])
+
+    assert names == {"org1": "org1-name", "org2": "org2-name"}
+    assert mock_with_uaa_auth.last_request.qs["guids"] == ["org1,org2,org3"]
+    # now cached
+    assert cf_api_client.get_organization_name_by_guid("org2") == "org2-name"
+    assert cf_api_client.get_organization_names_by_guids(["org1"]) == {
+        "org1": "org1-name"
+    }
+    assert (
+        len([r for r in mock_with_uaa_auth.request_history if r.method == "GET"]) == 1
+    )
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = cf.TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
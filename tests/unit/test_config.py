@@ -309,3 +309,29 @@ def test_config_sets_waf_group_arns(env, monkeypatch, mocked_env):
     assert (
         config.CDN_WAF_CLOUDWATCH_LOG_GROUP_ARN == "fake-waf-cloudwatch-log-group-arn"
     )
+
+
+@pytest.mark.parametrize("env", ["production", "staging", "development"])
+def test_config_merges_aws_rate_limits_from_env(env, monkeypatch, mocked_env):
+    monkeypatch.setenv("FLASK_ENV", env)
+    monkeypatch.setenv(
+        "AWS_RATE_LIMITS", "route-53.ChangeResourceRecordSets=0.5,iam.ListTags=2"
+    )
+
+    config = config_from_env()
+
+    assert config.AWS_RATE_LIMITS["route-53.ChangeResourceRecordSets"] == 0.5
+    assert config.AWS_RATE_LIMITS["iam.ListTags"] == 2
+    assert config.AWS_RATE_LIMITS["cloudfront.UpdateDistribution"] == 1
+
+
+@pytest.mark.parametrize("env", ["production", "staging", "development"])
+def test_config_gets_iam_certificate_propagation_time_from_env(
+    env, monkeypatch, mocked_env
+):
+    monkeypatch.setenv("FLASK_ENV", env)
+    monkeypatch.setenv("IAM_CERTIFICATE_PROPAGATION_TIME", "120")
+
+    config = config_from_env()
+
+    assert config.IAM_CERTIFICATE_PROPAGATION_TIME == 120
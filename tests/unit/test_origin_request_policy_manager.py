@@ -12,17 +12,21 @@ def test_is_origin_request_policy_allowed():
     assert is_origin_request_policy_allowed("Policy1", ["Policy2"]) == False
 
 
-def test_managed_cache_policies(cloudfront, cache_policy_id):
+def test_managed_cache_policies(cloudfront, clean_redis, cache_policy_id):
     policies = [{"id": cache_policy_id, "name": "Managed-AllViewer"}]
 
-    origin_request_policy_manager = OriginRequestPolicyManager(cloudfront_svc)
+    origin_request_policy_manager = OriginRequestPolicyManager(
+        cloudfront_svc, clean_redis
+    )
     cloudfront.expect_list_origin_request_policies("managed", policies)
     assert origin_request_policy_manager.managed_policies == {
         "Managed-AllViewer": cache_policy_id,
     }
 
 
-def test_managed_cache_policies_handles_paging(cloudfront, cache_policy_id):
+def test_managed_cache_policies_handles_paging(
+    cloudfront, clean_redis, cache_policy_id
+):
     policies = [{"id": cache_policy_id, "name": "Managed-AllViewer"}]
     cloudfront.expect_list_origin_request_policies(
         "managed", policies, next_marker="next"
@@ -35,7 +39,9 @@ def test_managed_cache_policies_handles_paging(cloudfront, cache_policy_id):
 
     cloudfront.expect_list_origin_request_policies("managed", policies, marker="next")
 
-    origin_request_policy_manager = OriginRequestPolicyManager(cloudfront_svc)
+    origin_request_policy_manager = OriginRequestPolicyManager(
+        cloudfront_svc, clean_redis
+    )
 
     assert origin_request_policy_manager.managed_policies == {
         "Managed-AllViewer": cache_policy_id,
@@ -43,23 +49,31 @@ def test_managed_cache_policies_handles_paging(cloudfront, cache_policy_id):
     }
 
 
-def test_managed_cache_policies_ignores_unknown_policies(cloudfront, cache_policy_id):
+def test_managed_cache_policies_ignores_unknown_policies(
+    cloudfront, clean_redis, cache_policy_id
+):
     policies = [
         {"id": cache_policy_id, "name": "Managed-AllViewer"},
         {"id": "id-1", "name": "FoobarPolicy"},
     ]
 
-    origin_request_policy_manager = OriginRequestPolicyManager(cloudfront_svc)
+    origin_request_policy_manager = OriginRequestPolicyManager(
+        cloudfront_svc, clean_redis
+    )
     cloudfront.expect_list_origin_request_policies("managed", policies)
     assert origin_request_policy_manager.managed_policies == {
         "Managed-AllViewer": cache_policy_id,
     }
 
 
-def test_managed_cache_policies_returns_saved_results(cloudfront, cache_policy_id):
+def test_managed_cache_policies_returns_saved_results(
+    cloudfront, clean_redis, cache_policy_id
+):
     policies = [{"id": cache_policy_id, "name": "Managed-AllViewer"}]
 
-    origin_request_policy_manager = OriginRequestPolicyManager(cloudfront_svc)
+    origin_request_policy_manager = OriginRequestPolicyManager(
+        cloudfront_svc, clean_redis
+    )
     cloudfront.expect_list_origin_request_policies("managed", policies)
     policies = origin_request_policy_manager.managed_policies
     # second call should not cause an API request
@@ -69,10 +83,12 @@ def test_managed_cache_policies_returns_saved_results(cloudfront, cache_policy_i
     }
 
 
-def test_get_managed_cache_policy_id(cloudfront, cache_policy_id):
+def test_get_managed_cache_policy_id(cloudfront, clean_redis, cache_policy_id):
     policies = [{"id": cache_policy_id, "name": "Managed-AllViewer"}]
 
-    origin_request_policy_manager = OriginRequestPolicyManager(cloudfront_svc)
+    origin_request_policy_manager = OriginRequestPolicyManager(
+        cloudfront_svc, clean_redis
+    )
     cloudfront.expect_list_origin_request_policies("managed", policies)
     assert (
         origin_request_policy_manager.get_managed_policy_id("Managed-AllViewer")
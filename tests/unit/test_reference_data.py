@@ -0,0 +1,62 @@
+import pytest
+from redis import Redis
+
+from broker.lib import reference_data
+from broker.lib.reference_data import ReferenceData, refresh_all, register
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"policy": f"id-{self.calls}"}
+
+
+@pytest.fixture
+def load():
+    return Loader()
+
+
+@pytest.fixture
+def unreachable_redis():
+    # nothing listens on port 1, so every command fails to connect
+    return Redis(host="localhost", port=1, socket_connect_timeout=0.1)
+
+
+def test_get_loads_and_shares_data(clean_redis, load):
+    data = ReferenceData("test-data", load, clean_redis, 60)
+
+    assert data.get() == {"policy": "id-1"}
+    # another process finds it in redis
+    assert ReferenceData("test-data", load, clean_redis, 60).get() == {"policy": "id-1"}
+    assert load.calls == 1
+    assert 0 < clean_redis.ttl("reference:test-data") <= 60
+
+
+def test_refresh_replaces_data(clean_redis, load):
+    data = ReferenceData("test-data", load, clean_redis, 60)
+    data.get()
+
+    data.refresh()
+
+    assert ReferenceData("test-data", load, clean_redis, 60).get() == {"policy": "id-2"}
+
+
+def test_refresh_all_refreshes_registered_data(clean_redis, load, monkeypatch):
+    monkeypatch.setattr(reference_data, "_registry", {})
+    register(ReferenceData("test-data", load, clean_redis, 60))
+
+    refresh_all()
+
+    assert load.calls == 1
+    assert clean_redis.get("reference:test-data") == b'{"policy": "id-1"}'
+
+
+def test_get_uses_local_copy_without_redis(load, unreachable_redis):
+    data = ReferenceData("test-data", load, unreachable_redis, 60)
+
+    assert data.get() == {"policy": "id-1"}
+    assert data.get() == {"policy": "id-1"}
+    assert load.calls == 1
@@ -1,76 +1,97 @@
 import uuid
 
+import pytest
+from redis import Redis
+
 from broker.aws import shield as shield_svc
 from broker.lib.shield_protections import ShieldProtections
 from tests.lib.fake_shield import Protection
 
 
-def test_cloudfront_get_already_set_protections(shield):
-    protection_id = str(uuid.uuid4())
-    cloudfront_arn = "arn:aws:cloudfront::000000000:distribution/fake-arn"
+@pytest.fixture
+def shield_protections(clean_redis):
+    return ShieldProtections(shield_svc, clean_redis, 60)
 
-    shield_protections = ShieldProtections(shield_svc)
-    shield_protections.protected_cloudfront_ids = {
-        cloudfront_arn: protection_id,
-    }
-    protections = shield_protections.get_cloudfront_protections()
-    assert protections == {
-        cloudfront_arn: protection_id,
+
+def make_protection(name="fake-arn") -> Protection:
+    return {
+        "Id": str(uuid.uuid4()),
+        "ResourceArn": f"arn:aws:cloudfront::000000000:distribution/{name}",
     }
 
 
-def test_cloudfront_get_protections(shield):
-    protection_id = str(uuid.uuid4())
-    cloudfront_arn = "arn:aws:cloudfront::000000000:distribution/fake-arn"
-    protection: Protection = {"Id": protection_id, "ResourceArn": cloudfront_arn}
-    shield.expect_list_protections([protection])
+def test_cloudfront_get_protection_id(shield, shield_protections):
+    protection = make_protection()
+    shield.expect_describe_protection(protection)
 
-    shield_protections = ShieldProtections(shield_svc)
-    protections = shield_protections.get_cloudfront_protections()
-    assert protections == {
-        cloudfront_arn: protection_id,
-    }
+    protection_id = shield_protections.get_protection_id(protection["ResourceArn"])
+
+    assert protection_id == protection["Id"]
+    shield.assert_no_pending_responses()
 
 
-def test_cloudfront_get_protections_should_refresh(shield):
-    protection_id = str(uuid.uuid4())
-    cloudfront_arn = "arn:aws:cloudfront::000000000:distribution/fake-arn"
-    protection: Protection = {"Id": protection_id, "ResourceArn": cloudfront_arn}
+def test_cloudfront_get_protection_id_is_cached(
+    shield, shield_protections, clean_redis
+):
+    protection = make_protection()
+    shield.expect_describe_protection(protection)
 
-    shield.expect_list_protections([protection])
+    shield_protections.get_protection_id(protection["ResourceArn"])
+    protection_id = ShieldProtections(shield_svc, clean_redis, 60).get_protection_id(
+        protection["ResourceArn"]
+    )
 
-    shield_protections = ShieldProtections(shield_svc)
-    protections = shield_protections.get_cloudfront_protections()
+    assert protection_id == protection["Id"]
+    shield.assert_no_pending_responses()
+    assert 0 < clean_redis.ttl(f"shield:protection:{protection['ResourceArn']}") <= 60
 
-    shield.expect_list_protections([protection])
 
-    protections = shield_protections.get_cloudfront_protections(should_refresh=True)
+def test_cloudfront_get_protection_id_not_found(shield, shield_protections):
+    arn = "arn:aws:cloudfront::000000000:distribution/fake-arn"
+    shield.expect_describe_protection_not_found(arn)
 
+    assert shield_protections.get_protection_id(arn) is None
     shield.assert_no_pending_responses()
-    assert protections == {
-        cloudfront_arn: protection_id,
-    }
 
 
-def test_cloudfront_get_protections_paged_results(shield):
-    protection_id = str(uuid.uuid4())
-    cloudfront_arn = "arn:aws:cloudfront::000000000:distribution/fake-arn"
-    protection: Protection = {"Id": protection_id, "ResourceArn": cloudfront_arn}
+def test_cloudfront_get_protection_id_without_redis(shield):
+    # nothing listens on port 1, so every command fails to connect
+    unreachable_redis = Redis(host="localhost", port=1, socket_connect_timeout=0.1)
+    protection = make_protection()
+    shield.expect_describe_protection(protection)
 
-    protection_id2 = str(uuid.uuid4())
-    cloudfront_arn2 = "arn:aws:cloudfront::000000000:distribution/fake-arn2"
-    protection2: Protection = {"Id": protection_id2, "ResourceArn": cloudfront_arn2}
+    protection_id = ShieldProtections(
+        shield_svc, unreachable_redis, 60
+    ).get_protection_id(protection["ResourceArn"])
+
+    assert protection_id == protection["Id"]
+    shield.assert_no_pending_responses()
 
-    protection_id3 = str(uuid.uuid4())
-    cloudfront_arn3 = "arn:aws:cloudfront::000000000:distribution/fake-arn3"
-    protection3: Protection = {"Id": protection_id3, "ResourceArn": cloudfront_arn3}
 
+def test_cloudfront_forget_protection_id(shield, shield_protections):
+    protection = make_protection()
+    shield.expect_describe_protection(protection)
+    shield_protections.get_protection_id(protection["ResourceArn"])
+
+    shield_protections.forget(protection["ResourceArn"])
+
+    protection["Id"] = str(uuid.uuid4())
+    shield.expect_describe_protection(protection)
+    protection_id = shield_protections.get_protection_id(protection["ResourceArn"])
+
+    assert protection_id == protection["Id"]
+    shield.assert_no_pending_responses()
+
+
+def test_cloudfront_refresh_paged_results(shield, shield_protections):
+    protection = make_protection("fake-arn")
+    protection2 = make_protection("fake-arn2")
+    protection3 = make_protection("fake-arn3")
     shield.expect_list_protections([protection], [protection2], [protection3])
 
-    shield_protections = ShieldProtections(shield_svc)
-    protections = shield_protections.get_cloudfront_protections()
-    assert protections == {
-        cloudfront_arn: protection_id,
-        cloudfront_arn2: protection_id2,
-        cloudfront_arn3: protection_id3,
-    }
+    assert shield_protections.refresh() == 3
+
+    for cached in [protection, protection2, protection3]:
+        protection_id = shield_protections.get_protection_id(cached["ResourceArn"])
+        assert protection_id == cached["Id"]
+    shield.assert_no_pending_responses()
@@ -10,6 +10,7 @@ from openbrokerapi.service_broker import (
 )
 
 from broker.lib.tags import (
+    add_name_tags,
     add_tag,
     create_resource_tags,
     generate_tags,
@@ -73,9 +74,24 @@ def test_generate_instance_tags(
     plan,
     details,
     catalog,
-    access_token,
-    mock_with_uaa_auth,
 ):
+    # no CF API calls: the names are added later by the pipeline
+    tags = generate_instance_tags(instance_guid, details, catalog, "foo")
+    assert sort_instance_tags(tags) == sort_instance_tags(
+        [
+            {"Key": "client", "Value": "Cloud Foundry"},
+            {"Key": "broker", "Value": "External domain broker"},
+            {"Key": "environment", "Value": "foo"},
+            {"Key": "Service offering name", "Value": "external-domain"},
+            {"Key": "Service plan name", "Value": plan.name},
+            {"Key": "Instance GUID", "Value": instance_guid},
+            {"Key": "Organization GUID", "Value": organization_guid},
+            {"Key": "Space GUID", "Value": space_guid},
+        ]
+    )
+
+
+def test_add_name_tags(organization_guid, space_guid, access_token, mock_with_uaa_auth):
     response = json.dumps({"guid": organization_guid, "name": "org-1234"})
     mock_with_uaa_auth.get(
         f"http://mock.cf/v3/organizations/{organization_guid}",
@@ -92,22 +108,26 @@ def test_generate_instance_tags(
             "Authorization": f"Bearer {access_token}",
         },
     )
+    tags = [
+        {"Key": "Organization GUID", "Value": organization_guid},
+        {"Key": "Space GUID", "Value": space_guid},
+    ]
 
-    tags = generate_instance_tags(instance_guid, details, catalog, "foo")
-    assert sort_instance_tags(tags) == sort_instance_tags(
-        [
-            {"Key": "client", "Value": "Cloud Foundry"},
-            {"Key": "broker", "Value": "External domain broker"},
-            {"Key": "environment", "Value": "foo"},
-            {"Key": "Service offering name", "Value": "external-domain"},
-            {"Key": "Service plan name", "Value": plan.name},
-            {"Key": "Instance GUID", "Value": instance_guid},
-            {"Key": "Organization GUID", "Value": organization_guid},
-            {"Key": "Organization name", "Value": "org-1234"},
-            {"Key": "Space GUID", "Value": space_guid},
-            {"Key": "Space name", "Value": "space-5678"},
-        ]
-    )
+    assert add_name_tags(tags) == [
+        {"Key": "Organization GUID", "Value": organization_guid},
+        {"Key": "Space GUID", "Value": space_guid},
+        {"Key": "Space name", "Value": "space-5678"},
+        {"Key": "Organization name", "Value": "org-1234"},
+    ]
+
+
+def test_add_name_tags_keeps_existing_names(organization_guid):
+    tags = [
+        {"Key": "Organization GUID", "Value": organization_guid},
+        {"Key": "Organization name", "Value": "org-1234"},
+    ]
+
+    assert add_name_tags(tags) == tags
 
 
 def test_generate_instance_tags_multiple_plans(instance_guid, plan, details, catalog):
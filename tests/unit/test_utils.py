@@ -1,9 +1,16 @@
 import pytest
+import threading
+import time
 import uuid
 
 from openbrokerapi import errors
 
-from broker.lib.utils import parse_domain_options, validate_domain_name_changes
+from broker.extensions import config
+from broker.lib.utils import (
+    map_concurrently,
+    parse_domain_options,
+    validate_domain_name_changes,
+)
 from tests.lib import factories
 
 
@@ -230,3 +237,79 @@ def test_validate_domain_name_changes_errors_on_non_unique_domains(
 
         with pytest.raises(errors.ErrBadRequest):
             validate_domain_name_changes(domain_names, new_instance)
+
+
+def test_map_concurrently_keeps_order():
+    assert map_concurrently(lambda n: n * 2, [3, 1, 2]) == [6, 2, 4]
+    assert map_concurrently(lambda n: n, []) == []
+
+
+def test_map_concurrently_raises_first_error_after_all_calls():
+    called = []
+
+    def call(n):
+        called.append(n)
+        if n % 2:
+            raise ValueError(n)
+        return n
+
+    with pytest.raises(ValueError, match="1"):
+        map_concurrently(call, [0, 1, 2, 3])
+    assert sorted(called) == [0, 1, 2, 3]
+
+
+@pytest.fixture
+def four_at_a_time(monkeypatch):
+    monkeypatch.setattr(config, "AWS_MAX_CONCURRENT_REQUESTS", 4)
+
+
+def test_map_concurrently_makes_calls_at_the_same_time(four_at_a_time):
+    # every call waits for the other three, so this only finishes if they overlap
+    together = threading.Barrier(4, timeout=5)
+
+    def call(n):
+        together.wait()
+        # and the later items finish first
+        time.sleep((4 - n) * 0.01)
+        return n * 2
+
+    assert map_concurrently(call, [0, 1, 2, 3]) == [0, 2, 4, 6]
+
+
+def test_map_concurrently_keeps_to_the_limit(four_at_a_time):
+    lock = threading.Lock()
+    running = []
+    most_running = 0
+
+    def call(n):
+        nonlocal most_running
+        with lock:
+            running.append(n)
+            most_running = max(most_running, len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(n)
+        return n
+
+    assert map_concurrently(call, range(10)) == list(range(10))
+    assert most_running == 4
+
+
+def test_map_concurrently_collects_errors_from_every_call(four_at_a_time):
+    called = []
+    last_failed = threading.Event()
+
+    def call(n):
+        called.append(n)
+        if n == 3:
+            last_failed.set()
+            raise ValueError(n)
+        # the first failure in item order happens after the last one
+        assert last_failed.wait(timeout=5)
+        if n == 1:
+            raise ValueError(n)
+        return n
+
+    with pytest.raises(ValueError, match="1"):
+        map_concurrently(call, [0, 1, 2, 3])
+    assert sorted(called) == [0, 1, 2, 3]